@@ -0,0 +1,110 @@
+"""Fire many concurrent !daily claims for one user and check exactly one is paid.
+
+Runs the old read-then-write claim and the single-statement CLAIM_DAILY used
+by PickleTracking against the same burst, then moves the last claim back a
+day and bursts again to check the streak bonus is paid once. Reports the
+payouts, final balance and claim latency for each run.
+
+Needs a scratch PostgreSQL database; DATABASE_URL must point at it. Migrations
+are applied to it, and the benchmark user's row is deleted afterwards.
+
+Run from the repository root:
+    DATABASE_URL=postgresql://... python -m benchmarks.daily_claim [claims]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from cogs.pickle_tracking import CLAIM_DAILY, daily_claim_args
+from utils.config import config
+from utils.db_manager import db
+from utils.logger import logger
+from utils.migrations import apply_migrations
+
+USER_ID = "bench-daily"
+RESET = "DELETE FROM pickle_counts WHERE user_id = $1"
+BALANCE = "SELECT coins, daily_streak FROM pickle_counts WHERE user_id = $1"
+# Pretend the last claim was a day ago, inside the streak window
+REWIND = "UPDATE pickle_counts SET last_daily = last_daily - interval '25 hours' WHERE user_id = $1"
+
+async def legacy_claim(amount, cooldown):
+    """The claim as it used to be: read last_daily, decide in Python, then upsert"""
+    last_claim = await db.fetchval("SELECT last_daily FROM pickle_counts WHERE user_id = $1", USER_ID)
+    now = datetime.now(timezone.utc)
+    if last_claim and now - last_claim < cooldown:
+        return False
+    await db.execute(
+        """
+        INSERT INTO pickle_counts(user_id, coins, last_daily)
+        VALUES($1, $2, $3)
+        ON CONFLICT (user_id)
+        DO UPDATE SET coins = pickle_counts.coins + $2, last_daily = $3
+        """,
+        USER_ID, amount, now
+    )
+    return True
+
+async def atomic_claim(claim_args):
+    # Strict, so a failed claim is counted as an error rather than a refusal
+    result = await db.fetchrow(CLAIM_DAILY, USER_ID, *claim_args, strict=True)
+    return result is not None and result['coins'] is not None
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def burst(label, claims, claim):
+    """Run claims concurrent claims and report how many were paid"""
+    latencies = []
+
+    async def timed():
+        start = time.perf_counter()
+        try:
+            return await claim()
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(claims)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    paid = sum(1 for result in results if result is True)
+    errors = sum(1 for result in results if isinstance(result, Exception))
+    balance = await db.fetchrow(BALANCE, USER_ID)
+    print(f"{label:<28} {paid:>5} {errors:>7} {balance['coins']:>8} {balance['daily_streak']:>7} "
+          f"{claims / elapsed:>10,.0f} {percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f}")
+    return paid, balance
+
+async def main(claims):
+    if not os.getenv("DATABASE_URL"):
+        print("Set DATABASE_URL to a scratch database to run this benchmark.")
+        return
+
+    await db.connect()
+    await apply_migrations(db)
+    claim_args = daily_claim_args(config.get("daily", {}))
+    amount, cooldown, _, streak_bonus, streak_bonus_max = claim_args
+
+    try:
+        print(f"{claims} concurrent claims per run, pool max {db.pool.get_max_size()}\n")
+        print(f"{'run':<28} {'paid':>5} {'errors':>7} {'balance':>8} {'streak':>7} {'claims/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+
+        await db.execute(RESET, USER_ID)
+        await burst("read-then-write", claims, lambda: legacy_claim(amount, cooldown))
+
+        await db.execute(RESET, USER_ID)
+        first, _ = await burst("CLAIM_DAILY, first day", claims, lambda: atomic_claim(claim_args))
+        await db.execute(REWIND, USER_ID)
+        second, balance = await burst("CLAIM_DAILY, next day", claims, lambda: atomic_claim(claim_args))
+
+        expected = 2 * amount + min(streak_bonus, streak_bonus_max)
+        ok = first == 1 and second == 1 and balance['coins'] == expected and balance['daily_streak'] == 2
+        print(f"\nCLAIM_DAILY paid once per day with a final balance of {balance['coins']} (expected {expected}): "
+              f"{'OK' if ok else 'FAILED'}")
+    finally:
+        await db.execute(RESET, USER_ID)
+        await db.close()
+        logger.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,202 @@
+"""Load-test row-lock contention on pickle_counts under skewed user activity.
+
+Concurrent clients drive DatabaseManager with the statements that write
+pickle_counts in production: the pickle buffer's multi-row upsert, the
+!daily claim, warnings and clearing warnings, plus the !pickles read.
+Users are drawn from a Zipf distribution, so a few popular users' rows are
+hit by most of the writes, as they are on a busy server.
+
+Each concurrency level runs for a fixed time and reports throughput, tail
+latency and errors per query, lock waits sampled from pg_stat_activity and
+deadlocks from pg_stat_database. Latency includes waiting for a pooled
+connection, so raise DB_POOL_MAX_SIZE to keep the pool out of the way.
+
+Needs a scratch PostgreSQL database; DATABASE_URL must point at it. Migrations
+are applied to it, and the rows the benchmark writes are deleted afterwards.
+
+Run from the repository root:
+    DATABASE_URL=postgresql://... python -m benchmarks.db_contention [--concurrency 1,8,32,64] [--skew 1.1]
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import time
+import asyncpg
+from cogs.moderation import WARN_USER, CLEAR_WARNINGS
+from cogs.pickle_tracking import ADD_PICKLE_COUNTS, CLAIM_DAILY, PICKLE_STATS, daily_claim_args
+from utils.config import config
+from utils.db_manager import db
+from utils.logger import logger
+from utils.metrics import Histogram
+from utils.migrations import apply_migrations
+
+# Rows written by the benchmark are marked so they can be removed afterwards
+USER_PREFIX = "bench-"
+GUILD_ID = "bench"
+
+SAMPLE_LOCKS = """
+    SELECT count(*) FILTER (WHERE wait_event_type = 'Lock') AS waiting,
+           coalesce(max(extract(epoch FROM now() - query_start)) FILTER (WHERE wait_event_type = 'Lock'), 0) AS longest
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid()
+"""
+DEADLOCKS = "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+CLEANUP = (
+    ("DELETE FROM pickle_counts WHERE user_id LIKE $1", USER_PREFIX + "%"),
+    ("DELETE FROM infractions WHERE guild_id = $1", GUILD_ID),
+)
+
+class ZipfUsers:
+    """Draws user ids so the k-th most active user is picked in proportion to 1/k^skew"""
+
+    def __init__(self, count, skew, seed):
+        self.ids = [f"{USER_PREFIX}{rank}" for rank in range(count)]
+        self.cumulative = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+        self.rng = random.Random(seed)
+
+    def draw(self):
+        return self.ids[bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+class Workload:
+    """The statement mix and how each one picks its arguments"""
+
+    def __init__(self, users, batch_size, mix):
+        self.users = users
+        self.batch_size = batch_size
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.daily_args = daily_claim_args(config.get("daily", {}))
+
+    def pick(self, rng):
+        return rng.choices(self.operations, self.weights)[0]
+
+    async def run(self, name):
+        if name == "pickle.add_counts":
+            # Keys stay in arrival order, as the CounterBuffer hands them over
+            batch = {}
+            for _ in range(self.batch_size):
+                user_id = self.users.draw()
+                batch[user_id] = batch.get(user_id, 0) + 1
+            await db.execute(ADD_PICKLE_COUNTS, list(batch.keys()), list(batch.values()))
+        elif name == "pickle.claim_daily":
+            await db.execute(CLAIM_DAILY, self.users.draw(), *self.daily_args)
+        elif name == "moderation.warn":
+            await db.execute(WARN_USER, GUILD_ID, self.users.draw(), "moderator", "load test")
+        elif name == "moderation.clear_warnings":
+            await db.execute(CLEAR_WARNINGS, GUILD_ID, self.users.draw(), "moderator")
+        elif name == "pickle.stats":
+            await db.execute(PICKLE_STATS, self.users.draw())
+
+class QueryStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.deadlocks = 0
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def client(workload, seed, deadline, stats):
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        name = workload.pick(rng)
+        query = stats.setdefault(name, QueryStats())
+        start = time.perf_counter()
+        try:
+            await workload.run(name)
+        except asyncpg.exceptions.DeadlockDetectedError:
+            query.deadlocks += 1
+        except Exception:
+            query.errors += 1
+        else:
+            query.latencies.append(time.perf_counter() - start)
+
+async def sample_locks(conn, interval, samples):
+    """Poll pg_stat_activity for sessions waiting on a lock"""
+    while True:
+        record = await conn.fetchrow(SAMPLE_LOCKS)
+        samples.append((record["waiting"], float(record["longest"])))
+        await asyncio.sleep(interval)
+
+async def run_level(workload, concurrency, duration, monitor):
+    stats = {}
+    samples = []
+    deadlocks_before = await monitor.fetchval(DEADLOCKS)
+    sampler = asyncio.create_task(sample_locks(monitor, 0.05, samples))
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(client(workload, seed, deadline, stats) for seed in range(concurrency)))
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - start
+    deadlocks = await monitor.fetchval(DEADLOCKS) - deadlocks_before
+
+    total = sum(len(query.latencies) for query in stats.values())
+    waiting = [count for count, _ in samples]
+    print(f"\nconcurrency {concurrency}: {total / elapsed:,.0f} ops/sec, "
+          f"{deadlocks} deadlock(s) reported by the server")
+    print(f"  lock waiters: avg {sum(waiting) / max(len(waiting), 1):.1f}, max {max(waiting, default=0)}, "
+          f"waiting in {sum(1 for count in waiting if count) / max(len(waiting), 1):.0%} of samples, "
+          f"longest wait {max((longest for _, longest in samples), default=0) * 1000:.0f} ms")
+    print(f"  pool acquire wait p99 {db.acquire_wait.quantile(0.99) * 1000:.1f} ms (bucketed)")
+    print(f"  {'query':<26} {'ops/sec':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} {'deadlocks':>10}")
+    for name, query in sorted(stats.items()):
+        latencies = query.latencies
+        print(f"  {name:<26} {len(latencies) / elapsed:>9,.0f} {percentile(latencies, 0.50) * 1000:>8.2f} "
+              f"{percentile(latencies, 0.95) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+              f"{max(latencies, default=0) * 1000:>8.2f} {query.errors:>7} {query.deadlocks:>10}")
+
+async def main(args):
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        print("Set DATABASE_URL to a scratch database to run this benchmark.")
+        return
+
+    mix = {
+        "pickle.add_counts": args.flush_weight,
+        "pickle.claim_daily": args.daily_weight,
+        "moderation.warn": args.warn_weight,
+        "moderation.clear_warnings": args.clear_weight,
+        "pickle.stats": args.read_weight,
+    }
+    workload = Workload(ZipfUsers(args.users, args.skew, args.seed), args.batch_size, mix)
+
+    await db.connect()
+    await apply_migrations(db)
+    monitor = await asyncpg.connect(url)
+    try:
+        print(f"{args.users} users, Zipf skew {args.skew}, batches of {args.batch_size}, "
+              f"{args.duration}s per level, pool max {db.pool.get_max_size()}")
+        for concurrency in args.concurrency:
+            db.acquire_wait = Histogram()
+            await run_level(workload, concurrency, args.duration, monitor)
+    finally:
+        for query, value in CLEANUP:
+            await monitor.execute(query, value)
+        await monitor.close()
+        await db.close()
+        logger.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=lambda value: [int(part) for part in value.split(",")], default=[1, 8, 32, 64],
+                        help="comma-separated client counts to run in turn")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent; 0 is uniform")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--batch-size", type=int, default=50, help="users per pickle buffer flush")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--flush-weight", type=float, default=20)
+    parser.add_argument("--daily-weight", type=float, default=20)
+    parser.add_argument("--warn-weight", type=float, default=15)
+    parser.add_argument("--clear-weight", type=float, default=5)
+    parser.add_argument("--read-weight", type=float, default=40)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,98 @@
+"""Measure round-trip and parse savings of named prepared statements and batch helpers.
+
+Needs a scratch PostgreSQL database; DATABASE_URL must point at it. The
+benchmark creates and drops its own bench_pickle_counts table.
+
+Run from the repository root:
+    DATABASE_URL=postgresql://... python -m benchmarks.db_queries [rows]
+"""
+import asyncio
+import os
+import sys
+import time
+import asyncpg
+from utils.db_manager import DatabaseManager
+
+SETUP = """
+    DROP TABLE IF EXISTS bench_pickle_counts;
+    CREATE TABLE bench_pickle_counts (user_id VARCHAR(32) PRIMARY KEY, count INTEGER DEFAULT 0);
+"""
+TEARDOWN = "DROP TABLE IF EXISTS bench_pickle_counts"
+
+UPSERT_ONE = """
+    INSERT INTO bench_pickle_counts(user_id, count)
+    VALUES($1, 1)
+    ON CONFLICT (user_id)
+    DO UPDATE SET count = bench_pickle_counts.count + 1
+"""
+UPSERT_MANY = """
+    INSERT INTO bench_pickle_counts(user_id, count)
+    SELECT * FROM UNNEST($1::VARCHAR(32)[], $2::INTEGER[])
+    ON CONFLICT (user_id)
+    DO UPDATE SET count = bench_pickle_counts.count + EXCLUDED.count
+"""
+
+async def timed(label, rows, coro_factory):
+    start = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed * 1000:>9.1f} ms {elapsed / rows * 1e6:>9.1f} us/row")
+
+async def main(rows):
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        print("Set DATABASE_URL to a scratch database to run this benchmark.")
+        return
+
+    manager = DatabaseManager()
+    await manager.connect()
+    named = manager.register_query("bench.upsert_one", UPSERT_ONE)
+    batch = manager.register_query("bench.upsert_many", UPSERT_MANY)
+    await manager.execute(SETUP)
+
+    # A pool without asyncpg's statement cache parses every query on the server
+    uncached_pool = await asyncpg.create_pool(url, statement_cache_size=0, min_size=1, max_size=1)
+    user_ids = [str(100000000000000000 + i % 500) for i in range(rows)]
+
+    try:
+        print(f"{rows} pickle increments over 500 users\n")
+
+        async def uncached():
+            for user_id in user_ids:
+                async with uncached_pool.acquire() as conn:
+                    await conn.execute(UPSERT_ONE, user_id)
+        await timed("raw SQL, no statement cache", rows, uncached)
+
+        async def raw():
+            for user_id in user_ids:
+                await manager.execute(UPSERT_ONE, user_id)
+        await timed("raw SQL, asyncpg statement cache", rows, raw)
+
+        async def prepared():
+            for user_id in user_ids:
+                await manager.execute(named, user_id)
+        await timed("named prepared statement", rows, prepared)
+
+        async def in_transaction():
+            async with manager.transaction() as tx:
+                for user_id in user_ids:
+                    await tx.execute(named, user_id)
+        await timed("named, one transaction / connection", rows, in_transaction)
+
+        async def many():
+            await manager.executemany(named, [(user_id,) for user_id in user_ids])
+        await timed("executemany (pipelined)", rows, many)
+
+        async def unnest():
+            totals = {}
+            for user_id in user_ids:
+                totals[user_id] = totals.get(user_id, 0) + 1
+            await manager.execute(batch, list(totals.keys()), list(totals.values()))
+        await timed("coalesced UNNEST upsert (1 round trip)", rows, unnest)
+    finally:
+        await manager.execute(TEARDOWN)
+        await uncached_pool.close()
+        await manager.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
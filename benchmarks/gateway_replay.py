@@ -0,0 +1,358 @@
+"""Replay a message stream through the real message hot path and measure it.
+
+Messages go through router.dispatch exactly as on_message hands them over,
+so the pickle reward subscriber, the command parser (bot.get_context) and the
+custom command fallback all run with the cogs loaded from cogs/. Discord is
+replaced by lightweight fake members, guilds and channels whose send() only
+counts replies, so the figures are handler cost without API round trips.
+Built-in commands are parsed but not invoked, since they need a gateway
+connection; unknown ones go to the fallbacks as in main.py.
+
+By default the database is an in-memory stand-in that answers the hot-path
+queries; with --postgres the replay runs against DATABASE_URL instead, which
+should be a scratch database (migrations are applied to it).
+
+A recorded stream can be given as a JSONL file of {"t": "MESSAGE_CREATE", "d": payload}
+dispatches; otherwise a synthetic stream of chat, pickle mentions and commands is used.
+Throughput and latency come from one pass, allocations from a second pass
+under tracemalloc, so tracing does not skew the timings.
+
+Run from the repository root:
+    python -m benchmarks.gateway_replay [messages.jsonl] [--postgres]
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from discord.ext import commands
+from main import create_bot
+from utils.db_manager import db
+from utils.logger import logger
+from utils.message_router import router
+from utils.migrations import apply_migrations
+
+# Only the cogs with message hot-path handlers are loaded
+HOT_PATH_COGS = ["cogs.pickle_tracking", "cogs.custom_commands"]
+
+BOT_USER_ID = 1
+GUILDS = 20
+USERS = 5000
+CHANNELS_PER_GUILD = 5
+MESSAGES = 50000
+
+CHAT_WORDS = [
+    "hey", "anyone", "playing", "tonight", "lol", "that", "was", "great", "what", "time",
+    "is", "the", "event", "sandwich", "lunch", "jar", "green", "crunchy", "snack", "ok",
+]
+PICKLE_WORDS = ["pickle", "pickles", "dill", "gherkin", "pickled"]
+
+# Commands seeded into every guild of the in-memory database
+CUSTOM_COMMANDS = {
+    "hello": "Hello {user}!",
+    "rules": "Please read the rules before posting in {channel}.",
+    "echo": "{user.name} says: {args}",
+    "welcome": "Welcome to {server}! This has been said {uses} times.",
+}
+
+class FakeUser:
+    """The parts of discord.Member the hot path reads"""
+
+    def __init__(self, user_id, name, bot=False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.bot = bot
+
+    def __str__(self):
+        return self.name
+
+class FakeGuild:
+    def __init__(self, guild_id, name):
+        self.id = guild_id
+        self.name = name
+
+class FakeChannel:
+    """A channel whose send() only counts what would have been sent"""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+
+class FakeMessage:
+    def __init__(self, message_id, content, author, guild, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        # Read by commands.Context; only used for API calls, which never happen here
+        self._state = None
+
+class ReplayContext(commands.Context):
+    """Context whose replies go to the fake channel instead of the HTTP API"""
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+class MemoryDatabase:
+    """In-memory stand-in for the DatabaseManager methods the hot path calls.
+
+    Queries are matched by their registered name. Anything else returns
+    nothing, as the real fetch helpers do on error.
+    """
+
+    def __init__(self):
+        self.pickle_counts = {}
+        self.custom_commands = {}
+        self.calls = {}
+
+    def seed_commands(self, guild_ids):
+        for guild_id in guild_ids:
+            self.custom_commands[str(guild_id)] = {name: [response, 0] for name, response in CUSTOM_COMMANDS.items()}
+
+    def install(self, manager):
+        """Route a DatabaseManager's query methods to this store"""
+        for name in ("execute", "executemany", "fetch", "fetchrow", "fetchval", "transaction", "listen", "unlisten"):
+            setattr(manager, name, getattr(self, name))
+        manager.pool = self
+
+    def _count(self, query):
+        key = query if query in db.queries else "other"
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+    async def fetch(self, query, *args, strict=False):
+        self._count(query)
+        if query == "pickle.add_counts":
+            rows = []
+            for user_id, amount in zip(*args):
+                self.pickle_counts[user_id] = self.pickle_counts.get(user_id, 0) + amount
+                rows.append({"user_id": user_id, "count": self.pickle_counts[user_id]})
+            return rows
+        if query == "pickle.top_counts":
+            ranked = sorted(self.pickle_counts.items(), key=lambda item: item[1], reverse=True)[:args[0]]
+            return [{"user_id": user_id, "count": count} for user_id, count in ranked]
+        if query == "custom_commands.load_guild":
+            return [
+                {"command_name": name, "command_response": response, "uses": uses}
+                for name, (response, uses) in self.custom_commands.get(args[0], {}).items()
+            ]
+        return []
+
+    async def fetchrow(self, query, *args, strict=False):
+        rows = await self.fetch(query, *args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, query, *args, strict=False):
+        self._count(query)
+        return None
+
+    async def execute(self, query, *args):
+        self._count(query)
+        if query == "custom_commands.add_uses":
+            for guild_id, name, amount in zip(*args):
+                command = self.custom_commands.get(guild_id, {}).get(name)
+                if command:
+                    command[1] += amount
+        return "OK"
+
+    async def executemany(self, query, args):
+        for row in args:
+            await self.execute(query, *row)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield self
+
+    async def listen(self, channel, callback):
+        pass
+
+    async def unlisten(self, channel):
+        pass
+
+def synthetic_stream(seed=11):
+    """Chat with a few pickle mentions and commands; a small set of users does most of the talking"""
+    rng = random.Random(seed)
+    users = list(range(10**17, 10**17 + USERS))
+    # Zipf-like activity: the n-th most active user posts about 1/n as often as the first
+    weights = [1 / (rank + 1) for rank in range(USERS)]
+    authors = rng.choices(users, weights, k=MESSAGES)
+
+    stream = []
+    for author_id in authors:
+        roll = rng.random()
+        words = [rng.choice(CHAT_WORDS) for _ in range(rng.randint(2, 18))]
+        if roll < 0.06:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(PICKLE_WORDS))
+            content = " ".join(words)
+        elif roll < 0.10:
+            name = rng.choice(list(CUSTOM_COMMANDS))
+            content = f"!{name} " + " ".join(words[:3])
+        elif roll < 0.11:
+            content = "!pickles"
+        elif roll < 0.12:
+            content = f"!{rng.choice(CHAT_WORDS)}"
+        else:
+            content = " ".join(words)
+        stream.append({
+            "content": content,
+            "author": {"id": str(author_id), "username": f"user{author_id}", "bot": roll > 0.995},
+            "guild_id": str(10**16 + author_id % GUILDS),
+            "channel_id": str(10**15 + author_id % (GUILDS * CHANNELS_PER_GUILD)),
+        })
+    return stream
+
+def load_stream(path):
+    with open(path) as f:
+        return [record["d"] for record in map(json.loads, f) if record.get("t") == "MESSAGE_CREATE"]
+
+def build_messages(stream):
+    """Turn payloads into fake messages, sharing one object per user, guild and channel"""
+    users, guilds, channels = {}, {}, {}
+    messages = []
+    for message_id, payload in enumerate(stream):
+        author = payload["author"]
+        user = users.get(author["id"])
+        if user is None:
+            user = users[author["id"]] = FakeUser(int(author["id"]), author.get("username", author["id"]), author.get("bot", False))
+
+        guild = None
+        if payload.get("guild_id"):
+            guild = guilds.get(payload["guild_id"])
+            if guild is None:
+                guild = guilds[payload["guild_id"]] = FakeGuild(int(payload["guild_id"]), f"Guild {payload['guild_id']}")
+
+        channel = channels.get(payload["channel_id"])
+        if channel is None:
+            channel = channels[payload["channel_id"]] = FakeChannel(int(payload["channel_id"]))
+        messages.append(FakeMessage(message_id, payload["content"], user, guild, channel))
+    return messages, list(guilds), list(channels.values())
+
+async def start_bot():
+    """Create the production bot, load the hot-path cogs and parse commands with ReplayContext"""
+    bot = create_bot()
+    bot._connection.user = FakeUser(BOT_USER_ID, "PickleJar", bot=True)
+    parsed_builtins = {"count": 0}
+
+    async def parse_commands(message, parsed):
+        ctx = await bot.get_context(message, cls=ReplayContext)
+        if ctx.command is None and ctx.invoked_with:
+            await router.run_command_fallbacks(ctx)
+        elif ctx.command is not None:
+            parsed_builtins["count"] += 1
+
+    # Same predicate as main.py's command subscriber
+    router.subscribe("commands", parse_commands, lambda parsed: parsed.is_command and not parsed.author_is_bot)
+    for cog in HOT_PATH_COGS:
+        await bot.load_extension(cog)
+    return bot, parsed_builtins
+
+async def stop_bot(bot):
+    # Unloading flushes the cogs' write buffers
+    for cog in HOT_PATH_COGS:
+        await bot.unload_extension(cog)
+    router.unsubscribe("commands")
+
+async def replay(messages, trace=False):
+    """Dispatch every message; returns per-message seconds, or (peak bytes, retained bytes) when tracing"""
+    latencies = []
+    peaks = []
+    if trace:
+        tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0] if trace else 0
+
+    for message in messages:
+        if trace:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await router.dispatch(message)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        else:
+            start = time.perf_counter()
+            await router.dispatch(message)
+            latencies.append(time.perf_counter() - start)
+
+    if trace:
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        return peaks, retained
+    return latencies
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_pass(stream, use_postgres, trace):
+    messages, guild_ids, channels = build_messages(stream)
+    memory = None
+    if not use_postgres:
+        memory = MemoryDatabase()
+        memory.seed_commands(guild_ids)
+        memory.install(db)
+
+    bot, parsed_builtins = await start_bot()
+    try:
+        start = time.perf_counter()
+        result = await replay(messages, trace)
+        elapsed = time.perf_counter() - start
+        # Read before stop_bot, which unsubscribes the handlers the stats belong to
+        subscriber_stats = router.stats()
+    finally:
+        await stop_bot(bot)
+    replies = sum(channel.sent for channel in channels)
+    return result, elapsed, replies, parsed_builtins["count"], memory, subscriber_stats
+
+async def main(args):
+    use_postgres = "--postgres" in args
+    paths = [arg for arg in args if not arg.startswith("--")]
+    stream = load_stream(paths[0]) if paths else synthetic_stream()
+
+    # Keep the console readable; the log file still receives every record
+    for handler in logger.listener.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.addFilter(lambda record: record.levelno >= logging.WARNING)
+
+    if use_postgres:
+        if not os.getenv("DATABASE_URL"):
+            print("Set DATABASE_URL to a scratch database to replay against Postgres.")
+            return
+        await db.connect()
+        await apply_migrations(db)
+
+    try:
+        print(f"Replaying {len(stream)} messages against {'Postgres' if use_postgres else 'the in-memory database'}\n")
+        latencies, elapsed, replies, builtins, memory, subscriber_stats = await run_pass(stream, use_postgres, trace=False)
+        print(f"throughput        {len(latencies) / elapsed:>12,.0f} msgs/sec")
+        print(f"latency p50       {percentile(latencies, 0.50) * 1e6:>12.1f} us")
+        print(f"latency p99       {percentile(latencies, 0.99) * 1e6:>12.1f} us")
+        print(f"latency max       {max(latencies) * 1e6:>12.1f} us")
+        print(f"replies sent      {replies:>12}")
+        print(f"built-ins parsed  {builtins:>12}")
+
+        print("\nPer subscriber:")
+        for name, stats in subscriber_stats.items():
+            print(f"  {name:<16} {stats['calls']:>8} calls {stats['avg_ms'] * 1000:>9.1f} us avg {stats['max_ms'] * 1000:>9.1f} us max {stats['errors']:>4} errors")
+        if memory is not None:
+            print("\nQueries:")
+            for name, calls in sorted(memory.calls.items()):
+                print(f"  {name:<28} {calls:>8}")
+
+        (peaks, retained), _, _, _, _, _ = await run_pass(stream, use_postgres, trace=True)
+        print(f"\nallocated/msg     {sum(peaks) / len(peaks) / 1024:>12.2f} KiB avg peak, p99 {percentile(peaks, 0.99) / 1024:.2f} KiB")
+        print(f"retained/msg      {retained / len(peaks):>12.1f} bytes")
+    finally:
+        if use_postgres:
+            await db.close()
+        logger.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+"""Compare gateway traffic and cache memory for the old all-intents profile and the cog-derived one.
+
+Replays a gateway event stream and counts what each profile would receive
+and keep. A recorded stream can be given as a JSONL file of {"t": event, "d": payload}
+dispatches; otherwise a synthetic stream shaped like a busy community is used.
+Retained memory is measured with tracemalloc over the decoded payloads
+kept in the member and presence caches, so it is an upper bound on what
+discord.py's slotted objects would hold, but the ratio between the profiles holds.
+
+Run from the repository root:
+    python -m benchmarks.intents_profile [events.jsonl]
+"""
+import json
+import random
+import sys
+import tracemalloc
+import discord
+from main import AVAILABLE_COGS
+from utils.capabilities import resolve_profile
+
+# Which intent the gateway requires before it sends each event
+EVENT_INTENTS = {
+    "GUILD_CREATE": "guilds",
+    "MESSAGE_CREATE": "guild_messages",
+    "MESSAGE_REACTION_ADD": "guild_reactions",
+    "TYPING_START": "guild_typing",
+    "PRESENCE_UPDATE": "presences",
+    "GUILD_MEMBER_ADD": "members",
+    "GUILD_MEMBER_UPDATE": "members",
+    "GUILD_MEMBERS_CHUNK": "members",
+    "VOICE_STATE_UPDATE": "voice_states",
+}
+
+GUILDS = 40
+MAX_MEMBERS = 3000
+MESSAGES = 20000
+PRESENCE_UPDATES = 60000
+TYPING = 8000
+REACTIONS = 4000
+MEMBER_UPDATES = 1500
+VOICE_UPDATES = 800
+
+def member_payload(rng, user_id):
+    return {
+        "user": {"id": str(user_id), "username": f"user{user_id}", "global_name": f"User {user_id}", "avatar": "a" * 32},
+        "nick": None if rng.random() < 0.7 else f"nick{user_id}",
+        "roles": [str(rng.randrange(10**17, 10**18)) for _ in range(rng.randint(0, 4))],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+    }
+
+def synthetic_stream(seed=7):
+    """A stream where presences dominate, as they do on real community servers"""
+    rng = random.Random(seed)
+    guild_members = {
+        10**17 + guild: [10**17 + guild * MAX_MEMBERS + i for i in range(rng.randint(MAX_MEMBERS // 10, MAX_MEMBERS))]
+        for guild in range(GUILDS)
+    }
+    events = []
+    for guild_id, members in guild_members.items():
+        events.append(("GUILD_CREATE", {"id": str(guild_id), "name": f"Guild {guild_id}", "member_count": len(members)}))
+        # What chunk_guilds_at_startup requests for every guild
+        for start in range(0, len(members), 1000):
+            events.append(("GUILD_MEMBERS_CHUNK", {
+                "guild_id": str(guild_id),
+                "members": [member_payload(rng, user_id) for user_id in members[start:start + 1000]],
+                "presences": [
+                    {"user": {"id": str(user_id)}, "status": "online", "activities": []}
+                    for user_id in members[start:start + 1000] if rng.random() < 0.3
+                ],
+            }))
+
+    guilds = list(guild_members)
+    weighted = (
+        [("MESSAGE_CREATE", MESSAGES), ("PRESENCE_UPDATE", PRESENCE_UPDATES), ("TYPING_START", TYPING),
+         ("MESSAGE_REACTION_ADD", REACTIONS), ("GUILD_MEMBER_UPDATE", MEMBER_UPDATES), ("VOICE_STATE_UPDATE", VOICE_UPDATES)]
+    )
+    live = []
+    for event, count in weighted:
+        for _ in range(count):
+            guild_id = rng.choice(guilds)
+            user_id = rng.choice(guild_members[guild_id])
+            if event == "MESSAGE_CREATE":
+                payload = {"guild_id": str(guild_id), "content": "some chat about pickles " * rng.randint(1, 4),
+                           "author": member_payload(rng, user_id)["user"], "member": member_payload(rng, user_id)}
+            elif event == "PRESENCE_UPDATE":
+                payload = {"guild_id": str(guild_id), "user": {"id": str(user_id)}, "status": rng.choice(["online", "idle", "dnd"]),
+                           "activities": [{"name": "a game", "type": 0, "created_at": 0}] if rng.random() < 0.5 else []}
+            elif event == "GUILD_MEMBER_UPDATE":
+                payload = dict(member_payload(rng, user_id), guild_id=str(guild_id))
+            else:
+                payload = {"guild_id": str(guild_id), "user_id": str(user_id), "channel_id": "1"}
+            live.append((event, payload))
+    rng.shuffle(live)
+    return events + live
+
+def load_stream(path):
+    with open(path) as f:
+        return [(record["t"], record["d"]) for record in map(json.loads, f) if record.get("t")]
+
+def replay(stream, intents, member_cache, chunk_at_startup):
+    """Return (events received, bytes received, retained cache bytes) for one profile"""
+    received = 0
+    received_bytes = 0
+    members = {}
+    presences = {}
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for event, payload in stream:
+        intent = EVENT_INTENTS.get(event)
+        if intent and not getattr(intents, intent):
+            continue
+        if event == "GUILD_MEMBERS_CHUNK" and not chunk_at_startup:
+            continue
+
+        # Bytes are measured on the wire encoding, then the payload is decoded as the client would
+        raw = json.dumps(payload)
+        received += 1
+        received_bytes += len(raw)
+        data = json.loads(raw)
+
+        guild_id = data.get("guild_id")
+        if event == "GUILD_MEMBERS_CHUNK" and member_cache.joined:
+            for member in data["members"]:
+                members[(guild_id, member["user"]["id"])] = member
+            if intents.presences:
+                for presence in data["presences"]:
+                    presences[(guild_id, presence["user"]["id"])] = presence
+        elif event in ("GUILD_MEMBER_ADD", "GUILD_MEMBER_UPDATE") and member_cache.joined:
+            members[(guild_id, data["user"]["id"])] = data
+        elif event == "PRESENCE_UPDATE" and intents.presences:
+            presences[(guild_id, data["user"]["id"])] = data
+        elif event == "MESSAGE_CREATE" and (member_cache.joined or member_cache.voice):
+            # Message authors are only kept when a member cache flag asks for them
+            members.setdefault((guild_id, data["author"]["id"]), data["member"])
+
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return received, received_bytes, retained, len(members)
+
+def main():
+    stream = load_stream(sys.argv[1]) if len(sys.argv) > 1 else synthetic_stream()
+    print(f"Replaying {len(stream)} gateway events\n")
+
+    all_intents = discord.Intents.all()
+    cog_intents, cog_member_cache, sources = resolve_profile(AVAILABLE_COGS)
+    profiles = [
+        ("all", all_intents, discord.MemberCacheFlags.from_intents(all_intents), True),
+        ("cogs", cog_intents, cog_member_cache, False),
+    ]
+
+    print(f"{'profile':>8} {'events':>9} {'MiB received':>13} {'cached members':>15} {'cache MiB':>10}")
+    results = {}
+    for name, intents, member_cache, chunk in profiles:
+        received, received_bytes, retained, cached = replay(stream, intents, member_cache, chunk)
+        results[name] = (received, received_bytes, retained)
+        print(f"{name:>8} {received:>9} {received_bytes / 2**20:>13.1f} {cached:>15} {retained / 2**20:>10.1f}")
+
+    all_events, all_bytes, all_retained = results["all"]
+    cog_events, cog_bytes, cog_retained = results["cogs"]
+    print(f"\nThe cog profile receives {cog_events / all_events:.0%} of the events and "
+          f"{cog_bytes / all_bytes:.0%} of the bytes, and keeps {cog_retained / max(all_retained, 1):.0%} of the cache")
+    print("Enabled by cogs: " + ", ".join(f"{flag} ({', '.join(owners)})" for flag, owners in sources.items()))
+
+if __name__ == "__main__":
+    main()
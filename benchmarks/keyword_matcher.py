@@ -0,0 +1,75 @@
+"""Compare the compiled KeywordMatcher against the old per-word substring loop.
+
+Run from the repository root:
+    python -m benchmarks.keyword_matcher
+"""
+import random
+import string
+import timeit
+from utils.keyword_matcher import KeywordMatcher
+
+TERM_COUNTS = [5, 50, 5000]
+MESSAGE_COUNT = 2000
+BASE_WORDS = ["pickle", "dill", "gherkin", "gherkins", "pickled"]
+
+def random_word(rng, min_len=4, max_len=10):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+def build_terms(rng, count):
+    terms = list(BASE_WORDS[:count])
+    while len(terms) < count:
+        terms.append(random_word(rng))
+    return terms
+
+def build_messages(rng, terms):
+    """Chat-like messages; roughly one in twenty mentions a configured term"""
+    messages = []
+    for _ in range(MESSAGE_COUNT):
+        words = [random_word(rng, 2, 8) for _ in range(rng.randint(3, 25))]
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(terms))
+        messages.append(" ".join(words))
+    return messages
+
+def legacy_loop(words, messages):
+    hits = 0
+    for content in messages:
+        content_lower = content.lower()
+        if any(word in content_lower for word in words):
+            hits += 1
+    return hits
+
+def compiled_matcher(matcher, messages):
+    hits = 0
+    for content in messages:
+        if matcher.search(content):
+            hits += 1
+    return hits
+
+def main():
+    rng = random.Random(42)
+    print(f"{'terms':>6} {'mode':>10} {'legacy us/msg':>14} {'matcher us/msg':>15} {'speedup':>8} {'compile ms':>11}")
+
+    for count in TERM_COUNTS:
+        terms = build_terms(rng, count)
+        messages = build_messages(rng, terms)
+        word_set = set(terms)
+
+        repeat = max(1, 200 // count) if count < 5000 else 1
+        legacy = min(timeit.repeat(lambda: legacy_loop(word_set, messages), number=repeat, repeat=3)) / repeat
+
+        for mode in ("substring", "word", "stem"):
+            compile_time = timeit.timeit(lambda: KeywordMatcher(terms, mode=mode), number=1)
+            matcher = KeywordMatcher(terms, mode=mode)
+            compiled = min(timeit.repeat(lambda: compiled_matcher(matcher, messages), number=repeat, repeat=3)) / repeat
+
+            print(
+                f"{count:>6} {mode:>10} "
+                f"{legacy / MESSAGE_COUNT * 1e6:>14.2f} "
+                f"{compiled / MESSAGE_COUNT * 1e6:>15.2f} "
+                f"{legacy / compiled:>7.1f}x "
+                f"{compile_time * 1000:>11.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
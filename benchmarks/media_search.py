@@ -0,0 +1,112 @@
+"""Time media searches over a large collection.
+
+Fills media_collections with generated titles, descriptions and tags, then runs
+the MediaFinder search and browse queries. Each one runs for the first page and
+for a page deep in the results, to show keyset paging costs no more than the
+first page. Prints the plan of the first search so index use can be checked.
+
+Needs a scratch PostgreSQL database; DATABASE_URL must point at it. Migrations
+are applied to it, and the generated rows are deleted afterwards.
+
+Run from the repository root:
+    DATABASE_URL=postgresql://... python -m benchmarks.media_search [rows]
+"""
+import asyncio
+import os
+import sys
+import time
+from cogs.media_finder import SEARCH_MEDIA, BROWSE_MEDIA
+from utils.db_manager import db
+from utils.logger import logger
+from utils.migrations import apply_migrations
+
+MARKER = "bench-media"
+REPEAT = 50
+PAGE_SIZE = 5
+
+# Titles, descriptions and tags are built from a small vocabulary, so every word matches many rows
+SEED = """
+    WITH words AS (
+        SELECT ARRAY['pickle', 'recipe', 'crunchy', 'dill', 'jar', 'brine', 'garlic', 'spicy', 'sweet',
+                     'fermented', 'cucumber', 'guide', 'video', 'review', 'homemade', 'quick', 'classic',
+                     'sandwich', 'burger', 'snack', 'vinegar', 'salt', 'history', 'festival', 'gherkin'] AS w
+    )
+    INSERT INTO media_collections(category, title, description, url, tags, added_by)
+    SELECT (ARRAY['videos', 'recipes', 'articles', 'images'])[1 + i % 4],
+           w[1 + (i * 7) % 25] || ' ' || w[1 + (i * 13) % 25] || ' ' || w[1 + (i / 25) % 25] || ' ' || i,
+           w[1 + (i * 3) % 25] || ' ' || w[1 + (i * 11) % 25] || ' ' || w[1 + (i * 17) % 25] || ' and ' || w[1 + (i / 7) % 25],
+           'https://example.com/media/' || i,
+           ARRAY[w[1 + (i * 5) % 25], w[1 + (i / 3) % 25]],
+           $2
+    FROM words, generate_series(1, $1) AS i
+"""
+CLEANUP = "DELETE FROM media_collections WHERE added_by = $1"
+
+# (label, query, args for the first page, function giving the cursor args from the last row)
+SEARCHES = [
+    ("text, one word", SEARCH_MEDIA, ["festival", None, None], lambda row: [row["rank"], row["id"]]),
+    ("text, two words", SEARCH_MEDIA, ["pickle recipe", None, None], lambda row: [row["rank"], row["id"]]),
+    ("text + tag", SEARCH_MEDIA, ["crunchy", ["garlic"], None], lambda row: [row["rank"], row["id"]]),
+    ("text + category", SEARCH_MEDIA, ["spicy", None, "videos"], lambda row: [row["rank"], row["id"]]),
+    ("tag only", BROWSE_MEDIA, [["brine"], None], lambda row: [row["id"]]),
+    ("category only", BROWSE_MEDIA, [None, "recipes"], lambda row: [row["id"]]),
+]
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def page_args(query, args, cursor):
+    """Query arguments for the page after cursor, fetching one extra row as the cog does"""
+    if cursor is None:
+        cursor = [None, None] if query == SEARCH_MEDIA else [None]
+    return args + cursor + [PAGE_SIZE + 1]
+
+async def timed(query, args):
+    latencies = []
+    records = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        records = await db.fetch(query, *args)
+        latencies.append(time.perf_counter() - start)
+    return latencies, records
+
+async def main(rows):
+    if not os.getenv("DATABASE_URL"):
+        print("Set DATABASE_URL to a scratch database to run this benchmark.")
+        return
+
+    await db.connect()
+    await apply_migrations(db)
+    try:
+        start = time.perf_counter()
+        await db.execute(SEED, rows, MARKER)
+        await db.execute("ANALYZE media_collections")
+        print(f"Inserted {rows} media rows in {time.perf_counter() - start:.1f}s\n")
+
+        label, query, args, _ = SEARCHES[0]
+        plan = await db.fetch("EXPLAIN " + db.queries[query], *page_args(query, args, None))
+        print(f"Plan for '{label}':")
+        print("\n".join("  " + record[0] for record in plan))
+
+        print(f"\n{'search':<20} {'page':>5} {'rows':>5} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, query, args, cursor_from in SEARCHES:
+            latencies, records = await timed(query, page_args(query, args, None))
+            print(f"{label:<20} {1:>5} {len(records):>5} {percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f}")
+
+            # Follow the cursors to page 20 (or the last page) and time that page
+            page, cursor = 1, None
+            while len(records) > PAGE_SIZE and page < 20:
+                cursor = cursor_from(records[PAGE_SIZE - 1])
+                records = await db.fetch(query, *page_args(query, args, cursor))
+                page += 1
+            if page > 1:
+                latencies, records = await timed(query, page_args(query, args, cursor))
+                print(f"{'':<20} {page:>5} {len(records):>5} {percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f}")
+    finally:
+        await db.execute(CLEANUP, MARKER)
+        await db.close()
+        logger.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 300000))
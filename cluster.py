@@ -0,0 +1,272 @@
+import asyncio
+import json
+import math
+import os
+import re
+import signal
+import sys
+import time
+import aiohttp
+from aiohttp import web
+from dotenv import load_dotenv
+from utils.config import config
+from utils.db_manager import db
+from utils.logger import logger
+from utils.migrations import apply_migrations
+
+# Load environment variables first
+load_dotenv()
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# One Prometheus sample line: name, optional {labels}, value
+SAMPLE_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$")
+
+async def recommended_shard_count(token):
+    """Ask Discord how many shards it recommends for this bot"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"}
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+def split_shards(shard_count, workers):
+    """Split shard ids into contiguous, near-equal ranges, one per worker"""
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+class Worker:
+    """One bot process running a range of shards, restarted if it exits unexpectedly"""
+
+    def __init__(self, worker_id, shard_ids, shard_count, port, pool_min_size, pool_max_size):
+        self.worker_id = worker_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.port = port
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.process = None
+        self.restarts = 0
+        self.stopping = False
+
+    def env(self):
+        env = dict(os.environ)
+        env.update({
+            "WORKER_ID": str(self.worker_id),
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARD_IDS": ",".join(str(shard_id) for shard_id in self.shard_ids),
+            "PORT": str(self.port),
+            "DB_POOL_MIN_SIZE": str(self.pool_min_size),
+            "DB_POOL_MAX_SIZE": str(self.pool_max_size),
+            "SKIP_MIGRATIONS": "1",
+        })
+        return env
+
+    async def run(self):
+        """Run the worker process, restarting it with backoff until stopped"""
+        backoff = 1
+        while not self.stopping:
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(ROOT_DIR, "main.py"), cwd=ROOT_DIR, env=self.env()
+            )
+            logger.log(f"Worker {self.worker_id} started (pid {self.process.pid}, shards {self.shard_ids[0]}-{self.shard_ids[-1]}, port {self.port})")
+            code = await self.process.wait()
+            if self.stopping:
+                break
+
+            # Reset the backoff once a worker has stayed up for a while
+            if time.monotonic() - started > 60:
+                backoff = 1
+            self.restarts += 1
+            logger.log(f"Worker {self.worker_id} exited with code {code}, restarting in {backoff}s", "error")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def stop(self, timeout=30):
+        """Ask the worker to shut down cleanly, killing it after timeout seconds"""
+        self.stopping = True
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.log(f"Worker {self.worker_id} did not exit in {timeout}s, killing it", "warning")
+            self.process.kill()
+            await self.process.wait()
+
+class Cluster:
+    """Starts the workers and serves their health and metrics from one port"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.session = None
+
+    async def fetch(self, worker, path, timeout=3):
+        """Return (status, body) from a worker's web server, or (None, error) if it is unreachable"""
+        try:
+            async with self.session.get(
+                f"http://127.0.0.1:{worker.port}{path}", timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                return response.status, await response.text()
+        except Exception as e:
+            return None, str(e)
+
+    async def health_check(self, request):
+        running = sum(1 for worker in self.workers if worker.process and worker.process.returncode is None)
+        return web.Response(text=f"{running}/{len(self.workers)} workers running")
+
+    async def readiness_check(self, request):
+        """Ready only when every worker reports ready"""
+        results = await asyncio.gather(*(self.fetch(worker, "/ready") for worker in self.workers))
+        checks = {}
+        ready = True
+        for worker, (status, body) in zip(self.workers, results):
+            if status is None:
+                checks[str(worker.worker_id)] = {"worker": "unreachable"}
+            else:
+                try:
+                    checks[str(worker.worker_id)] = json.loads(body)
+                except ValueError:
+                    checks[str(worker.worker_id)] = {"worker": body}
+            ready = ready and status == 200
+        return web.Response(
+            status=200 if ready else 503,
+            text=json.dumps(checks),
+            content_type="application/json"
+        )
+
+    async def metrics_endpoint(self, request):
+        """Merge every worker's metrics, adding a worker label to each sample"""
+        results = await asyncio.gather(*(self.fetch(worker, "/metrics") for worker in self.workers))
+        families = {}
+        for worker, (status, body) in zip(self.workers, results):
+            if status == 200:
+                merge_metrics(families, body, worker.worker_id)
+
+        lines = []
+        for family in families.values():
+            lines.extend(family["meta"])
+            lines.extend(family["samples"])
+        return web.Response(text="\n".join(lines) + "\n", content_type="text/plain", charset="utf-8")
+
+    async def start_web_server(self, port):
+        self.session = aiohttp.ClientSession()
+        app = web.Application()
+        app.add_routes([
+            web.get('/', self.health_check),
+            web.get('/ready', self.readiness_check),
+            web.get('/metrics', self.metrics_endpoint)
+        ])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '0.0.0.0', port)
+        await site.start()
+        logger.log(f"Cluster web server started on port {port}")
+        return runner
+
+    async def close(self):
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        if self.session:
+            await self.session.close()
+
+def merge_metrics(families, text, worker_id):
+    """Add one worker's Prometheus output to families, grouping samples under their metric"""
+    family = None
+    for line in text.splitlines():
+        if not line:
+            continue
+        if line.startswith("#"):
+            parts = line.split(None, 3)
+            if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                family = families.setdefault(parts[2], {"meta": [], "samples": []})
+                if len(family["meta"]) < 2:
+                    family["meta"].append(line)
+            continue
+
+        match = SAMPLE_LINE.match(line)
+        if not match or family is None:
+            continue
+        name, labels, value = match.groups()
+        worker_label = f'worker="{worker_id}"'
+        if labels and labels != "{}":
+            labels = "{" + worker_label + "," + labels[1:]
+        else:
+            labels = "{" + worker_label + "}"
+        family["samples"].append(f"{name}{labels} {value}")
+
+async def main():
+    """Apply migrations once, then run the shard workers until interrupted"""
+    token = os.getenv("DISCORD_BOT_TOKEN")
+    if not token:
+        logger.log("No bot token found in environment variables. Please set DISCORD_BOT_TOKEN in .env file.", "error")
+        return
+
+    settings = config.get("sharding", {})
+    shard_count = settings.get("shard_count") or await recommended_shard_count(token)
+    worker_count = settings.get("workers") or os.cpu_count() or 1
+    shard_ranges = split_shards(shard_count, worker_count)
+
+    # Split the connection budget so the whole cluster stays within pool_max_size
+    database = config.get("database", {})
+    pool_max_size = max(1, math.ceil(database.get("pool_max_size", 10) / len(shard_ranges)))
+    pool_min_size = min(pool_max_size, max(1, math.ceil(database.get("pool_min_size", 2) / len(shard_ranges))))
+
+    # Migrate here so workers start against an up-to-date schema
+    if await db.connect(required=False):
+        try:
+            applied = await apply_migrations(db)
+            logger.log(f"Database schema up to date ({applied} migration(s) applied)")
+        finally:
+            await db.close()
+
+    base_port = int(os.getenv("PORT", 8080))
+    workers = [
+        Worker(worker_id, shard_ids, shard_count, base_port + 1 + worker_id, pool_min_size, pool_max_size)
+        for worker_id, shard_ids in enumerate(shard_ranges)
+    ]
+    logger.log(f"Starting {len(workers)} workers for {shard_count} shards")
+
+    cluster = Cluster(workers)
+    runner = await cluster.start_web_server(base_port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    # Pass SIGHUP on so every worker reloads config.json
+    def reload_workers():
+        for worker in workers:
+            if worker.process and worker.process.returncode is None:
+                worker.process.send_signal(signal.SIGHUP)
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_workers)
+    except (NotImplementedError, AttributeError):
+        pass
+
+    tasks = [asyncio.create_task(worker.run()) for worker in workers]
+    try:
+        await stop.wait()
+    finally:
+        logger.log("Stopping cluster...")
+        await cluster.close()
+        for task in tasks:
+            task.cancel()
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,8 +2,14 @@ import discord
 from discord.ext import commands
 from utils.db_manager import db
 from utils.logger import logger
+from utils.config import config, ConfigError
+from utils.permissions import ensure_muted_role
 import asyncio
 
+# Gateway capabilities this cog relies on; member counts come from guild metadata
+INTENTS = ()
+MEMBER_CACHE = ()
+
 class AdminTools(commands.Cog):
     """Administrative tools for server management"""
 
@@ -20,7 +26,7 @@ class AdminTools(commands.Cog):
     async def stats(self, ctx):
         """Display bot statistics"""
         server_count = len(self.bot.guilds)
-        user_count = sum(guild.member_count for guild in self.bot.guilds)
+        user_count = sum(guild.member_count or 0 for guild in self.bot.guilds)
         channel_count = sum(len(guild.channels) for guild in self.bot.guilds)
         
         embed = discord.Embed(
@@ -32,6 +38,21 @@ class AdminTools(commands.Cog):
         embed.add_field(name="Channels", value=channel_count, inline=True)
         embed.add_field(name="Bot Version", value="1.0.0", inline=True)
         embed.add_field(name="Discord.py Version", value=discord.__version__, inline=True)
+
+        # Report database pool utilisation
+        db_stats = db.stats()
+        if db_stats.get("pool"):
+            pool = db_stats["pool"]
+            embed.add_field(name="DB Connections", value=f"{pool['size'] - pool['idle']}/{pool['max']} in use", inline=True)
+            embed.add_field(name="DB Acquire p99", value=f"{db_stats['acquire_wait']['p99_ms']:.1f}ms", inline=True)
+
+        # Report the pickle write-behind buffer if pickle tracking is loaded
+        pickle_cog = self.bot.get_cog("PickleTracking")
+        if pickle_cog:
+            buffer_stats = pickle_cog.pickle_buffer.stats()
+            embed.add_field(name="Pending Pickle Writes", value=buffer_stats["pending_increments"], inline=True)
+            embed.add_field(name="Last Flush", value=f"{buffer_stats['last_flush_ms']}ms", inline=True)
+            embed.add_field(name="Active Cooldowns", value=pickle_cog.user_cooldowns.stats()["entries"], inline=True)
         
         await ctx.send(embed=embed)
 
@@ -67,6 +88,20 @@ class AdminTools(commands.Cog):
             await ctx.send(f"Failed to reload `{cog}`: {str(e)}")
             logger.log(f"Failed to reload cog {cog}: {str(e)}", "error")
 
+    @commands.command(name="reloadconfig")
+    @commands.is_owner()
+    async def reload_config(self, ctx):
+        """Reload config.json without restarting (owner only)"""
+        try:
+            changed = config.reload()
+        except ConfigError as e:
+            await ctx.send(f"Config not reloaded, still on version {config.version}: {str(e)}")
+            logger.log(f"Config reload rejected: {str(e)}", "error")
+            return
+        
+        sections = ", ".join(f"`{section}`" for section in changed) or "nothing"
+        await ctx.send(f"Config reloaded (version {config.version}). Changed: {sections}")
+
     @commands.command(name="announce")
     @commands.has_permissions(administrator=True)
     async def announce(self, ctx, channel: discord.TextChannel, *, message: str):
@@ -110,6 +145,20 @@ class AdminTools(commands.Cog):
             else:
                 await ctx.send("All required roles already exist.")
             
+            # Set up the Muted role and its channel overwrites in one bulk pass
+            status = await ctx.send("Checking the Muted role...")
+            
+            async def report_progress(result):
+                await status.edit(content=f"Setting up the Muted role... {result.done}/{result.total} channels")
+            
+            muted_role, result = await ensure_muted_role(ctx.guild, reason="Server setup", progress=report_progress)
+            if result:
+                await status.edit(content=f"Muted role created: {result.summary()}.")
+                for channel, error in result.failed[:5]:
+                    await ctx.send(f"Couldn't update {channel.mention}: {error}")
+            else:
+                await status.edit(content="Muted role already exists.")
+            
             await ctx.send("Server setup completed successfully!")
         except Exception as e:
             await ctx.send(f"Error during server setup: {str(e)}")
@@ -2,13 +2,65 @@ import discord
 from discord.ext import commands
 from utils.db_manager import db
 from utils.logger import logger
-import datetime
+from utils.leaderboard import TopKLeaderboard
+from utils.name_resolver import name_resolver
+from utils.cache import TTLCache
+
+# Gateway capabilities this cog relies on
+INTENTS = ()
+MEMBER_CACHE = ()
+
+# Record a recognition, bump its weekly/monthly rollups and the all-time count
+# in one statement, so all three commit together in a single round trip
+RECORD_RECOGNITION = db.register_query("recognition.record", """
+    WITH recognition AS (
+        INSERT INTO recognitions(from_user, to_user, message)
+        VALUES($1, $2, $3)
+        RETURNING to_user, created_at
+    ), rollups AS (
+        INSERT INTO recognition_rollups(period, period_start, user_id, count)
+        SELECT p.period, date_trunc(p.period, recognition.created_at)::date, recognition.to_user, 1
+        FROM recognition, (VALUES ('week'), ('month')) AS p(period)
+        ON CONFLICT (period, period_start, user_id)
+        DO UPDATE SET count = recognition_rollups.count + 1
+    )
+    INSERT INTO recognition_counts(user_id, count)
+    SELECT to_user, 1 FROM recognition
+    ON CONFLICT (user_id)
+    DO UPDATE SET count = recognition_counts.count + 1
+    RETURNING count
+""")
+TOP_RECOGNITION_COUNTS = db.register_query(
+    "recognition.top_counts",
+    "SELECT user_id, count FROM recognition_counts ORDER BY count DESC LIMIT $1"
+)
+TOP_RECOGNITION_ROLLUPS = db.register_query("recognition.top_rollups", """
+    SELECT user_id, count FROM recognition_rollups
+    WHERE period = $1 AND period_start = date_trunc($1, LOCALTIMESTAMP)::date
+    ORDER BY count DESC
+    LIMIT $2
+""")
+RECOGNITION_COUNT = db.register_query(
+    "recognition.count",
+    "SELECT count FROM recognition_counts WHERE user_id = $1"
+)
+
+# Leaderboard periods and their titles; week and month are served from the rollups
+LEADERBOARD_PERIODS = {
+    "week": "This Week's",
+    "month": "This Month's",
+    "all": "All-Time",
+}
 
 class CommunityRecognition(commands.Cog):
     """Commands for recognizing community members"""
 
     def __init__(self, bot):
         self.bot = bot
+        # All-time leaderboard served from memory; kept current by store_recognition
+        self.leaderboard = TopKLeaderboard(k=10)
+        # Weekly and monthly boards are read from the rollups and cached briefly
+        self.period_boards = TTLCache(max_entries=len(LEADERBOARD_PERIODS), ttl=60)
 
     @commands.command(name="recognize", aliases=["thank", "thanks"])
     async def recognize(self, ctx, member: discord.Member, *, message="No description"):
@@ -29,68 +81,20 @@ class CommunityRecognition(commands.Cog):
         logger.log(f"{ctx.author} recognized {member}: {message}")
         
         try:
-            # Store recognition in database
+            # Store the recognition and update every count at once
             await self.store_recognition(ctx.author.id, member.id, message)
-            
-            # Update recognition count
-            await self.update_recognition_count(member.id)
         except Exception as e:
             logger.log(f"Error storing recognition: {str(e)}", "error")
 
     async def store_recognition(self, from_id, to_id, message):
-        """Store recognition details in database"""
-        try:
-            # Ensure table exists
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS recognitions (
-                    id SERIAL PRIMARY KEY,
-                    from_user VARCHAR(32) NOT NULL,
-                    to_user VARCHAR(32) NOT NULL,
-                    message TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            
-            # Insert recognition
-            await db.execute(
-                """
-                INSERT INTO recognitions(from_user, to_user, message, created_at)
-                VALUES($1, $2, $3, $4)
-                """,
-                str(from_id), str(to_id), message, datetime.datetime.now()
-            )
-        except Exception as e:
-            logger.log(f"Error in store_recognition: {str(e)}", "error")
-            raise
-
-    async def update_recognition_count(self, user_id):
-        """Update recognition count for a user"""
-        try:
-            # Create table if it doesn't exist
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS recognition_counts (
-                    user_id VARCHAR(32) PRIMARY KEY,
-                    count INTEGER DEFAULT 0
-                )
-                """
-            )
-            
-            # Update count
-            await db.execute(
-                """
-                INSERT INTO recognition_counts(user_id, count)
-                VALUES($1, 1)
-                ON CONFLICT (user_id)
-                DO UPDATE SET count = recognition_counts.count + 1
-                """,
-                str(user_id)
-            )
-        except Exception as e:
-            logger.log(f"Error in update_recognition_count: {str(e)}", "error")
-            raise
+        """Store a recognition and update the all-time, weekly and monthly counts"""
+        new_count = await db.fetchval(RECORD_RECOGNITION, str(from_id), str(to_id), message)
+        if new_count is None:
+            return
+        
+        self.leaderboard.update(str(to_id), new_count)
+        # Let the next weekly/monthly leaderboard request see this straight away
+        self.period_boards.clear()
 
     @commands.command(name="recognitions", aliases=["thanks_received"])
     async def recognition_count(self, ctx, member: discord.Member = None):
@@ -100,10 +104,7 @@ class CommunityRecognition(commands.Cog):
         
         try:
             # Get recognition count
-            count = await db.fetchval(
-                "SELECT count FROM recognition_counts WHERE user_id = $1",
-                user_id
-            ) or 0
+            count = await db.fetchval(RECOGNITION_COUNT, user_id) or 0
             
             if count == 0:
                 await ctx.send(f"{target.mention} hasn't been recognized yet.")
@@ -115,41 +116,32 @@ class CommunityRecognition(commands.Cog):
             await ctx.send("I couldn't retrieve the recognition count at this time.")
 
     @commands.command(name="recognition_leaderboard", aliases=["top_recognized"])
-    async def recognition_leaderboard(self, ctx):
-        """Show the most recognized community members"""
+    async def recognition_leaderboard(self, ctx, period: str = "all"):
+        """Show the most recognized community members this week, this month or of all time"""
+        period = period.lower()
+        if period not in LEADERBOARD_PERIODS:
+            await ctx.send(f"Choose one of: {', '.join(LEADERBOARD_PERIODS)}")
+            return
+        
         try:
-            # Ensure table exists
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS recognition_counts (
-                    user_id VARCHAR(32) PRIMARY KEY,
-                    count INTEGER DEFAULT 0
-                )
-                """
-            )
-            
-            # Get top 10 recognized users
-            results = await db.fetch(
-                "SELECT user_id, count FROM recognition_counts ORDER BY count DESC LIMIT 10"
-            )
+            results = await self.top_recognized(period)
             
             if not results:
-                await ctx.send("No one has been recognized yet!")
+                message = "No one has been recognized yet!" if period == "all" else f"No one has been recognized this {period} yet!"
+                await ctx.send(message)
                 return
                 
             embed = discord.Embed(
-                title="🏆 Recognition Leaderboard",
+                title=f"🏆 {LEADERBOARD_PERIODS[period]} Recognition Leaderboard",
                 description="Most recognized community members",
                 color=discord.Color.gold()
             )
             
-            for i, record in enumerate(results, 1):
-                user_id = record["user_id"]
-                count = record["count"]
+            # Resolve every name in one batch instead of row by row
+            names = await name_resolver.resolve_many(self.bot, [user_id for user_id, _ in results])
                 
-                # Try to get user
-                user = self.bot.get_user(int(user_id))
-                name = user.name if user else f"User {user_id}"
+            for i, (user_id, count) in enumerate(results, 1):
+                name = names[user_id]
                 
                 # Add medal emoji for top 3
                 medal = ""
@@ -174,5 +166,22 @@ class CommunityRecognition(commands.Cog):
             logger.log(f"Error retrieving recognition leaderboard: {str(e)}", "error")
             await ctx.send("I couldn't retrieve the recognition leaderboard at this time.")
 
+    async def top_recognized(self, period):
+        """Return the top 10 (user_id, count) for a leaderboard period"""
+        if period == "all":
+            # Seed the in-memory leaderboard if needed; a failed read raises and leaves it unseeded
+            if self.leaderboard.needs_seed and db.pool:
+                records = await db.fetch(TOP_RECOGNITION_COUNTS, self.leaderboard.capacity, strict=True)
+                self.leaderboard.seed((record["user_id"], record["count"]) for record in records)
+            return self.leaderboard.top()
+        
+        results = self.period_boards.get(period)
+        if results is None:
+            # Strict, so an error is reported rather than cached as an empty board
+            records = await db.fetch(TOP_RECOGNITION_ROLLUPS, period, self.leaderboard.k, strict=True)
+            results = [(record["user_id"], record["count"]) for record in records]
+            self.period_boards.set(period, results)
+        return results
+
 async def setup(bot):
     await bot.add_cog(CommunityRecognition(bot))
\ No newline at end of file
@@ -1,119 +1,227 @@
 import discord
+import sys
+import uuid
 from discord.ext import commands
 from utils.db_manager import db
 from utils.logger import logger
+from utils.config import config
+from utils.message_router import router
+from utils.metrics import metrics
+from utils.guild_cache import GuildCache
+from utils.templates import Template, TemplateError
+from utils.write_buffer import CounterBuffer
+
+# Gateway capabilities this cog relies on
+INTENTS = ("guild_messages", "message_content")
+MEMBER_CACHE = ()
+
+# Postgres channel used to tell other bot processes a guild's commands changed
+NOTIFY_CHANNEL = "custom_commands"
+# Lets this process ignore its own notifications; it updates its cache directly
+INSTANCE_ID = uuid.uuid4().hex
+
+LOAD_GUILD_COMMANDS = db.register_query(
+    "custom_commands.load_guild",
+    "SELECT command_name, command_response, uses FROM custom_commands WHERE guild_id = $1"
+)
+# Writes notify in the same statement, so the NOTIFY is sent exactly when the change commits
+SAVE_COMMAND = db.register_query("custom_commands.save", """
+    WITH saved AS (
+        INSERT INTO custom_commands(guild_id, command_name, command_response, created_by)
+        VALUES($1, $2, $3, $4)
+        ON CONFLICT (guild_id, command_name)
+        DO UPDATE SET command_response = $3, created_by = $4
+        RETURNING guild_id, uses
+    )
+    SELECT uses, pg_notify('custom_commands', guild_id || ':' || $5::text) FROM saved
+""")
+DELETE_COMMAND = db.register_query("custom_commands.delete", """
+    WITH removed AS (
+        DELETE FROM custom_commands WHERE guild_id = $1 AND command_name = $2
+        RETURNING guild_id
+    )
+    SELECT guild_id, pg_notify('custom_commands', guild_id || ':' || $3::text) FROM removed
+""")
+ADD_COMMAND_USES = db.register_query("custom_commands.add_uses", """
+    UPDATE custom_commands AS c
+    SET uses = c.uses + u.amount
+    FROM UNNEST($1::VARCHAR(32)[], $2::TEXT[], $3::INTEGER[]) AS u(guild_id, command_name, amount)
+    WHERE c.guild_id = u.guild_id AND c.command_name = u.command_name
+""")
+
+# Placeholders a response may use, each rendered from (ctx, command)
+RESPONSE_FIELDS = {
+    "user": lambda ctx, command: ctx.author.mention,
+    "user.name": lambda ctx, command: ctx.author.display_name,
+    "channel": lambda ctx, command: ctx.channel.mention,
+    "server": lambda ctx, command: ctx.guild.name,
+    "args": lambda ctx, command: ctx.view.read_rest().strip(),
+    "uses": lambda ctx, command: command.uses,
+}
+
+class CustomCommand:
+    """A saved custom command with its response compiled to a template"""
+
+    __slots__ = ("name", "template", "uses")
+
+    def __init__(self, name, template, uses=0):
+        self.name = name
+        self.template = template
+        self.uses = uses
+
+    @classmethod
+    def compile(cls, name, response, uses=0):
+        """Compile a response, raising TemplateError for unknown placeholders"""
+        return cls(name, Template(response, allowed=RESPONSE_FIELDS), uses)
+
+    @classmethod
+    def load(cls, name, response, uses=0):
+        """Compile a stored response; ones saved before templating may contain stray braces, kept as text"""
+        try:
+            return cls.compile(name, response, uses)
+        except TemplateError:
+            return cls(name, Template(response.replace("{", "{{").replace("}", "}}")), uses)
+
+    def render(self, ctx):
+        values = {field: RESPONSE_FIELDS[field](ctx, self) for field in self.template.fields}
+        return self.template.render(values)
+
+def commands_size(guild_commands):
+    """Approximate memory used by one guild's command dict"""
+    return sys.getsizeof(guild_commands) + sum(
+        sys.getsizeof(name) + command.template.size() for name, command in guild_commands.items()
+    )
 
 class CustomCommands(commands.Cog):
     """Allows users to create and use custom commands"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.custom_commands = {}
-        # Instead of creating a task here, add a listener for on_ready
-        self.bot.add_listener(self.on_ready_load_commands, "on_ready")
+        # Guilds are loaded on first use and the least recently used are dropped past the budget
+        self.custom_commands = GuildCache(
+            "custom_commands",
+            self.load_guild_commands,
+            commands_size,
+            max_bytes=config.get("custom_commands", {}).get("cache_max_bytes", 4_000_000)
+        )
+        # Batch use counters instead of writing once per invocation
+        self.uses_buffer = CounterBuffer(
+            "custom_command_uses",
+            self.flush_uses,
+            interval=config.get("custom_commands", {}).get("uses_flush_interval_seconds", 10)
+        )
 
-    async def on_ready_load_commands(self):
-        """Load commands when the bot is ready"""
-        await self.load_commands()
+    async def cog_load(self):
+        """Handle unknown commands and receive cache invalidations"""
+        self.uses_buffer.start()
+        router.add_command_fallback("custom_commands", self.handle_unknown_command)
+        if db.pool:
+            await db.listen(NOTIFY_CHANNEL, self.on_commands_changed)
 
-    async def load_commands(self):
-        """Load custom commands from the database"""
-        try:
-            # Create the table if it doesn't exist
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS custom_commands (
-                    guild_id VARCHAR(32),
-                    command_name TEXT,
-                    command_response TEXT,
-                    created_by VARCHAR(32),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (guild_id, command_name)
-                )
-                """
+        metrics.gauge(
+            "picklejar_custom_command_cache_bytes", "Approximate size of cached custom commands",
+            lambda: self.custom_commands.total_bytes
+        )
+        metrics.gauge(
+            "picklejar_custom_command_cache_guilds", "Guilds with custom commands in the cache",
+            lambda: len(self.custom_commands)
+        )
+
+    async def cog_unload(self):
+        """Stop handling commands and write out pending use counts"""
+        router.remove_command_fallback("custom_commands")
+        await db.unlisten(NOTIFY_CHANNEL)
+        for name in ("picklejar_custom_command_cache_bytes", "picklejar_custom_command_cache_guilds"):
+            metrics.unregister(name)
+        await self.uses_buffer.close()
+
+    async def load_guild_commands(self, guild_id):
+        """Load one guild's custom commands from the database, compiling each response"""
+        # A failed load must raise rather than be cached as a guild with no commands
+        results = await db.fetch(LOAD_GUILD_COMMANDS, guild_id, strict=True)
+        return {
+            record['command_name']: CustomCommand.load(
+                record['command_name'],
+                record['command_response'],
+                record['uses'] + self.uses_buffer.pending_for((guild_id, record['command_name']))
             )
-            
-            # Load all commands
-            results = await db.fetch("SELECT guild_id, command_name, command_response FROM custom_commands")
-            
-            for record in results:
-                guild_id = record['guild_id']
-                command_name = record['command_name']
-                command_response = record['command_response']
-                
-                if guild_id not in self.custom_commands:
-                    self.custom_commands[guild_id] = {}
-                    
-                self.custom_commands[guild_id][command_name] = command_response
-                
-            logger.log(f"Loaded {len(results)} custom commands")
-        except Exception as e:
-            logger.log(f"Error loading custom commands: {str(e)}", "error")
+            for record in results
+        }
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Check for custom command invocations"""
-        if message.author.bot:
-            return
-            
-        # Only process in guilds
-        if not message.guild:
-            return
-            
-        # Check if message starts with ! (command prefix)
-        if not message.content.startswith('!'):
-            return
-            
-        guild_id = str(message.guild.id)
-        
-        # Extract command name (remove prefix and get first word)
-        command_parts = message.content[1:].split()
-        if not command_parts:
+    async def flush_uses(self, batch):
+        """Write buffered use counts in one statement"""
+        guild_ids, names, amounts = [], [], []
+        for (guild_id, name), amount in batch.items():
+            guild_ids.append(guild_id)
+            names.append(name)
+            amounts.append(amount)
+        await db.execute(ADD_COMMAND_USES, guild_ids, names, amounts)
+
+    def on_commands_changed(self, payload):
+        """Drop a guild's cached commands after another process changed them"""
+        if payload is None:
+            # The listener reconnected and may have missed changes
+            self.custom_commands.clear()
             return
-            
-        command_name = command_parts[0].lower()
-        
-        # Check if this is a custom command for this guild
-        if (guild_id in self.custom_commands and 
-            command_name in self.custom_commands[guild_id]):
-            
-            response = self.custom_commands[guild_id][command_name]
-            await message.channel.send(response)
-            logger.log(f"Custom command '{command_name}' used by {message.author}")
+
+        guild_id, _, instance_id = payload.partition(":")
+        if instance_id != INSTANCE_ID:
+            self.custom_commands.invalidate(guild_id)
+
+    async def handle_unknown_command(self, ctx):
+        """Answer a prefixed message the bot's parser found no command for"""
+        if ctx.guild is None or not db.pool:
+            return False
+
+        guild_id = str(ctx.guild.id)
+        guild_commands = await self.custom_commands.get(guild_id)
+        command = guild_commands.get(ctx.invoked_with.lower())
+        if command is None:
+            return False
+
+        command.uses += 1
+        self.uses_buffer.add((guild_id, command.name))
+        await ctx.send(command.render(ctx))
+        logger.log(f"Custom command '{command.name}' used by {ctx.author}", category="custom_command", guild_id=guild_id)
+        return True
 
     @commands.command(name="addcmd")
     @commands.has_permissions(manage_messages=True)
     async def add_command(self, ctx, command_name: str, *, response: str):
         """Add a custom command"""
-        # Validate command name
-        if command_name in [c.name for c in self.bot.commands]:
-            await ctx.send(f"'{command_name}' is already a built-in command!")
-            return
-            
         # Remove ! prefix if user included it
         if command_name.startswith('!'):
             command_name = command_name[1:]
             
         command_name = command_name.lower()
+        
+        # Validate command name; built-in commands always win in dispatch
+        if self.bot.get_command(command_name):
+            await ctx.send(f"'{command_name}' is already a built-in command!")
+            return
         guild_id = str(ctx.guild.id)
         
+        # Compile the response now so invocations only fill in placeholders
         try:
-            # Store in database
-            await db.execute(
-                """
-                INSERT INTO custom_commands(guild_id, command_name, command_response, created_by)
-                VALUES($1, $2, $3, $4)
-                ON CONFLICT (guild_id, command_name)
-                DO UPDATE SET command_response = $3, created_by = $4
-                """,
-                guild_id, command_name, response, str(ctx.author.id)
-            )
+            command = CustomCommand.compile(command_name, response)
+        except TemplateError as e:
+            placeholders = ", ".join(f"`{{{name}}}`" for name in RESPONSE_FIELDS)
+            await ctx.send(f"{e}. Available placeholders: {placeholders}")
+            return
+        
+        try:
+            # Store in database and notify other processes
+            saved = await db.fetchrow(SAVE_COMMAND, guild_id, command_name, response, str(ctx.author.id), INSTANCE_ID, strict=True)
+            command.uses = saved['uses'] + self.uses_buffer.pending_for((guild_id, command_name))
             
-            # Update local cache
-            if guild_id not in self.custom_commands:
-                self.custom_commands[guild_id] = {}
-                
-            self.custom_commands[guild_id][command_name] = response
+            # Update local cache if this guild is loaded
+            guild_commands = self.custom_commands.peek(guild_id)
+            if guild_commands is not None:
+                guild_commands[command_name] = command
+                self.custom_commands.resize(guild_id)
+            else:
+                # A load in flight may have read the commands from before this change
+                self.custom_commands.invalidate(guild_id)
             
             await ctx.send(f"Custom command `!{command_name}` has been added!")
             logger.log(f"{ctx.author} added custom command '{command_name}'")
@@ -132,21 +240,21 @@ class CustomCommands(commands.Cog):
         command_name = command_name.lower()
         guild_id = str(ctx.guild.id)
         
-        # Check if command exists
-        if (guild_id not in self.custom_commands or 
-            command_name not in self.custom_commands[guild_id]):
-            await ctx.send(f"Custom command `!{command_name}` doesn't exist!")
-            return
-            
         try:
-            # Remove from database
-            await db.execute(
-                "DELETE FROM custom_commands WHERE guild_id = $1 AND command_name = $2",
-                guild_id, command_name
-            )
+            # Remove from database and notify other processes
+            deleted = await db.fetchrow(DELETE_COMMAND, guild_id, command_name, INSTANCE_ID, strict=True)
+            if deleted is None:
+                await ctx.send(f"Custom command `!{command_name}` doesn't exist!")
+                return
             
-            # Remove from local cache
-            del self.custom_commands[guild_id][command_name]
+            # Remove from local cache if this guild is loaded
+            guild_commands = self.custom_commands.peek(guild_id)
+            if guild_commands is not None:
+                guild_commands.pop(command_name, None)
+                self.custom_commands.resize(guild_id)
+            else:
+                # As in addcmd, keep a load in flight from caching the deleted command
+                self.custom_commands.invalidate(guild_id)
             
             await ctx.send(f"Custom command `!{command_name}` has been deleted!")
             logger.log(f"{ctx.author} deleted custom command '{command_name}'")
@@ -157,13 +265,13 @@ class CustomCommands(commands.Cog):
     @commands.command(name="listcmds")
     async def list_commands(self, ctx):
         """List all custom commands in this server"""
-        guild_id = str(ctx.guild.id)
+        guild_commands = await self.custom_commands.get(str(ctx.guild.id))
         
-        if guild_id not in self.custom_commands or not self.custom_commands[guild_id]:
+        if not guild_commands:
             await ctx.send("This server doesn't have any custom commands yet!")
             return
             
-        commands_list = sorted(self.custom_commands[guild_id].keys())
+        commands_list = sorted(guild_commands.keys())
         
         # Create embed with command list
         embed = discord.Embed(
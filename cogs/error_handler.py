@@ -4,6 +4,10 @@ import traceback
 import sys
 from utils.logger import logger
 
+# Gateway capabilities this cog relies on
+INTENTS = ()
+MEMBER_CACHE = ()
+
 class ErrorHandler(commands.Cog):
     """A cog for global error handling."""
 
@@ -0,0 +1,164 @@
+import discord
+from discord.ext import commands
+from utils.db_manager import db
+from utils.logger import logger
+from utils.config import config
+from utils.cache import TTLCache
+from utils.pagination import KeysetPaginator
+
+# Gateway capabilities this cog relies on
+INTENTS = ()
+MEMBER_CACHE = ()
+
+# Ranked full-text search, keyset-paginated on (rank, id) so later pages never
+# rescan earlier ones. Matching uses the search_vector GIN index and tags @> the tags index.
+SEARCH_MEDIA = db.register_query("media.search", """
+    SELECT id, category, title, description, url, tags, rank
+    FROM (
+        SELECT id, category, title, description, url, tags,
+               ts_rank_cd(search_vector, query) AS rank
+        FROM media_collections, websearch_to_tsquery('english', $1) AS query
+        WHERE approved
+          AND search_vector @@ query
+          AND ($2::TEXT[] IS NULL OR tags @> $2)
+          AND ($3::TEXT IS NULL OR category = $3)
+    ) AS matches
+    WHERE $4::REAL IS NULL OR (rank, id) < ($4, $5::INTEGER)
+    ORDER BY rank DESC, id DESC
+    LIMIT $6
+""")
+# Without search words results are listed newest first, paginated on id
+BROWSE_MEDIA = db.register_query("media.browse", """
+    SELECT id, category, title, description, url, tags
+    FROM media_collections
+    WHERE approved
+      AND ($1::TEXT[] IS NULL OR tags @> $1)
+      AND ($2::TEXT IS NULL OR category = $2)
+      AND ($3::INTEGER IS NULL OR id < $3)
+    ORDER BY id DESC
+    LIMIT $4
+""")
+ADD_MEDIA = db.register_query("media.add", """
+    INSERT INTO media_collections(category, title, url, tags, added_by)
+    VALUES($1, $2, $3, $4, $5)
+    RETURNING id
+""")
+
+def parse_search(text):
+    """Split search text into (words, tags, category); #tag and category:<name> are filters"""
+    words, tags, category = [], [], None
+    for token in text.split():
+        if token.startswith("#") and len(token) > 1:
+            tags.append(token[1:].lower())
+        elif token.lower().startswith("category:") and len(token) > 9:
+            category = token[9:].lower()
+        else:
+            words.append(token)
+    return " ".join(words), tags, category
+
+class MediaFinder(commands.Cog):
+    """Search the shared media collection by text, tags and category"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        settings = config.get("media_finder", {})
+        self.page_size = settings.get("page_size", 5)
+        # The same search is often repeated or paged back and forth within seconds
+        self.results = TTLCache(
+            max_entries=settings.get("cache_max_entries", 500),
+            ttl=settings.get("cache_ttl_seconds", 30)
+        )
+
+    async def search_page(self, words, tags, category, cursor):
+        """Return (records, next_cursor) for one page of results, cached briefly"""
+        key = (words, tags, category, cursor)
+        page = self.results.get(key)
+        if page is not None:
+            return page
+
+        tag_filter = list(tags) or None
+        # Fetch one extra row to tell whether there is another page; strict so an
+        # error is reported to the user rather than cached as "no results"
+        if words:
+            rank, last_id = cursor or (None, None)
+            records = await db.fetch(SEARCH_MEDIA, words, tag_filter, category, rank, last_id, self.page_size + 1, strict=True)
+        else:
+            records = await db.fetch(BROWSE_MEDIA, tag_filter, category, cursor, self.page_size + 1, strict=True)
+
+        next_cursor = None
+        if len(records) > self.page_size:
+            records = records[:self.page_size]
+            last = records[-1]
+            next_cursor = (last['rank'], last['id']) if words else last['id']
+
+        page = (records, next_cursor)
+        self.results.set(key, page)
+        return page
+
+    @commands.command(name="media", aliases=["findmedia"])
+    async def media(self, ctx, *, query: str = ""):
+        """Search media by words, #tags and category:<name>"""
+        words, tags, category = parse_search(query)
+        if not (words or tags or category):
+            await ctx.send("Tell me what to look for, e.g. `!media pickle recipes #cooking category:videos`")
+            return
+        # Tags are a set for matching, so order them for a stable cache key
+        tags = tuple(sorted(set(tags)))
+
+        try:
+            first_page = await self.search_page(words, tags, category, None)
+        except Exception as e:
+            logger.log(f"Error searching media: {str(e)}", "error")
+            await ctx.send("I couldn't search the media collection at this time.")
+            return
+
+        if not first_page[0]:
+            await ctx.send("No media matched that search.")
+            return
+
+        async def fetch_page(cursor):
+            records, next_cursor = first_page if cursor is None else await self.search_page(words, tags, category, cursor)
+            embed = discord.Embed(
+                title=f"🔎 Media results for {query[:200]}",
+                color=discord.Color.blue()
+            )
+            for record in records:
+                details = [record['url']]
+                if record['description']:
+                    details.insert(0, record['description'][:150])
+                if record['tags']:
+                    details.append(" ".join(f"#{tag}" for tag in record['tags']))
+                embed.add_field(
+                    name=f"{record['title']} ({record['category']}, ID {record['id']})",
+                    value="\n".join(details),
+                    inline=False
+                )
+            return embed, next_cursor
+
+        if first_page[1] is None:
+            embed, _ = await fetch_page(None)
+            await ctx.send(embed=embed)
+        else:
+            await KeysetPaginator(fetch_page, ctx.author.id).start(ctx)
+
+    @commands.command(name="addmedia")
+    @commands.has_permissions(manage_messages=True)
+    async def add_media(self, ctx, category: str, url: str, *, title_and_tags: str):
+        """Add media to the collection: !addmedia <category> <url> <title> [#tag ...]"""
+        title, tags, _ = parse_search(title_and_tags)
+        if not title:
+            await ctx.send("Please give the media a title.")
+            return
+
+        try:
+            media_id = await db.fetchval(ADD_MEDIA, category.lower(), title, url, tags or None, str(ctx.author.id), strict=True)
+            # New media should show up in searches straight away
+            self.results.clear()
+            await ctx.send(f"Added **{title}** to {category.lower()} (ID {media_id}).")
+            logger.log(f"{ctx.author} added media '{title}' to {category.lower()}")
+        except Exception as e:
+            logger.log(f"Error adding media: {str(e)}", "error")
+            await ctx.send("Failed to add the media.")
+
+async def setup(bot):
+    await bot.add_cog(MediaFinder(bot))
@@ -3,22 +3,153 @@ from discord.ext import commands
 from utils.db_manager import db
 from utils.logger import logger
 from utils.config import config
+from utils.scheduler import ExpiryScheduler
+from utils.permissions import ensure_muted_role
+from utils.pagination import KeysetPaginator
+from utils.sharding import owns_guild
+from utils.capabilities import get_or_fetch_member
+from utils.name_resolver import name_resolver
 import datetime
 
+# Gateway capabilities this cog relies on; members are fetched on demand instead of cached
+INTENTS = ()
+MEMBER_CACHE = ()
+
+# Record a warning and bump the counter in one atomic statement
+WARN_USER = db.register_query("moderation.warn", """
+    WITH infraction AS (
+        INSERT INTO infractions(guild_id, user_id, moderator_id, kind, reason)
+        VALUES($1, $2, $3, 'warn', $4)
+    )
+    INSERT INTO pickle_counts(user_id, warnings)
+    VALUES($2, 1)
+    ON CONFLICT (user_id)
+    DO UPDATE SET warnings = pickle_counts.warnings + 1
+    RETURNING warnings
+""")
+CLEAR_WARNINGS = db.register_query("moderation.clear_warnings", """
+    WITH infraction AS (
+        INSERT INTO infractions(guild_id, user_id, moderator_id, kind, reason)
+        VALUES($1, $2, $3, 'clear', 'Warnings cleared')
+    )
+    UPDATE pickle_counts
+    SET warnings = 0
+    WHERE user_id = $2
+""")
+RECORD_INFRACTION = db.register_query("moderation.record_infraction", """
+    INSERT INTO infractions(guild_id, user_id, moderator_id, kind, reason)
+    VALUES($1, $2, $3, $4, $5)
+""")
+# Keyset pagination: each page starts below the last infraction id already shown
+INFRACTION_PAGE = db.register_query("moderation.infraction_page", """
+    SELECT id, moderator_id, kind, reason, created_at
+    FROM infractions
+    WHERE guild_id = $1 AND user_id = $2 AND ($3::BIGINT IS NULL OR id < $3)
+    ORDER BY id DESC
+    LIMIT $4
+""")
+INFRACTIONS_PER_PAGE = 5
+
 class Moderation(commands.Cog):
     """Commands for server moderation"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.default_warning_reason = config.get("moderation", {}).get(
-            "default_warning_reason", "Breaking server rules"
-        )
-        self.warning_thresholds = config.get("moderation", {}).get("warning_thresholds", {
+        self.on_config_changed(config.get("moderation", {}), None)
+        # Timed mutes are persisted in the mutes table and expired by one shared timer
+        self.mute_scheduler = ExpiryScheduler("mutes", self.expire_mute)
+
+    def on_config_changed(self, settings, previous):
+        """Apply the moderation section at startup and after a config reload"""
+        self.default_warning_reason = settings.get("default_warning_reason", "Breaking server rules")
+        self.warning_thresholds = settings.get("warning_thresholds", {
             "3": "mute",
             "5": "kick",
             "7": "ban"
         })
-        self.auto_punish = config.get("moderation", {}).get("auto_punish", False)
+        self.auto_punish = settings.get("auto_punish", False)
+
+    async def cog_load(self):
+        """Reload pending mute expiries and start the expiry timer"""
+        self.mute_scheduler.start()
+        config.subscribe("moderation", self.on_config_changed)
+        try:
+            records = await db.fetch("SELECT guild_id, user_id, expires_at FROM mutes")
+            # In a cluster, only track mutes for guilds on this worker's shards
+            records = [record for record in records if owns_guild(self.bot, record["guild_id"])]
+            for record in records:
+                self.mute_scheduler.schedule((record["guild_id"], record["user_id"]), record["expires_at"].timestamp())
+            if records:
+                logger.log(f"Reloaded {len(records)} pending mute expiries")
+        except Exception as e:
+            logger.log(f"Failed to reload pending mutes: {str(e)}", "error")
+
+    async def cog_unload(self):
+        """Stop the expiry timer; pending mutes stay in the database"""
+        config.unsubscribe("moderation", self.on_config_changed)
+        await self.mute_scheduler.stop()
+
+    async def expire_mute(self, key):
+        """Remove the Muted role once a timed mute has run out"""
+        guild_id, user_id = key
+        await self.bot.wait_until_ready()
+
+        guild = self.bot.get_guild(int(guild_id))
+        if not guild:
+            # Not a guild this bot (or shard) can see; leave the row for whoever can
+            return
+
+        # Without a database the scheduler is the only record of the mute
+        record = None
+        if db.pool:
+            record = await db.fetchrow(
+                "SELECT channel_id, expires_at FROM mutes WHERE guild_id = $1 AND user_id = $2",
+                guild_id, user_id,
+                strict=True
+            )
+            if record is None:
+                # The mute was already lifted, or made permanent; the role must stay
+                return
+            if record["expires_at"] > datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=5):
+                # Another process extended the mute; follow the new expiry instead
+                self.mute_scheduler.schedule(key, record["expires_at"].timestamp())
+                return
+
+        # Anything failing from here raises, and the scheduler retries with the row still in place
+        muted_role = discord.utils.get(guild.roles, name="Muted")
+        member = await get_or_fetch_member(guild, user_id)
+        unmuted = member is not None and muted_role is not None and muted_role in member.roles
+        if unmuted:
+            await member.remove_roles(muted_role, reason="Mute duration expired")
+
+        if db.pool:
+            # Only clear the row once the role is gone, and not if a longer mute replaced it meanwhile
+            await db.execute(
+                """
+                DELETE FROM mutes
+                WHERE guild_id = $1 AND user_id = $2 AND expires_at <= now() + INTERVAL '5 seconds'
+                """,
+                guild_id, user_id
+            )
+
+        if unmuted:
+            logger.log(f"{member} was unmuted (mute duration expired)")
+            channel = guild.get_channel(int(record["channel_id"])) if record and record["channel_id"] else None
+            if channel:
+                try:
+                    await channel.send(f"{member.mention} has been unmuted (mute duration expired).")
+                except discord.HTTPException as e:
+                    logger.log(f"Failed to announce expired mute for {member}: {str(e)}", "warning")
+
+    async def record_infraction(self, ctx, member, kind, reason):
+        """Add a moderation action to the member's infraction history"""
+        try:
+            await db.execute(
+                RECORD_INFRACTION,
+                str(ctx.guild.id), str(member.id), str(ctx.author.id), kind, reason
+            )
+        except Exception as e:
+            logger.log(f"Failed to record {kind} infraction for {member}: {str(e)}", "error")
 
     @commands.command(name="ban")
     @commands.has_permissions(ban_members=True)
@@ -29,6 +160,7 @@ class Moderation(commands.Cog):
             
             # Log the ban
             logger.log(f"{ctx.author} banned {member} for: {reason}")
+            await self.record_infraction(ctx, member, "ban", reason)
             
             # Send confirmation
             embed = discord.Embed(
@@ -68,6 +200,7 @@ class Moderation(commands.Cog):
             
             # Log the kick
             logger.log(f"{ctx.author} kicked {member} for: {reason}")
+            await self.record_infraction(ctx, member, "kick", reason)
             
             # Send confirmation
             embed = discord.Embed(
@@ -108,25 +241,14 @@ class Moderation(commands.Cog):
         user_id = str(member.id)
         
         try:
-            # Get current warning count
-            current_warnings = await db.fetchval(
-                "SELECT warnings FROM pickle_counts WHERE user_id = $1",
-                user_id
-            ) or 0
-            
-            # Increment warnings
-            new_warnings = current_warnings + 1
-            
-            # Update in database
-            await db.execute(
-                """
-                INSERT INTO pickle_counts(user_id, warnings)
-                VALUES($1, $2)
-                ON CONFLICT (user_id)
-                DO UPDATE SET warnings = $2
-                """,
-                user_id, new_warnings
+            # Record the infraction and get the new count in one round trip
+            new_warnings = await db.fetchval(
+                WARN_USER,
+                str(ctx.guild.id), user_id, str(ctx.author.id), reason
             )
+            if new_warnings is None:
+                await ctx.send("I couldn't record the warning at this time.")
+                return
             
             # Log the warning
             logger.log(f"{ctx.author} warned {member} (Warning #{new_warnings}): {reason}")
@@ -166,40 +288,42 @@ class Moderation(commands.Cog):
 
     async def check_auto_punish(self, ctx, member, warning_count):
         """Check if auto-punishment should be applied based on warning count"""
-        warning_count_str = str(warning_count)
-        
         # Check if this warning count triggers a punishment
-        for threshold, action in self.warning_thresholds.items():
-            if warning_count_str == threshold:
-                if action == "mute":
-                    # Example implementation - this requires a mute role to be set up
-                    try:
-                        mute_role = discord.utils.get(ctx.guild.roles, name="Muted")
-                        if mute_role:
-                            await member.add_roles(mute_role)
-                            await ctx.send(f"{member.mention} has been automatically muted for reaching {warning_count} warnings.")
-                    except Exception as e:
-                        logger.log(f"Failed to auto-mute: {str(e)}", "error")
-                
-                elif action == "kick":
-                    try:
-                        await member.kick(reason=f"Automatic kick: Reached {warning_count} warnings")
-                        await ctx.send(f"{member.mention} has been automatically kicked for reaching {warning_count} warnings.")
-                    except Exception as e:
-                        logger.log(f"Failed to auto-kick: {str(e)}", "error")
-                
-                elif action == "ban":
-                    try:
-                        await member.ban(reason=f"Automatic ban: Reached {warning_count} warnings")
-                        await ctx.send(f"{member.mention} has been automatically banned for reaching {warning_count} warnings.")
-                    except Exception as e:
-                        logger.log(f"Failed to auto-ban: {str(e)}", "error")
+        action = self.warning_thresholds.get(str(warning_count))
+        if not action:
+            return
+            
+        if action == "mute":
+            # Example implementation - this requires a mute role to be set up
+            try:
+                mute_role = discord.utils.get(ctx.guild.roles, name="Muted")
+                if mute_role:
+                    await member.add_roles(mute_role)
+                    await ctx.send(f"{member.mention} has been automatically muted for reaching {warning_count} warnings.")
+            except Exception as e:
+                logger.log(f"Failed to auto-mute: {str(e)}", "error")
+        
+        elif action == "kick":
+            try:
+                await member.kick(reason=f"Automatic kick: Reached {warning_count} warnings")
+                await ctx.send(f"{member.mention} has been automatically kicked for reaching {warning_count} warnings.")
+            except Exception as e:
+                logger.log(f"Failed to auto-kick: {str(e)}", "error")
+        
+        elif action == "ban":
+            try:
+                await member.ban(reason=f"Automatic ban: Reached {warning_count} warnings")
+                await ctx.send(f"{member.mention} has been automatically banned for reaching {warning_count} warnings.")
+            except Exception as e:
+                logger.log(f"Failed to auto-ban: {str(e)}", "error")
 
     @commands.command(name="warnings")
+    @commands.guild_only()
     async def get_warnings(self, ctx, member: discord.Member = None):
-        """Check warnings for a user"""
+        """Check warnings and infraction history for a user"""
         target = member or ctx.author
         user_id = str(target.id)
+        guild_id = str(ctx.guild.id)
         
         try:
             # Get warning count
@@ -208,11 +332,40 @@ class Moderation(commands.Cog):
                 user_id
             ) or 0
             
+            # Fetch one extra row to know whether an older page exists
+            first_page = await db.fetch(INFRACTION_PAGE, guild_id, user_id, None, INFRACTIONS_PER_PAGE + 1)
+            
+            async def fetch_page(cursor):
+                if cursor is None:
+                    records = first_page
+                else:
+                    records = await db.fetch(INFRACTION_PAGE, guild_id, user_id, cursor, INFRACTIONS_PER_PAGE + 1)
+                has_more = len(records) > INFRACTIONS_PER_PAGE
+                records = records[:INFRACTIONS_PER_PAGE]
+                
+                embed = discord.Embed(
+                    title=f"Infractions for {target}",
+                    description=f"{target.mention} has {warnings} warning(s).",
+                    color=discord.Color.gold()
+                )
+                # Members aren't cached, so resolve the page's moderators in one batch
+                moderator_names = await name_resolver.resolve_many(
+                    self.bot, list({record["moderator_id"] for record in records})
+                )
+                for record in records:
+                    embed.add_field(
+                        name=f"#{record['id']} {record['kind'].title()}",
+                        value=f"{record['reason']}\nBy {moderator_names[record['moderator_id']]} {discord.utils.format_dt(record['created_at'], 'R')}",
+                        inline=False
+                    )
+                next_cursor = records[-1]["id"] if has_more else None
+                return embed, next_cursor
+            
             # Send response
-            if warnings == 0:
+            if warnings == 0 and not first_page:
                 await ctx.send(f"{target.mention} has no warnings! 🎉")
             else:
-                await ctx.send(f"{target.mention} has {warnings} warning(s).")
+                await KeysetPaginator(fetch_page, ctx.author.id).start(ctx)
                 
         except Exception as e:
             logger.log(f"Error retrieving warnings: {str(e)}", "error")
@@ -225,15 +378,8 @@ class Moderation(commands.Cog):
         user_id = str(member.id)
         
         try:
-            # Update database
-            await db.execute(
-                """
-                UPDATE pickle_counts
-                SET warnings = 0
-                WHERE user_id = $1
-                """,
-                user_id
-            )
+            # Reset the counter and record the clear in the infraction history
+            await db.execute(CLEAR_WARNINGS, str(ctx.guild.id), user_id, str(ctx.author.id))
             
             # Log action
             logger.log(f"{ctx.author} cleared all warnings for {member}")
@@ -250,24 +396,47 @@ class Moderation(commands.Cog):
     async def mute_user(self, ctx, member: discord.Member, duration: int = 10, *, reason="No reason provided"):
         """Mute a user for a specified number of minutes"""
         try:
-            # Check for Muted role
+            # Check for Muted role, creating it across all channels if needed
             muted_role = discord.utils.get(ctx.guild.roles, name="Muted")
             if not muted_role:
-                # Create role if it doesn't exist
-                muted_role = await ctx.guild.create_role(name="Muted", reason="Mute command used but no Muted role existed")
+                status = await ctx.send("Setting up the Muted role...")
                 
-                # Set permissions for the role
-                for channel in ctx.guild.channels:
-                    try:
-                        await channel.set_permissions(muted_role, send_messages=False, speak=False)
-                    except:
-                        pass
+                async def report_progress(result):
+                    await status.edit(content=f"Setting up the Muted role... {result.done}/{result.total} channels")
+                
+                muted_role, result = await ensure_muted_role(
+                    ctx.guild,
+                    reason="Mute command used but no Muted role existed",
+                    progress=report_progress
+                )
+                await status.edit(content=f"Muted role created: {result.summary()}.")
             
-            # Add role to user
+            # Store the expiry before adding the role, so a failed write leaves the member unmuted
+            # rather than muted with nothing to lift it; the expiry survives restarts
+            guild_id, user_id = str(ctx.guild.id), str(member.id)
+            if duration > 0:
+                expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=duration)
+                await db.execute(
+                    """
+                    INSERT INTO mutes(guild_id, user_id, channel_id, muted_by, reason, expires_at)
+                    VALUES($1, $2, $3, $4, $5, $6)
+                    ON CONFLICT (guild_id, user_id)
+                    DO UPDATE SET channel_id = $3, muted_by = $4, reason = $5, expires_at = $6
+                    """,
+                    guild_id, user_id, str(ctx.channel.id), str(ctx.author.id), reason, expires_at
+                )
+                self.mute_scheduler.schedule((guild_id, user_id), expires_at.timestamp())
+            else:
+                # A permanent mute replaces any earlier timed one, which must not lift it
+                await db.execute("DELETE FROM mutes WHERE guild_id = $1 AND user_id = $2", guild_id, user_id)
+                self.mute_scheduler.cancel((guild_id, user_id))
+            
+            # Add role to user; if this fails the scheduled expiry just clears the row
             await member.add_roles(muted_role, reason=reason)
             
             # Log the mute
             logger.log(f"{ctx.author} muted {member} for {duration} minutes: {reason}")
+            await self.record_infraction(ctx, member, "mute", f"{reason} ({duration} minutes)")
             
             # Send confirmation
             embed = discord.Embed(
@@ -280,16 +449,6 @@ class Moderation(commands.Cog):
             
             await ctx.send(embed=embed)
             
-            # Schedule unmute
-            if duration > 0:
-                # Import needed here to avoid circular imports
-                import asyncio
-                await asyncio.sleep(duration * 60)
-                # Check if still muted
-                if muted_role in member.roles:
-                    await member.remove_roles(muted_role, reason="Mute duration expired")
-                    await ctx.send(f"{member.mention} has been unmuted (mute duration expired).")
-                
         except discord.Forbidden:
             await ctx.send("I don't have permission to manage roles.")
         except Exception as e:
@@ -312,8 +471,13 @@ class Moderation(commands.Cog):
                 await ctx.send(f"{member.mention} is not currently muted!")
                 return
                 
-            # Remove muted role
+            # Remove muted role and any pending expiry
             await member.remove_roles(muted_role, reason=reason)
+            self.mute_scheduler.cancel((str(ctx.guild.id), str(member.id)))
+            await db.execute(
+                "DELETE FROM mutes WHERE guild_id = $1 AND user_id = $2",
+                str(ctx.guild.id), str(member.id)
+            )
             
             # Log the unmute
             logger.log(f"{ctx.author} unmuted {member}: {reason}")
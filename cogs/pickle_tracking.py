@@ -1,79 +1,251 @@
 import discord
 from discord.ext import commands
+import os
 import random
-import time
+from datetime import datetime, timedelta, timezone
 from utils.db_manager import db
 from utils.logger import logger
 from utils.config import config
+from utils.write_buffer import CounterBuffer
+from utils.keyword_matcher import KeywordMatcher
+from utils.cooldowns import CooldownStore
+from utils.leaderboard import TopKLeaderboard
+from utils.name_resolver import name_resolver
+from utils.message_router import router
+from utils.metrics import metrics
+from utils.sharding import per_worker, owns_guild
+
+# Gateway capabilities this cog relies on: it reads every message for pickle words
+INTENTS = ("guild_messages", "dm_messages", "message_content")
+MEMBER_CACHE = ()
+
+# Hot-path queries, prepared once per pooled connection
+ADD_PICKLE_COUNTS = db.register_query("pickle.add_counts", """
+    INSERT INTO pickle_counts(user_id, count)
+    SELECT * FROM UNNEST($1::VARCHAR(32)[], $2::INTEGER[])
+    ON CONFLICT (user_id)
+    DO UPDATE SET count = pickle_counts.count + EXCLUDED.count
+    RETURNING user_id, count
+""")
+TOP_PICKLE_COUNTS = db.register_query(
+    "pickle.top_counts",
+    "SELECT user_id, count FROM pickle_counts ORDER BY count DESC LIMIT $1"
+)
+PICKLE_STATS = db.register_query(
+    "pickle.stats",
+    "SELECT count, coins FROM pickle_counts WHERE user_id = $1"
+)
+# Pay the daily reward only if the last claim is at least $3 old. A streak continues
+# when the previous claim is within $4 and adds $5 per day, up to $6. Competing
+# claims queue on the row lock and re-check last_daily, so only one is paid.
+# The outer SELECT always returns a row: coins is NULL when the claim was refused.
+CLAIM_DAILY = db.register_query("pickle.claim_daily", """
+    WITH claim AS (
+        INSERT INTO pickle_counts(user_id, coins, last_daily, daily_streak)
+        VALUES($1, $2, now(), 1)
+        ON CONFLICT (user_id) DO UPDATE SET
+            coins = pickle_counts.coins + $2 + least(
+                CASE WHEN pickle_counts.last_daily > now() - $4::interval THEN pickle_counts.daily_streak ELSE 0 END * $5,
+                $6
+            ),
+            daily_streak = CASE WHEN pickle_counts.last_daily > now() - $4::interval THEN pickle_counts.daily_streak + 1 ELSE 1 END,
+            last_daily = now()
+        WHERE pickle_counts.last_daily IS NULL OR pickle_counts.last_daily <= now() - $3::interval
+        RETURNING coins, daily_streak
+    )
+    SELECT (SELECT coins FROM claim) AS coins,
+           (SELECT daily_streak FROM claim) AS streak,
+           (SELECT last_daily + $3::interval FROM pickle_counts WHERE user_id = $1) AS next_claim
+""")
+
+DEFAULT_PICKLE_WORDS = ["pickle", "dill", "gherkin", "gherkins", "pickled"]
+DEFAULT_REWARD_MESSAGES = [
+    "🥒 {user} just got a pickle!",
+    "Congrats {user}! You earned a pickle!",
+    "One fresh pickle for {user}! 🥒",
+    "Pickle acquired! {user} adds one to their collection!"
+]
+
+def daily_claim_args(settings):
+    """Return the CLAIM_DAILY parameters that follow the user id, from the daily config section"""
+    return (
+        settings.get("amount", 50),
+        timedelta(hours=settings.get("cooldown_hours", 24)),
+        timedelta(hours=settings.get("streak_window_hours", 48)),
+        settings.get("streak_bonus", 10),
+        settings.get("streak_bonus_max", 100),
+    )
 
 class PickleTracking(commands.Cog):
     """Tracks pickle references and rewards users"""
 
     def __init__(self, bot):
         self.bot = bot
-        # Load pickle words from config
-        self.pickle_words = set(config.get("pickle_rewards", {}).get("words", 
-            ["pickle", "dill", "gherkin", "gherkins", "pickled"]
-        ))
-        self.reward_messages = config.get("pickle_rewards", {}).get("reward_messages", [
-            "🥒 {user} just got a pickle!",
-            "Congrats {user}! You earned a pickle!",
-            "One fresh pickle for {user}! 🥒",
-            "Pickle acquired! {user} adds one to their collection!"
-        ])
+        # Load pickle words from config and compile them into a single matcher
+        self.pickle_words = KeywordMatcher(
+            config.get("pickle_rewards", {}).get("words", DEFAULT_PICKLE_WORDS),
+            mode=config.get("pickle_rewards", {}).get("match_mode", "stem")
+        )
+        self.reward_messages = config.get("pickle_rewards", {}).get("reward_messages", DEFAULT_REWARD_MESSAGES)
         self.cooldown_seconds = config.get("pickle_rewards", {}).get("cooldown_seconds", 300)
-        # Track user cooldowns
-        self.user_cooldowns = {}
+        # Track cooldowns per guild and user; expired entries are swept and the store never
+        # exceeds its ceiling. A guild's messages all reach the worker running its shard, so
+        # under cluster.py each worker holds exactly the cooldowns it needs, and saves them
+        # under a per-worker name. DMs are keyed under guild 0, which lives on shard 0.
+        self.user_cooldowns = CooldownStore(
+            per_worker("pickle_rewards"),
+            self.cooldown_seconds,
+            max_entries=config.get("pickle_rewards", {}).get("cooldown_max_entries", 100000)
+        )
+        # Leaderboard served from memory; kept current by the buffered flushes
+        self.leaderboard = TopKLeaderboard(k=10)
+        # Where cooldowns are kept across restarts: "database", "disk" or "none"
+        self.cooldown_persistence = config.get("pickle_rewards", {}).get("cooldown_persistence", "database")
+        self.cooldown_snapshot_base = config.get("pickle_rewards", {}).get(
+            "cooldown_snapshot_path", "data/pickle_cooldowns.json"
+        )
+        snapshot_root, snapshot_ext = os.path.splitext(self.cooldown_snapshot_base)
+        self.cooldown_snapshot_path = per_worker(snapshot_root) + snapshot_ext
+        # Batch pickle count increments instead of writing once per reward
+        self.pickle_buffer = CounterBuffer(
+            "pickle_counts",
+            self.flush_pickle_counts,
+            interval=config.get("pickle_rewards", {}).get("flush_interval_seconds", 5),
+            max_pending=config.get("pickle_rewards", {}).get("flush_max_pending", 500)
+        )
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        """Monitor messages for pickle-related words and reward users"""
-        # Ignore messages from bots
-        if message.author.bot:
+    async def cog_load(self):
+        """Restore cooldowns and start background flushing when the cog is loaded"""
+        self.pickle_buffer.start()
+        config.subscribe("pickle_rewards", self.on_config_changed)
+        router.subscribe("pickle_rewards", self.handle_message, lambda parsed: not parsed.author_is_bot)
+
+        metrics.gauge(
+            "picklejar_pickle_buffer_pending", "Buffered pickle increments waiting to be flushed",
+            lambda: sum(self.pickle_buffer.pending.values())
+        )
+        metrics.collect(
+            "picklejar_pickle_buffer_flush_seconds", "histogram", "Pickle buffer flush latency",
+            lambda: self.pickle_buffer.flush_latency
+        )
+        metrics.gauge(
+            "picklejar_pickle_cooldowns", "Users currently on pickle cooldown",
+            lambda: len(self.user_cooldowns)
+        )
+        metrics.collect(
+            "picklejar_pickle_cooldown_evictions_total", "counter", "Cooldowns evicted to stay under the memory ceiling",
+            lambda: self.user_cooldowns.evicted_count
+        )
+
+        # Restore cooldowns so a restart doesn't hand out a burst of rewards. Every worker's
+        # snapshot is read and only this worker's guilds kept, so a change in worker count
+        # hands each guild's cooldowns to its new worker.
+        try:
+            if self.cooldown_persistence == "database" and db.pool:
+                restored = await self.user_cooldowns.load_workers_from_db(db, "pickle_rewards", self.owns_cooldown)
+            elif self.cooldown_persistence == "disk":
+                restored = self.user_cooldowns.load_workers(
+                    self.cooldown_snapshot_base, self.cooldown_snapshot_path, self.owns_cooldown
+                )
+            else:
+                restored = 0
+            if restored:
+                logger.log(f"Restored {restored} pickle cooldowns")
+        except Exception as e:
+            logger.log(f"Failed to restore pickle cooldowns: {str(e)}", "error")
+
+    async def cog_unload(self):
+        """Flush buffered pickles and save cooldowns when the cog is unloaded or the bot closes"""
+        router.unsubscribe("pickle_rewards")
+        config.unsubscribe("pickle_rewards", self.on_config_changed)
+        for name in ("picklejar_pickle_buffer_pending", "picklejar_pickle_buffer_flush_seconds",
+                     "picklejar_pickle_cooldowns", "picklejar_pickle_cooldown_evictions_total"):
+            metrics.unregister(name)
+
+        # Write out any buffered pickles before the cog goes away
+        await self.pickle_buffer.close()
+        stats = self.pickle_buffer.stats()
+        logger.log(f"Pickle buffer closed after {stats['flushes']} flushes (max {stats['max_flush_ms']}ms)")
+
+        # Snapshot cooldowns so they survive the restart
+        try:
+            if self.cooldown_persistence == "database" and db.pool:
+                await self.user_cooldowns.save_to_db(db)
+            elif self.cooldown_persistence == "disk":
+                self.user_cooldowns.save(self.cooldown_snapshot_path)
+        except Exception as e:
+            logger.log(f"Failed to save pickle cooldowns: {str(e)}", "error")
+
+    def owns_cooldown(self, key):
+        """True if a saved "guild_id:user_id" cooldown belongs to a guild on this worker's shards"""
+        guild_id, _, user_id = key.partition(":")
+        return bool(user_id) and guild_id.isdigit() and owns_guild(self.bot, guild_id)
+
+    def on_config_changed(self, settings, previous):
+        """Apply a reloaded pickle_rewards section, rebuilding only what changed"""
+        words = settings.get("words", DEFAULT_PICKLE_WORDS)
+        mode = settings.get("match_mode", "stem")
+        if words != previous.get("words", DEFAULT_PICKLE_WORDS) or mode != previous.get("match_mode", "stem"):
+            # Build the new matcher before swapping it in, so messages never see a half-built one
+            self.pickle_words = KeywordMatcher(words, mode=mode)
+        self.reward_messages = settings.get("reward_messages", DEFAULT_REWARD_MESSAGES)
+
+        # Running cooldowns keep their expiry; new ones use the new duration
+        self.cooldown_seconds = settings.get("cooldown_seconds", 300)
+        self.user_cooldowns.duration = self.cooldown_seconds
+        self.user_cooldowns.resize(settings.get("cooldown_max_entries", 100000))
+
+        self.pickle_buffer.interval = settings.get("flush_interval_seconds", 5)
+        self.pickle_buffer.max_pending = settings.get("flush_max_pending", 500)
+
+    async def flush_pickle_counts(self, batch):
+        """Write a batch of buffered pickle increments as one multi-row upsert"""
+        if not db.pool:
             return
 
+        results = await db.fetch(ADD_PICKLE_COUNTS, list(batch.keys()), list(batch.values()))
+        # The upsert returns one row per user, so anything else means it failed
+        if len(results) != len(batch):
+            raise RuntimeError("pickle count upsert did not complete")
+
+        # Feed the new totals to the in-memory leaderboard
+        for record in results:
+            self.leaderboard.update(record['user_id'], record['count'])
+
+    async def seed_leaderboard(self):
+        """Load the top pickle counts into the in-memory leaderboard.
+
+        A failed read raises and leaves the leaderboard due for seeding, rather
+        than seeding it empty until the next refresh.
+        """
+        results = await db.fetch(TOP_PICKLE_COUNTS, self.leaderboard.capacity, strict=True)
+        self.leaderboard.seed((record['user_id'], record['count']) for record in results)
+
+    async def handle_message(self, message: discord.Message, parsed):
+        """Monitor messages for pickle-related words and reward users"""
+        # Bot messages are already filtered out by the router predicate.
         # Check if the message contains any pickle words
-        content_lower = message.content.lower()
-        if any(word in content_lower for word in self.pickle_words):
-            # Check if user is on cooldown
+        if self.pickle_words.search(parsed.lower, lowered=True):
+            # Check if user is on cooldown in this guild; if not, this starts a new cooldown
             user_id = str(message.author.id)
-            current_time = time.time()
-            
-            # Check cooldown
-            if user_id in self.user_cooldowns:
-                last_reward_time = self.user_cooldowns[user_id]
-                time_passed = current_time - last_reward_time
-                
-                if time_passed < self.cooldown_seconds:
-                    # User is on cooldown, don't reward
-                    remaining = self.cooldown_seconds - time_passed
-                    logger.log(f"{message.author} mentioned a pickle word but is on cooldown ({remaining:.0f}s remaining)")
-                    return
-            
-            # User is not on cooldown, reward them
-            self.user_cooldowns[user_id] = current_time
+            remaining = self.user_cooldowns.acquire(f"{message.guild.id if message.guild else 0}:{user_id}")
+            if remaining > 0:
+                # User is on cooldown, don't reward
+                logger.log(
+                    f"{message.author} mentioned a pickle word but is on cooldown ({remaining:.0f}s remaining)",
+                    category="cooldown", user_id=message.author.id
+                )
+                return
             
             # Select a random reward message
             reward_message = random.choice(self.reward_messages)
             formatted_message = reward_message.format(user=message.author.mention)
             
             await message.channel.send(formatted_message)
-            logger.log(f"{message.author} mentioned a pickle word and was rewarded")
-
-            # Store in database if connected
-            try:
-                await db.execute(
-                    """
-                    INSERT INTO pickle_counts(user_id, count)
-                    VALUES($1, 1)
-                    ON CONFLICT (user_id)
-                    DO UPDATE SET count = pickle_counts.count + 1
-                    """,
-                    user_id
-                )
-                logger.log(f"Updated pickle count for {message.author}")
-            except Exception as e:
-                logger.log(f"Failed to update database for {message.author}: {str(e)}", "error")
+            logger.log(f"{message.author} mentioned a pickle word and was rewarded", category="pickle_reward", user_id=message.author.id)
+
+            # Queue the increment; it is written in the next batched flush
+            self.pickle_buffer.add(user_id)
 
     @commands.command(name="pickles")
     async def pickle_count(self, ctx, member: discord.Member = None):
@@ -82,10 +254,9 @@ class PickleTracking(commands.Cog):
         user_id = str(target.id)
         
         try:
-            result = await db.fetchrow(
-                "SELECT count, coins FROM pickle_counts WHERE user_id = $1",
-                user_id
-            )
+            # Make sure buffered pickles are visible before reading
+            await self.pickle_buffer.flush()
+            result = await db.fetchrow(PICKLE_STATS, user_id)
             
             if result:
                 pickle_count = result['count']
@@ -111,9 +282,11 @@ class PickleTracking(commands.Cog):
     async def pickle_leaderboard(self, ctx):
         """Display the pickle leaderboard"""
         try:
-            results = await db.fetch(
-                "SELECT user_id, count FROM pickle_counts ORDER BY count DESC LIMIT 10"
-            )
+            # Make sure buffered pickles are visible before reading
+            await self.pickle_buffer.flush()
+            if self.leaderboard.needs_seed and db.pool:
+                await self.seed_leaderboard()
+            results = self.leaderboard.top()
             
             if not results:
                 await ctx.send("No one has collected any pickles yet!")
@@ -125,13 +298,11 @@ class PickleTracking(commands.Cog):
                 color=discord.Color.green()
             )
             
-            for i, record in enumerate(results, 1):
-                user_id = record['user_id']
-                count = record['count']
-                
-                # Try to get user information
-                user = self.bot.get_user(int(user_id))
-                name = user.name if user else f"User {user_id}"
+            # Resolve every name in one batch instead of row by row
+            names = await name_resolver.resolve_many(self.bot, [user_id for user_id, _ in results])
+            
+            for i, (user_id, count) in enumerate(results, 1):
+                name = names[user_id]
                 
                 # Add medal emoji for top 3
                 medal = ""
@@ -156,52 +327,34 @@ class PickleTracking(commands.Cog):
     @commands.command(name="daily")
     async def daily_reward(self, ctx):
         """Claim your daily pickle coins"""
-        user_id = str(ctx.author.id)
+        claim_args = daily_claim_args(config.get("daily", {}))
+        amount, _, _, streak_bonus, streak_bonus_max = claim_args
         
-        try:
-            # Check if user has already claimed today
-            last_claim = await db.fetchval(
-                "SELECT last_daily FROM pickle_counts WHERE user_id = $1",
-                user_id
-            )
-            
-            import datetime
-            now = datetime.datetime.now()
-            
-            if last_claim:
-                # Convert to datetime if it's not already
-                if isinstance(last_claim, str):
-                    last_claim = datetime.datetime.fromisoformat(last_claim)
-                
-                # Check if 24 hours have passed
-                time_passed = now - last_claim
-                if time_passed.total_seconds() < 86400:  # 24 hours in seconds
-                    next_claim = last_claim + datetime.timedelta(days=1)
-                    time_until = next_claim - now
-                    hours, remainder = divmod(int(time_until.total_seconds()), 3600)
-                    minutes, _ = divmod(remainder, 60)
-                    
-                    await ctx.send(f"You've already claimed your daily reward! Next claim available in {hours}h {minutes}m.")
-                    return
-            
-            # Give the reward
-            daily_amount = 50  # 50 coins daily reward
-            
-            await db.execute(
-                """
-                INSERT INTO pickle_counts(user_id, coins, last_daily)
-                VALUES($1, $2, $3)
-                ON CONFLICT (user_id)
-                DO UPDATE SET coins = pickle_counts.coins + $2, last_daily = $3
-                """,
-                user_id, daily_amount, now
-            )
-            
-            await ctx.send(f"🎉 You claimed your daily reward of {daily_amount} pickle coins! 🪙")
-            logger.log(f"{ctx.author} claimed their daily reward")
-        except Exception as e:
-            logger.log(f"Error processing daily claim: {str(e)}", "error")
+        # Check eligibility, pay out and advance the streak in one statement
+        result = await db.fetchrow(CLAIM_DAILY, str(ctx.author.id), *claim_args)
+        if result is None:
             await ctx.send("I couldn't process your daily claim at this time.")
+            return
+        
+        if result['coins'] is None:
+            next_claim = result['next_claim']
+            now = datetime.now(timezone.utc)
+            if next_claim is None or next_claim <= now:
+                # Another claim committed while this one was running
+                await ctx.send("You've already claimed your daily reward!")
+                return
+            hours, remainder = divmod(int((next_claim - now).total_seconds()), 3600)
+            minutes, _ = divmod(remainder, 60)
+            await ctx.send(f"You've already claimed your daily reward! Next claim available in {hours}h {minutes}m.")
+            return
+        
+        streak = result['streak']
+        bonus = min((streak - 1) * streak_bonus, streak_bonus_max)
+        message = f"🎉 You claimed your daily reward of {amount} pickle coins! 🪙"
+        if bonus:
+            message += f" Plus a {bonus} coin bonus for your {streak}-day streak! 🔥"
+        await ctx.send(message)
+        logger.log(f"{ctx.author} claimed their daily reward", user_id=ctx.author.id, streak=streak, coins=result['coins'])
 
 async def setup(bot):
     await bot.add_cog(PickleTracking(bot))
\ No newline at end of file
@@ -0,0 +1,313 @@
+import asyncio
+import discord
+import typing
+from discord.ext import commands
+from utils.db_manager import db
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Gateway capabilities this cog relies on; item roles are granted to the message author
+INTENTS = ()
+MEMBER_CACHE = ()
+
+# Postgres channel used to tell every bot process the catalog changed
+NOTIFY_CHANNEL = "shop_items"
+
+MAX_QUANTITY = 100
+
+LOAD_CATALOG = db.register_query(
+    "shop.load_catalog",
+    "SELECT id, name, emoji, price, description, role_id FROM shop_items ORDER BY price, id"
+)
+# Debit, inventory and sale log in one statement. The debit only matches while the
+# balance covers the price, and concurrent purchases by the same user queue on the
+# pickle_counts row lock and re-check it, so a balance can never go negative.
+# The outer SELECT always returns a row: coins is NULL when nothing was bought, and
+# price tells a removed or repriced item apart from a balance that was too low.
+PURCHASE_ITEM = db.register_query("shop.purchase", """
+    WITH item AS (
+        SELECT id, price * $3::INTEGER AS total FROM shop_items WHERE id = $2
+    ), debit AS (
+        UPDATE pickle_counts
+        SET coins = pickle_counts.coins - item.total
+        FROM item
+        WHERE pickle_counts.user_id = $1 AND pickle_counts.coins >= item.total
+        RETURNING pickle_counts.coins, item.id, item.total
+    ), inventory AS (
+        INSERT INTO user_inventory(user_id, item_id, quantity)
+        SELECT $1, id, $3 FROM debit
+        ON CONFLICT (user_id, item_id)
+        DO UPDATE SET quantity = user_inventory.quantity + EXCLUDED.quantity
+        RETURNING quantity
+    ), sale AS (
+        INSERT INTO shop_purchases(user_id, item_id, price_paid)
+        SELECT $1, id, total FROM debit
+    )
+    SELECT (SELECT coins FROM debit) AS coins,
+           (SELECT total FROM debit) AS total,
+           (SELECT quantity FROM inventory) AS quantity,
+           (SELECT coins FROM pickle_counts WHERE user_id = $1) AS balance,
+           (SELECT price FROM shop_items WHERE id = $2) AS price
+""")
+USER_BALANCE = db.register_query("shop.balance", "SELECT coins FROM pickle_counts WHERE user_id = $1")
+USER_INVENTORY = db.register_query(
+    "shop.inventory",
+    "SELECT item_id, quantity FROM user_inventory WHERE user_id = $1 AND quantity > 0 ORDER BY item_id"
+)
+# Catalog edits notify in the same statement, so every process drops its cache when the change commits
+ADD_ITEM = db.register_query("shop.add_item", """
+    WITH added AS (
+        INSERT INTO shop_items(name, emoji, price, description, role_id)
+        VALUES($1, $2, $3, $4, $5)
+        RETURNING id
+    )
+    SELECT id, pg_notify('shop_items', id::text) FROM added
+""")
+SET_ITEM_PRICE = db.register_query("shop.set_price", """
+    WITH updated AS (
+        UPDATE shop_items SET price = $2 WHERE id = $1
+        RETURNING id
+    )
+    SELECT id, pg_notify('shop_items', id::text) FROM updated
+""")
+REMOVE_ITEM = db.register_query("shop.remove_item", """
+    WITH removed AS (
+        DELETE FROM shop_items WHERE id = $1
+        RETURNING id
+    )
+    SELECT id, pg_notify('shop_items', id::text) FROM removed
+""")
+
+class ShopItem:
+    """One catalog entry"""
+
+    __slots__ = ("id", "name", "emoji", "price", "description", "role_id")
+
+    def __init__(self, id, name, emoji, price, description=None, role_id=None):
+        self.id = id
+        self.name = name
+        self.emoji = emoji
+        self.price = price
+        self.description = description
+        self.role_id = role_id
+
+def find_item(catalog, query):
+    """Look an item up by id or case-insensitive name"""
+    if query.isdigit() and int(query) in catalog:
+        return catalog[int(query)]
+    query = query.lower()
+    for item in catalog.values():
+        if item.name.lower() == query:
+            return item
+    return None
+
+class Shop(commands.Cog):
+    """Spend pickle coins on items from a shared catalog"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # The catalog is loaded once and served from memory until an edit notifies
+        self.catalog = None
+        self.catalog_version = 0
+        self.catalog_lock = asyncio.Lock()
+        self.purchases = metrics.counter(
+            "picklejar_shop_purchases_total", "Shop purchase attempts, by outcome", ("outcome",)
+        )
+
+    async def cog_load(self):
+        """Receive catalog invalidations from every bot process"""
+        if db.pool:
+            await db.listen(NOTIFY_CHANNEL, self.on_catalog_changed)
+
+    async def cog_unload(self):
+        await db.unlisten(NOTIFY_CHANNEL)
+
+    def on_catalog_changed(self, payload):
+        """Drop the cached catalog; payload is None after a listener reconnect"""
+        self.catalog = None
+        self.catalog_version += 1
+
+    async def get_catalog(self):
+        """Return {item_id: ShopItem}, loading it once for any number of concurrent callers"""
+        catalog = self.catalog
+        if catalog is not None:
+            return catalog
+
+        async with self.catalog_lock:
+            if self.catalog is not None:
+                return self.catalog
+            version = self.catalog_version
+            records = await db.fetch(LOAD_CATALOG, strict=True)
+            catalog = {
+                record['id']: ShopItem(
+                    record['id'], record['name'], record['emoji'], record['price'],
+                    record['description'], record['role_id']
+                )
+                for record in records
+            }
+            # Don't keep a catalog that an edit made stale while it was loading
+            if version == self.catalog_version:
+                self.catalog = catalog
+            return catalog
+
+    @commands.command(name="shop")
+    async def shop(self, ctx):
+        """Browse the items for sale"""
+        try:
+            catalog = await self.get_catalog()
+        except Exception as e:
+            logger.log(f"Error loading shop catalog: {str(e)}", "error")
+            await ctx.send("The shop is closed right now. Try again later.")
+            return
+
+        if not catalog:
+            await ctx.send("The shop doesn't have anything for sale yet!")
+            return
+
+        embed = discord.Embed(
+            title="🛒 Pickle Shop",
+            description="Buy items with `!buy <item> [quantity]`",
+            color=discord.Color.green()
+        )
+        for item in list(catalog.values())[:25]:
+            embed.add_field(
+                name=f"{item.emoji} {item.name} - {item.price} 🪙",
+                value=f"{item.description or 'No description'}\nID: {item.id}",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="buy")
+    async def buy(self, ctx, item_name: str, quantity: int = 1):
+        """Buy an item from the shop with pickle coins"""
+        if not 1 <= quantity <= MAX_QUANTITY:
+            await ctx.send(f"You can buy between 1 and {MAX_QUANTITY} at a time.")
+            return
+
+        try:
+            item = find_item(await self.get_catalog(), item_name)
+        except Exception as e:
+            logger.log(f"Error loading shop catalog: {str(e)}", "error")
+            await ctx.send("The shop is closed right now. Try again later.")
+            return
+        if item is None:
+            await ctx.send(f"There's no item called '{item_name}'. Check `!shop` for what's for sale.")
+            return
+
+        user_id = str(ctx.author.id)
+        result = await db.fetchrow(PURCHASE_ITEM, user_id, item.id, quantity)
+        if result is None:
+            self.purchases.inc("error")
+            await ctx.send("I couldn't process your purchase at this time.")
+            return
+
+        if result['coins'] is None:
+            if result['price'] != item.price:
+                # The item was removed or repriced since the catalog loaded
+                self.on_catalog_changed(None)
+                self.purchases.inc("stale")
+                await ctx.send(f"{item.name} has changed since the shop was last loaded. Check `!shop` and try again.")
+                return
+
+            balance = result['balance'] or 0
+            if balance >= item.price * quantity:
+                # The balance is from before a concurrent purchase that the debit waited for
+                # and then saw; read what is left now that it has committed
+                balance = await db.fetchval(USER_BALANCE, user_id) or 0
+            self.purchases.inc("insufficient")
+            await ctx.send(f"You need {item.price * quantity} 🪙 for that but only have {balance} 🪙.")
+            return
+
+        self.purchases.inc("success")
+        await ctx.send(
+            f"{item.emoji} You bought {quantity}x {item.name} for {result['total']} 🪙! "
+            f"You now have {result['quantity']} and {result['coins']} 🪙 left."
+        )
+        logger.log(f"{ctx.author} bought {quantity}x {item.name} for {result['total']} coins", user_id=ctx.author.id, item_id=item.id)
+
+        # Items can come with a role in the server they were bought in
+        if item.role_id and ctx.guild:
+            role = ctx.guild.get_role(int(item.role_id))
+            if role and role not in ctx.author.roles:
+                try:
+                    await ctx.author.add_roles(role, reason=f"Bought {item.name}")
+                except discord.HTTPException as e:
+                    logger.log(f"Could not grant role {role} for {item.name}: {str(e)}", "warning")
+
+    @commands.command(name="inventory", aliases=["inv"])
+    async def inventory(self, ctx, member: discord.Member = None):
+        """See the items you or another user own"""
+        target = member or ctx.author
+        try:
+            catalog = await self.get_catalog()
+            records = await db.fetch(USER_INVENTORY, str(target.id))
+        except Exception as e:
+            logger.log(f"Error retrieving inventory: {str(e)}", "error")
+            await ctx.send("I couldn't retrieve the inventory at this time.")
+            return
+
+        owned = [(catalog[record['item_id']], record['quantity']) for record in records if record['item_id'] in catalog]
+        if not owned:
+            await ctx.send(f"{target.mention} doesn't own any items yet!")
+            return
+
+        embed = discord.Embed(
+            title=f"🎒 {target.display_name}'s Inventory",
+            description="\n".join(f"{item.emoji} **{item.name}** x{quantity}" for item, quantity in owned),
+            color=discord.Color.green()
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="additem")
+    @commands.has_permissions(administrator=True)
+    async def add_item(self, ctx, name: str, price: int, emoji: str, role: typing.Optional[discord.Role] = None, *, description: str = None):
+        """Add an item to the shop, optionally granting a role when bought"""
+        if price <= 0:
+            await ctx.send("The price must be at least 1 coin.")
+            return
+
+        try:
+            if find_item(await self.get_catalog(), name):
+                await ctx.send(f"There's already an item called '{name}'.")
+                return
+            added = await db.fetchrow(ADD_ITEM, name, emoji, price, description, str(role.id) if role else None, strict=True)
+            # The notification reaches this process too; drop the cache now so the next read sees the item
+            self.on_catalog_changed(None)
+            await ctx.send(f"{emoji} **{name}** is now for sale for {price} 🪙 (ID {added['id']}).")
+            logger.log(f"{ctx.author} added shop item '{name}' for {price} coins")
+        except Exception as e:
+            logger.log(f"Error adding shop item: {str(e)}", "error")
+            await ctx.send("Failed to add the item.")
+
+    @commands.command(name="setprice")
+    @commands.has_permissions(administrator=True)
+    async def set_price(self, ctx, item_name: str, price: int):
+        """Change the price of a shop item"""
+        if price <= 0:
+            await ctx.send("The price must be at least 1 coin.")
+            return
+        await self.edit_item(ctx, item_name, SET_ITEM_PRICE, f"now costs {price} 🪙", price)
+
+    @commands.command(name="removeitem")
+    @commands.has_permissions(administrator=True)
+    async def remove_item(self, ctx, item_name: str):
+        """Remove an item from the shop"""
+        await self.edit_item(ctx, item_name, REMOVE_ITEM, "has been removed from the shop")
+
+    async def edit_item(self, ctx, item_name, query, outcome, *args):
+        """Run a catalog edit for one item and report the result"""
+        try:
+            item = find_item(await self.get_catalog(), item_name)
+            if item is None:
+                await ctx.send(f"There's no item called '{item_name}'.")
+                return
+            await db.execute(query, item.id, *args)
+            self.on_catalog_changed(None)
+            await ctx.send(f"{item.emoji} **{item.name}** {outcome}.")
+            logger.log(f"{ctx.author} edited shop item '{item.name}': {outcome}")
+        except Exception as e:
+            logger.log(f"Error editing shop item: {str(e)}", "error")
+            await ctx.send("Failed to update the item.")
+
+async def setup(bot):
+    await bot.add_cog(Shop(bot))
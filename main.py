@@ -1,11 +1,20 @@
 import os
 import asyncio
+import json
+import signal
 import discord
+from aiohttp import web
 from discord.ext import commands
 from dotenv import load_dotenv
 from utils.db_manager import db
 from utils.logger import logger
 from utils.config import config
+from utils.message_router import router
+from utils.metrics import metrics
+from utils.monitoring import instrument_bot, readiness
+from utils.sharding import shard_settings
+from utils.capabilities import resolve_profile, describe_profile
+from utils.migrations import apply_migrations
 
 # Load environment variables first
 load_dotenv()
@@ -17,7 +26,9 @@ AVAILABLE_COGS = [
     "cogs.community_recognition",
     "cogs.admin_tools",
     "cogs.pickle_tracking",
-    "cogs.custom_commands"
+    "cogs.custom_commands",
+    "cogs.shop",
+    "cogs.media_finder"
 ]
 
 async def load_cogs(bot):
@@ -36,27 +47,33 @@ async def load_cogs(bot):
     else:
         logger.log(f"Failed to load {len(AVAILABLE_COGS) - success_count} cogs", "error")
 
-async def start_bot():
-    """Start the bot with all features"""
-    # Get bot token
-    token = os.getenv("DISCORD_BOT_TOKEN")
-    if not token:
-        logger.log("No bot token found in environment variables. Please set DISCORD_BOT_TOKEN in .env file.", "error")
-        return
-    
-    # Create bot instance
-    intents = discord.Intents.all()
-    bot = commands.Bot(
-        command_prefix="!",
+def create_bot():
+    """Create the bot instance with its events, router and metrics wired up"""
+    # Only subscribe to the gateway events and member caching the loaded cogs declare
+    intents, member_cache, _ = resolve_profile(AVAILABLE_COGS)
+    logger.log(f"Gateway profile - {describe_profile(intents, member_cache)}")
+    options = dict(
+        command_prefix=router.prefix,
         description="PickleJar Bot - A Discord bot with pickle tracking and moderation features",
-        intents=intents
+        intents=intents,
+        member_cache_flags=member_cache,
+        # Members are fetched when a command needs them rather than chunked for every guild up front
+        chunk_guilds_at_startup=False
     )
+
+    # cluster.py sets SHARD_COUNT/SHARD_IDS for each worker; sharding.auto_shard shards a single process
+    shard_count, shard_ids = shard_settings()
+    if shard_count or config.get("sharding", {}).get("auto_shard", False):
+        bot = commands.AutoShardedBot(shard_count=shard_count, shard_ids=shard_ids, **options)
+        logger.log(f"Running shards {shard_ids if shard_ids is not None else 'all'} of {shard_count or 'auto'}")
+    else:
+        bot = commands.Bot(**options)
     
     @bot.event
     async def on_ready():
         """Called when the bot is ready"""
         server_count = len(bot.guilds)
-        member_count = sum(guild.member_count for guild in bot.guilds)
+        member_count = sum(guild.member_count or 0 for guild in bot.guilds)
         
         logger.log(f"PickleJar Bot is online!")
         logger.log(f"Bot ID: {bot.user.id}")
@@ -73,6 +90,36 @@ async def start_bot():
         except Exception as e:
             logger.log(f"Failed to sync commands: {e}", "error")
     
+    @bot.event
+    async def on_message(message):
+        """Parse each message once and hand it to the router's subscribers"""
+        await router.dispatch(message)
+
+    async def run_commands(message, parsed):
+        """Parse the command once; unknown names go to the router's fallbacks before CommandNotFound"""
+        ctx = await bot.get_context(message)
+        if ctx.command is None and ctx.invoked_with and await router.run_command_fallbacks(ctx):
+            return
+        await bot.invoke(ctx)
+
+    # Commands are just another router subscriber, only run for prefixed messages
+    router.subscribe(
+        "commands",
+        run_commands,
+        lambda parsed: parsed.is_command and not parsed.author_is_bot
+    )
+    
+    instrument_bot(bot)
+    return bot
+
+async def start_bot(bot):
+    """Start the bot with all features"""
+    # Get bot token
+    token = os.getenv("DISCORD_BOT_TOKEN")
+    if not token:
+        logger.log("No bot token found in environment variables. Please set DISCORD_BOT_TOKEN in .env file.", "error")
+        return
+    
     # Load all cogs
     await load_cogs(bot)
     
@@ -85,19 +132,38 @@ async def start_bot():
     except Exception as e:
         logger.log(f"Error starting bot: {str(e)}", "error")
 
-# Create a simple web server for health checks
+# Web server for health checks, readiness and metrics
 async def health_check(request):
     return web.Response(text="Bot is running!")
 
-async def setup_web_server():
-    """Set up a simple web server for health checks"""
+async def readiness_check(request):
+    """Fail with 503 when the gateway or database is unhealthy"""
+    ready, checks = await readiness(request.app["bot"])
+    return web.Response(
+        status=200 if ready else 503,
+        text=json.dumps(checks),
+        content_type="application/json"
+    )
+
+async def metrics_endpoint(request):
+    """Expose bot metrics in the Prometheus text format"""
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+async def setup_web_server(bot):
+    """Set up the web server for health checks, readiness and metrics"""
     app = web.Application()
-    app.add_routes([web.get('/', health_check)])
+    app["bot"] = bot
+    app.add_routes([
+        web.get('/', health_check),
+        web.get('/ready', readiness_check),
+        web.get('/metrics', metrics_endpoint)
+    ])
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, '0.0.0.0', 8080)
+    port = int(os.getenv("PORT", 8080))
+    site = web.TCPSite(runner, '0.0.0.0', port)
     await site.start()
-    logger.log("Web server started on port 8080")
+    logger.log(f"Web server started on port {port}")
 
 async def main():
     """Main function to start the bot"""
@@ -111,29 +177,45 @@ async def main():
 Starting PickleJar Bot...
     """)
 
-    # Start the web server for health checks
-    web_server_task = asyncio.create_task(setup_web_server())
+    bot = create_bot()
+
+    # Start the web server for health checks and metrics
+    web_server_task = asyncio.create_task(setup_web_server(bot))
     
     # Connect to database but don't require it
     try:
         db_connected = await db.connect(required=False)
         if not db_connected:
             logger.log("Warning: Running without database connection. Some features will be unavailable.", "error")
+        elif os.getenv("SKIP_MIGRATIONS"):
+            # cluster.py applies migrations once before starting its workers
+            logger.log("Skipping schema migrations")
         else:
-            # Initialize database tables if connected successfully
+            # Bring the schema up to date; already-applied migrations are skipped
             try:
-                schema_created = await db.create_tables_from_schema("postgresql_schema_optimized.sql")
-                if schema_created:
-                    logger.log("Database tables created successfully!")
-                else:
-                    logger.log("Failed to create database tables. Some features may not work correctly.", "warning")
+                applied = await apply_migrations(db)
+                logger.log(f"Database schema up to date ({applied} migration(s) applied)")
             except Exception as e:
-                logger.log(f"Error creating database tables: {str(e)}", "error")
+                logger.log(f"Error applying database migrations: {str(e)}. Some features may not work correctly.", "error")
     except Exception as e:
         logger.log(f"Database initialization error: {str(e)}", "error")
     
+    # Close cleanly on SIGTERM (cluster shutdown, redeploys) so cogs flush their buffers,
+    # and reload config.json on SIGHUP
+    try:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+        loop.add_signal_handler(signal.SIGHUP, config.reload_safely)
+    except (NotImplementedError, AttributeError):
+        pass
+    
+    # Pick up edits to config.json without a restart
+    reload_settings = config.get("config_reload", {})
+    if reload_settings.get("watch_file", True):
+        config.start_watching(reload_settings.get("watch_interval_seconds", 2))
+    
     # Start the bot
-    await start_bot()
+    await start_bot(bot)
 
 if __name__ == "__main__":
     # Run the main function
@@ -1,4 +1,6 @@
 -- ✅ PickleJar Core Schema
+-- Baseline schema. Every statement is idempotent so it also applies cleanly to
+-- databases created from the old postgresql_schema_optimized.sql.
 
 CREATE TABLE IF NOT EXISTS pickle_counts (
     user_id VARCHAR(32) PRIMARY KEY,
@@ -9,6 +11,13 @@ CREATE TABLE IF NOT EXISTS pickle_counts (
 );
 
 CREATE INDEX IF NOT EXISTS idx_pickle_counts_user ON pickle_counts(user_id);
+CREATE INDEX IF NOT EXISTS idx_pickle_counts_count ON pickle_counts(count DESC);
+
+CREATE TABLE IF NOT EXISTS user_names (
+    user_id VARCHAR(32) PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
 
 CREATE TABLE IF NOT EXISTS swear_words (
     word TEXT PRIMARY KEY
@@ -24,6 +33,23 @@ CREATE TABLE IF NOT EXISTS settings (
     value TEXT
 );
 
+-- ✅ Community Recognition
+
+CREATE TABLE IF NOT EXISTS recognitions (
+    id SERIAL PRIMARY KEY,
+    from_user VARCHAR(32) NOT NULL,
+    to_user VARCHAR(32) NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS recognition_counts (
+    user_id VARCHAR(32) PRIMARY KEY,
+    count INTEGER DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_recognition_counts_count ON recognition_counts(count DESC);
+
 -- ✅ Shop System
 
 CREATE TABLE IF NOT EXISTS shop_items (
@@ -99,4 +125,44 @@ CREATE TABLE IF NOT EXISTS warning_messages (
 CREATE TABLE IF NOT EXISTS moderation_settings (
     key TEXT PRIMARY KEY,
     value TEXT NOT NULL
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS infractions (
+    id BIGSERIAL PRIMARY KEY,
+    guild_id VARCHAR(32) NOT NULL,
+    user_id VARCHAR(32) NOT NULL,
+    moderator_id VARCHAR(32) NOT NULL,
+    kind TEXT NOT NULL,
+    reason TEXT,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Serves keyset-paginated history newest first
+CREATE INDEX IF NOT EXISTS idx_infractions_guild_user ON infractions(guild_id, user_id, id DESC);
+
+CREATE TABLE IF NOT EXISTS mutes (
+    guild_id VARCHAR(32) NOT NULL,
+    user_id VARCHAR(32) NOT NULL,
+    channel_id VARCHAR(32),
+    muted_by VARCHAR(32),
+    reason TEXT,
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mutes_expires_at ON mutes(expires_at);
+
+-- ✅ Custom Commands
+
+CREATE TABLE IF NOT EXISTS custom_commands (
+    guild_id VARCHAR(32),
+    command_name TEXT,
+    command_response TEXT,
+    created_by VARCHAR(32),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    uses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, command_name)
+);
+
+-- Databases created before use counting have the table without this column
+ALTER TABLE custom_commands ADD COLUMN IF NOT EXISTS uses INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,27 @@
+-- Weekly and monthly recognition counts, maintained by the recognition insert
+
+CREATE TABLE IF NOT EXISTS recognition_rollups (
+    period TEXT NOT NULL,
+    period_start DATE NOT NULL,
+    user_id VARCHAR(32) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, period_start, user_id)
+);
+
+-- Serves "top N for the current week/month" without sorting the whole period
+CREATE INDEX IF NOT EXISTS idx_recognition_rollups_rank ON recognition_rollups(period, period_start, count DESC);
+
+-- For ad-hoc windows over the raw history
+CREATE INDEX IF NOT EXISTS idx_recognitions_created_at ON recognitions(created_at);
+
+-- Backfill from existing recognitions
+INSERT INTO recognition_rollups(period, period_start, user_id, count)
+SELECT 'week', date_trunc('week', created_at)::date, to_user, count(*)
+FROM recognitions
+GROUP BY 2, 3
+UNION ALL
+SELECT 'month', date_trunc('month', created_at)::date, to_user, count(*)
+FROM recognitions
+GROUP BY 2, 3
+ON CONFLICT (period, period_start, user_id)
+DO UPDATE SET count = EXCLUDED.count;
@@ -0,0 +1,9 @@
+-- Daily claims are checked against now() inside the claim statement, so store
+-- them as absolute times. Existing values were written with the bot host's
+-- local clock and are read in the database's time zone; if those differ, the
+-- next claim for users who claimed before this migration shifts by the offset once.
+ALTER TABLE pickle_counts
+    ALTER COLUMN last_daily TYPE TIMESTAMPTZ USING last_daily::timestamptz;
+
+-- Consecutive days claimed, for the streak bonus
+ALTER TABLE pickle_counts ADD COLUMN IF NOT EXISTS daily_streak INTEGER NOT NULL DEFAULT 0;
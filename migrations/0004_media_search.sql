@@ -0,0 +1,15 @@
+-- Full-text search over media titles and descriptions. Titles weigh more than
+-- descriptions in the ranking. Adding the stored column rewrites the table once.
+ALTER TABLE media_collections ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_media_search ON media_collections USING GIN (search_vector);
+
+-- Tag filters (tags @> ARRAY[...])
+CREATE INDEX IF NOT EXISTS idx_media_tags ON media_collections USING GIN (tags);
+
+-- Browsing a category newest first, without a text query
+CREATE INDEX IF NOT EXISTS idx_media_category_id ON media_collections(category, id DESC) WHERE approved;
@@ -0,0 +1,24 @@
+import json
+import time
+from utils.cooldowns import CooldownStore
+
+def write_snapshot(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+def test_worker_snapshots_are_shared_out_after_a_worker_count_change(tmp_path):
+    now = time.time()
+    base = str(tmp_path / "cooldowns.json")
+    write_snapshot(tmp_path / "cooldowns-worker-0.json", {"1:10": now + 60, "2:20": now + 60})
+    write_snapshot(tmp_path / "cooldowns-worker-1.json", {"3:30": now + 60})
+    # Left by a worker that no longer exists, with nothing live in it
+    write_snapshot(tmp_path / "cooldowns-worker-2.json", {"4:40": now - 60})
+
+    store = CooldownStore("test-worker-0", 300)
+    restored = store.load_workers(base, str(tmp_path / "cooldowns-worker-0.json"), keep=lambda key: key[0] in "13")
+
+    assert restored == 2
+    assert store.remaining("1:10") > 0 and store.remaining("3:30") > 0
+    assert store.remaining("2:20") == 0
+    assert not (tmp_path / "cooldowns-worker-2.json").exists()
+    assert (tmp_path / "cooldowns-worker-1.json").exists()
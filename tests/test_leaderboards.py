@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from utils.db_manager import db
+
+pytest.importorskip("discord")
+
+from cogs.community_recognition import CommunityRecognition
+from cogs.pickle_tracking import PickleTracking
+
+class BrokenPool:
+    """A pool whose every connection attempt fails"""
+
+    def acquire(self, *args, **kwargs):
+        raise ConnectionError("database unavailable")
+
+def test_failed_pickle_seed_leaves_leaderboard_unseeded(monkeypatch):
+    monkeypatch.setattr(db, "pool", BrokenPool())
+    cog = PickleTracking(None)
+    with pytest.raises(ConnectionError):
+        asyncio.run(cog.seed_leaderboard())
+    assert cog.leaderboard.needs_seed
+
+def test_failed_recognition_seed_leaves_leaderboard_unseeded(monkeypatch):
+    monkeypatch.setattr(db, "pool", BrokenPool())
+    cog = CommunityRecognition(None)
+    with pytest.raises(ConnectionError):
+        asyncio.run(cog.top_recognized("all"))
+    assert cog.leaderboard.needs_seed
+
+def test_failed_period_leaderboard_is_not_cached(monkeypatch):
+    monkeypatch.setattr(db, "pool", BrokenPool())
+    cog = CommunityRecognition(None)
+    with pytest.raises(ConnectionError):
+        asyncio.run(cog.top_recognized("week"))
+    assert cog.period_boards.get("week") is None
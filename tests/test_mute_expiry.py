@@ -0,0 +1,106 @@
+import asyncio
+import datetime
+import time
+import types
+import pytest
+from utils.db_manager import db
+from utils.scheduler import ExpiryScheduler
+
+def test_failed_expiry_is_retried():
+    calls = []
+
+    async def expire(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+
+    async def run():
+        scheduler = ExpiryScheduler("test", expire, retry_delay=0.01)
+        scheduler.start()
+        scheduler.schedule("key", time.time())
+        for _ in range(100):
+            if len(calls) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert calls == ["key", "key"]
+    assert scheduler.stats()["retried"] == 1
+    assert len(scheduler) == 0
+
+def test_cancelled_expiry_is_not_retried():
+    async def run():
+        scheduler = ExpiryScheduler("test", None, retry_delay=0.01)
+
+        async def expire(key):
+            scheduler.cancel(key)
+            raise RuntimeError("unmuted meanwhile")
+
+        scheduler.callback = expire
+        scheduler._firing.add("key")
+        await scheduler._fire("key")
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert len(scheduler) == 0
+    assert scheduler.stats()["retried"] == 0
+
+def run_expiry(monkeypatch, fetchrow, remove_roles):
+    """Fire one mute expiry against a fake guild and return (cog, executed queries)"""
+    pytest.importorskip("discord")
+    from cogs.moderation import Moderation
+
+    muted_role = types.SimpleNamespace(name="Muted")
+    member = types.SimpleNamespace(roles=[muted_role], remove_roles=remove_roles)
+    guild = types.SimpleNamespace(roles=[muted_role], get_member=lambda user_id: member)
+
+    async def wait_until_ready():
+        pass
+
+    bot = types.SimpleNamespace(wait_until_ready=wait_until_ready, get_guild=lambda guild_id: guild)
+    executed = []
+
+    async def execute(query, *args):
+        executed.append(query)
+
+    monkeypatch.setattr(db, "pool", object())
+    monkeypatch.setattr(db, "fetchrow", fetchrow)
+    monkeypatch.setattr(db, "execute", execute)
+
+    async def run():
+        cog = Moderation(bot)
+        cog.mute_scheduler.retry_delay = 60
+        cog.mute_scheduler._firing.add(("1", "2"))
+        await cog.mute_scheduler._fire(("1", "2"))
+        return cog
+
+    return asyncio.run(run()), executed
+
+def test_mute_row_kept_when_role_removal_fails(monkeypatch):
+    expired = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)
+
+    async def fetchrow(query, *args, strict=False):
+        return {"channel_id": None, "expires_at": expired}
+
+    async def remove_roles(role, reason=None):
+        raise RuntimeError("rate limited")
+
+    cog, executed = run_expiry(monkeypatch, fetchrow, remove_roles)
+    # The row stays so the expiry survives a restart, and it is retried
+    assert executed == []
+    assert ("1", "2") in cog.mute_scheduler.due
+
+def test_mute_expiry_retried_when_database_fails(monkeypatch):
+    removed = []
+
+    async def fetchrow(query, *args, strict=False):
+        raise RuntimeError("connection lost")
+
+    async def remove_roles(role, reason=None):
+        removed.append(role)
+
+    cog, executed = run_expiry(monkeypatch, fetchrow, remove_roles)
+    assert removed == [] and executed == []
+    assert ("1", "2") in cog.mute_scheduler.due
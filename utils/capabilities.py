@@ -0,0 +1,68 @@
+import importlib
+import discord
+from utils.config import config
+
+# Needed by the bot itself: guild metadata and prefixed commands in servers and DMs
+CORE_INTENTS = ("guilds", "guild_messages", "dm_messages", "message_content")
+
+# Member cache flags only work with the intent that feeds them
+MEMBER_CACHE_INTENTS = {
+    "joined": "members",
+    "voice": "voice_states",
+}
+
+def resolve_profile(cog_names):
+    """
+    Builds the gateway intents and member cache flags the loaded cogs need.
+
+    Each cog module may declare module-level ``INTENTS`` (names of
+    discord.Intents flags) and ``MEMBER_CACHE`` (names of
+    discord.MemberCacheFlags flags). Everything not declared is left off.
+    Setting ``intents.profile`` to ``"all"`` in config.json restores the old
+    everything-on behaviour.
+
+    Returns:
+        tuple: (discord.Intents, discord.MemberCacheFlags, {flag: [cog names]})
+    """
+    if config.get("intents", {}).get("profile", "cogs") == "all":
+        intents = discord.Intents.all()
+        return intents, discord.MemberCacheFlags.from_intents(intents), {}
+
+    intents = discord.Intents.none()
+    member_cache = discord.MemberCacheFlags.none()
+    sources = {}
+
+    def enable(flags, flag, source):
+        if not hasattr(flags, flag):
+            raise ValueError(f"{source} declares unknown flag '{flag}'")
+        setattr(flags, flag, True)
+        sources.setdefault(flag, []).append(source)
+
+    for flag in CORE_INTENTS:
+        enable(intents, flag, "core")
+    for cog_name in cog_names:
+        module = importlib.import_module(cog_name)
+        for flag in getattr(module, "INTENTS", ()):
+            enable(intents, flag, cog_name)
+        for flag in getattr(module, "MEMBER_CACHE", ()):
+            enable(member_cache, flag, cog_name)
+            if flag in MEMBER_CACHE_INTENTS:
+                enable(intents, MEMBER_CACHE_INTENTS[flag], cog_name)
+
+    return intents, member_cache, sources
+
+def describe_profile(intents, member_cache):
+    """One-line summary of the enabled intents and member cache flags"""
+    enabled = [name for name, value in intents if value]
+    cached = [name for name, value in member_cache if value]
+    return f"intents: {', '.join(enabled) or 'none'}; member cache: {', '.join(cached) or 'none'}"
+
+async def get_or_fetch_member(guild, user_id):
+    """Return a guild member from the cache, fetching it over REST if it isn't cached"""
+    member = guild.get_member(int(user_id))
+    if member is not None:
+        return member
+    try:
+        return await guild.fetch_member(int(user_id))
+    except discord.NotFound:
+        return None
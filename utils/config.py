@@ -1,11 +1,211 @@
+import asyncio
 import json
+import os
+from types import MappingProxyType
+
+# Resolved from the repository root, not the working directory; CONFIG_PATH overrides it
+CONFIG_PATH = os.getenv(
+    "CONFIG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.json')
+)
+
+MATCH_MODES = ("substring", "word", "stem")
+PUNISHMENTS = ("mute", "kick", "ban")
+COOLDOWN_PERSISTENCE = ("database", "disk", "none")
+
+class ConfigError(ValueError):
+    """Raised when config.json can't be read or fails validation"""
+
+def freeze(value):
+    """Return a read-only copy: dicts become mapping proxies and lists become tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def validate(data):
+    """Return a list of problems with a parsed config; empty if it is usable"""
+    problems = []
+    if not isinstance(data, dict):
+        return ["config must be a JSON object"]
+
+    def number(section, key, minimum=0):
+        value = data.get(section, {}).get(key)
+        if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or value < minimum):
+            problems.append(f"{section}.{key} must be a number >= {minimum}")
+
+    for section, settings in data.items():
+        if not isinstance(settings, dict):
+            problems.append(f"{section} must be an object")
+    if problems:
+        return problems
+
+    pickle_rewards = data.get("pickle_rewards", {})
+    words = pickle_rewards.get("words")
+    if words is not None and (not isinstance(words, list) or not words or not all(isinstance(word, str) and word.strip() for word in words)):
+        problems.append("pickle_rewards.words must be a non-empty list of words")
+    if pickle_rewards.get("match_mode", "stem") not in MATCH_MODES:
+        problems.append(f"pickle_rewards.match_mode must be one of {', '.join(MATCH_MODES)}")
+    if pickle_rewards.get("cooldown_persistence", "database") not in COOLDOWN_PERSISTENCE:
+        problems.append(f"pickle_rewards.cooldown_persistence must be one of {', '.join(COOLDOWN_PERSISTENCE)}")
+    messages = pickle_rewards.get("reward_messages")
+    if messages is not None and (not isinstance(messages, list) or not messages or not all(isinstance(message, str) for message in messages)):
+        problems.append("pickle_rewards.reward_messages must be a non-empty list of strings")
+    for key in ("cooldown_seconds", "flush_interval_seconds"):
+        number("pickle_rewards", key)
+    for key in ("cooldown_max_entries", "flush_max_pending"):
+        number("pickle_rewards", key, minimum=1)
+
+    thresholds = data.get("moderation", {}).get("warning_thresholds", {})
+    if not isinstance(thresholds, dict):
+        problems.append("moderation.warning_thresholds must be an object")
+    else:
+        for count, action in thresholds.items():
+            if not count.isdigit():
+                problems.append(f"moderation.warning_thresholds key '{count}' must be a warning count")
+            if not isinstance(action, str) or action not in PUNISHMENTS:
+                problems.append(f"moderation.warning_thresholds.{count} must be one of {', '.join(PUNISHMENTS)}")
+
+    for key in ("amount", "cooldown_hours", "streak_window_hours", "streak_bonus", "streak_bonus_max"):
+        number("daily", key)
+    for key in ("amount", "streak_bonus", "streak_bonus_max"):
+        if not isinstance(data.get("daily", {}).get(key, 0), int):
+            problems.append(f"daily.{key} must be a whole number of coins")
+
+    for key in ("page_size", "cache_max_entries"):
+        number("media_finder", key, minimum=1)
+    number("media_finder", "cache_ttl_seconds")
+
+    for key in ("pool_min_size", "pool_max_size"):
+        number("database", key, minimum=1)
+    for key in ("acquire_timeout_seconds", "command_timeout_seconds", "slow_query_ms"):
+        number("database", key)
+
+    categories = data.get("logging", {}).get("categories", {})
+    if not isinstance(categories, dict):
+        problems.append("logging.categories must be an object")
+    else:
+        for category, limit in categories.items():
+            if not isinstance(limit, dict):
+                problems.append(f"logging.categories.{category} must be an object")
+                continue
+            rate = limit.get("sample_rate", 1.0)
+            if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not 0 <= rate <= 1:
+                problems.append(f"logging.categories.{category}.sample_rate must be between 0 and 1")
+            cap = limit.get("max_per_minute")
+            if cap is not None and (not isinstance(cap, int) or isinstance(cap, bool) or cap < 0):
+                problems.append(f"logging.categories.{category}.max_per_minute must be a whole number >= 0")
+
+    return problems
 
 class ConfigManager:
-    def __init__(self):
-        with open("config.json") as f:
-            self.config = json.load(f)
+    """Holds the current config as an immutable snapshot that can be reloaded in place.
+
+    ``get`` reads from the current snapshot, which is only ever replaced
+    whole, so readers never see a half-applied reload. After a reload each
+    section that changed is passed to its subscribers as
+    ``callback(new_section, old_section)`` so they can rebuild what they
+    precomputed from it.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self.snapshot = self._read()
+        self.version = 1
+        self.mtime = self._mtime()
+        self.subscribers = {}
+        self._watch_task = None
 
     def get(self, key, default=None):
-        return self.config.get(key, default)
+        return self.snapshot.get(key, default)
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _read(self):
+        """Read, validate and freeze the config file"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"Could not read {self.path}: {str(e)}")
+
+        problems = validate(data)
+        if problems:
+            raise ConfigError("Invalid config: " + "; ".join(problems))
+        return freeze(data)
+
+    def subscribe(self, section, callback):
+        """Call callback(new_section, old_section) whenever a section changes on reload"""
+        self.subscribers.setdefault(section, []).append(callback)
+
+    def unsubscribe(self, section, callback):
+        callbacks = self.subscribers.get(section, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def reload(self):
+        """
+        Re-reads config.json and swaps it in if it is valid.
+
+        Raises:
+            ConfigError: If the file can't be parsed or fails validation;
+                the current snapshot stays in place.
+
+        Returns:
+            list: The names of the sections that changed.
+        """
+        from utils.logger import logger
+
+        self.mtime = self._mtime()
+        new = self._read()
+        old, self.snapshot = self.snapshot, new
+        self.version += 1
+
+        changed = sorted(
+            section for section in set(old) | set(new)
+            if old.get(section) != new.get(section)
+        )
+        for section in changed:
+            for callback in list(self.subscribers.get(section, [])):
+                try:
+                    callback(new.get(section, MappingProxyType({})), old.get(section, MappingProxyType({})))
+                except Exception as e:
+                    logger.log(f"Config subscriber for '{section}' failed: {str(e)}", "error")
+
+        logger.log(f"Config reloaded (version {self.version}); changed sections: {', '.join(changed) or 'none'}")
+        return changed
+
+    def reload_safely(self):
+        """Reload, logging instead of raising; returns the changed sections or None on failure"""
+        from utils.logger import logger
+
+        try:
+            return self.reload()
+        except ConfigError as e:
+            logger.log(f"Config reload rejected, keeping version {self.version}: {str(e)}", "error")
+            return None
+
+    def start_watching(self, interval=2.0):
+        """Reload automatically when config.json's modification time changes"""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    def stop_watching(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._mtime()
+            if mtime is not None and mtime != self.mtime:
+                self.reload_safely()
 
+# Create a singleton instance
 config = ConfigManager()
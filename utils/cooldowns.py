@@ -0,0 +1,207 @@
+import glob
+import heapq
+import json
+import os
+import time
+from utils.logger import logger
+from utils.sharding import all_workers
+
+class CooldownStore:
+    """Per-key cooldowns with expiry and a fixed memory ceiling.
+
+    Expiry times live in a dict for O(1) lookups and in a min-heap so expired
+    keys can be swept a few at a time on every call instead of accumulating.
+    When the store is full the key closest to expiring is evicted first.
+    """
+
+    def __init__(self, name, duration, max_entries=100000, sweep_batch=64):
+        self.name = name
+        self.duration = duration
+        self.max_entries = max_entries
+        self.sweep_batch = sweep_batch
+        self.expiries = {}
+        self._heap = []
+        # Metrics
+        self.expired_count = 0
+        self.evicted_count = 0
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def remaining(self, key, now=None):
+        """Return the seconds left on a key's cooldown (0 if not on cooldown)"""
+        now = time.time() if now is None else now
+        expires_at = self.expiries.get(key)
+        if expires_at is None or expires_at <= now:
+            return 0.0
+        return expires_at - now
+
+    def acquire(self, key, now=None):
+        """Start a cooldown for key if it has none.
+
+        Returns 0 if the cooldown was started, otherwise the seconds remaining.
+        """
+        now = time.time() if now is None else now
+        self._sweep(now)
+
+        remaining = self.remaining(key, now)
+        if remaining > 0:
+            return remaining
+
+        self.set(key, now + self.duration)
+        return 0.0
+
+    def set(self, key, expires_at):
+        """Set an absolute expiry time for a key"""
+        if key not in self.expiries and len(self.expiries) >= self.max_entries:
+            self._evict_one()
+        self.expiries[key] = expires_at
+        heapq.heappush(self._heap, (expires_at, key))
+
+        # Stale heap entries are normally dropped by sweeping; rebuild if they pile up
+        if len(self._heap) > 2 * self.max_entries:
+            self._heap = [(expires, k) for k, expires in self.expiries.items()]
+            heapq.heapify(self._heap)
+
+    def reset(self, key):
+        """Clear a key's cooldown"""
+        self.expiries.pop(key, None)
+
+    def _sweep(self, now):
+        """Drop up to sweep_batch expired keys from the front of the heap"""
+        for _ in range(self.sweep_batch):
+            if not self._heap or self._heap[0][0] > now:
+                return
+            expires_at, key = heapq.heappop(self._heap)
+            # Skip heap entries that were superseded by a later set()
+            if self.expiries.get(key) == expires_at:
+                del self.expiries[key]
+                self.expired_count += 1
+
+    def _evict_one(self):
+        """Remove the live key that expires soonest"""
+        while self._heap:
+            expires_at, key = heapq.heappop(self._heap)
+            if self.expiries.get(key) == expires_at:
+                del self.expiries[key]
+                self.evicted_count += 1
+                return
+
+    def resize(self, max_entries):
+        """Change the entry ceiling, evicting the soonest-expiring keys if it shrank"""
+        self.max_entries = max_entries
+        while len(self.expiries) > self.max_entries:
+            self._evict_one()
+
+    def stats(self):
+        """Return entry count and eviction metrics"""
+        return {
+            "entries": len(self.expiries),
+            "capacity": self.max_entries,
+            "heap_size": len(self._heap),
+            "expired": self.expired_count,
+            "evicted": self.evicted_count,
+        }
+
+    def snapshot(self, now=None):
+        """Return the live cooldowns as {key: expires_at}"""
+        now = time.time() if now is None else now
+        return {key: expires_at for key, expires_at in self.expiries.items() if expires_at > now}
+
+    def restore(self, data, now=None, keep=None):
+        """Load cooldowns from a snapshot, ignoring any that already expired or that keep(key) rejects"""
+        now = time.time() if now is None else now
+        restored = 0
+        for key, expires_at in data.items():
+            if expires_at > now and (keep is None or keep(key)):
+                self.set(key, expires_at)
+                restored += 1
+        return restored
+
+    def save(self, path):
+        """Write a snapshot to a JSON file"""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.log(f"Failed to save {self.name} cooldowns to {path}: {str(e)}", "error")
+
+    def load(self, path):
+        """Restore a snapshot from a JSON file, if one exists"""
+        try:
+            with open(path) as f:
+                return self.restore(json.load(f))
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.log(f"Failed to load {self.name} cooldowns from {path}: {str(e)}", "error")
+            return 0
+
+    def load_workers(self, base_path, own_path, keep=None):
+        """Restore the snapshot files of a single process and of every cluster worker.
+
+        ``base_path`` is the snapshot path without a worker suffix, so snapshots
+        written under a different worker count are still picked up, and
+        ``keep`` selects the keys this process is now responsible for. Other
+        processes' files with no live cooldowns left are removed.
+        """
+        root, ext = os.path.splitext(base_path)
+        now = time.time()
+        restored = 0
+        for pattern in all_workers(root):
+            for path in glob.glob(pattern + ext):
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                except Exception as e:
+                    logger.log(f"Failed to load {self.name} cooldowns from {path}: {str(e)}", "error")
+                    continue
+                restored += self.restore(data, now, keep)
+                if os.path.abspath(path) != os.path.abspath(own_path) and not any(expires_at > now for expires_at in data.values()):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.log(f"Failed to remove stale cooldown snapshot {path}: {str(e)}", "warning")
+        return restored
+
+    async def save_to_db(self, db):
+        """Store a snapshot in the settings table"""
+        await db.execute(
+            """
+            INSERT INTO settings(key, value)
+            VALUES($1, $2)
+            ON CONFLICT (key)
+            DO UPDATE SET value = EXCLUDED.value
+            """,
+            f"cooldowns:{self.name}", json.dumps(self.snapshot())
+        )
+
+    async def load_from_db(self, db):
+        """Restore a snapshot from the settings table"""
+        value = await db.fetchval("SELECT value FROM settings WHERE key = $1", f"cooldowns:{self.name}")
+        if not value:
+            return 0
+        return self.restore(json.loads(value))
+
+    async def load_workers_from_db(self, db, base_name, keep=None):
+        """Restore the snapshots of a single process and of every cluster worker from the settings table.
+
+        Works like load_workers(); snapshots of other processes with no live
+        cooldowns left are deleted.
+        """
+        patterns = [f"cooldowns:{pattern}" for pattern in all_workers(base_name, "%")]
+        records = await db.fetch("SELECT key, value FROM settings WHERE key LIKE ANY($1::TEXT[])", patterns, strict=True)
+        now = time.time()
+        restored = 0
+        stale = []
+        for record in records:
+            data = json.loads(record["value"])
+            restored += self.restore(data, now, keep)
+            if record["key"] != f"cooldowns:{self.name}" and not any(expires_at > now for expires_at in data.values()):
+                stale.append(record["key"])
+        if stale:
+            await db.execute("DELETE FROM settings WHERE key = ANY($1::TEXT[])", stale)
+        return restored
@@ -1,11 +1,215 @@
+import asyncio
 import asyncpg
 import os
+import time
+from contextlib import asynccontextmanager
+from utils.config import config
 from utils.logger import logger
+from utils.metrics import Histogram
+
+class NamedConnection(asyncpg.Connection):
+    """Pool connection that keeps its prepared statements for registered queries"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = {}
+
+class Transaction:
+    """Query helpers bound to one connection inside an explicit transaction.
+
+    Unlike the DatabaseManager helpers, errors are always raised so the
+    transaction is rolled back.
+    """
+
+    def __init__(self, manager, conn):
+        self.manager = manager
+        self.conn = conn
+
+    async def execute(self, query, *args):
+        return await self.manager._run(self.conn, "execute", query, args)
+
+    async def executemany(self, query, args):
+        return await self.manager._run_many(self.conn, query, args)
+
+    async def fetch(self, query, *args):
+        return await self.manager._run(self.conn, "fetch", query, args)
+
+    async def fetchrow(self, query, *args):
+        return await self.manager._run(self.conn, "fetchrow", query, args)
+
+    async def fetchval(self, query, *args):
+        return await self.manager._run(self.conn, "fetchval", query, args)
 
 class DatabaseManager:
     def __init__(self):
         self.db_url = os.getenv("DATABASE_URL")
         self.pool = None
+        # Named queries, prepared on every pooled connection
+        self.queries = {}
+
+        # Pool tuning from config.json
+        settings = config.get("database", {})
+        # cluster.py splits the pool budget between workers through DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE
+        self.min_size = int(os.getenv("DB_POOL_MIN_SIZE", settings.get("pool_min_size", 2)))
+        self.max_size = int(os.getenv("DB_POOL_MAX_SIZE", settings.get("pool_max_size", 10)))
+        self.max_inactive_lifetime = settings.get("max_inactive_connection_lifetime", 300)
+        self.acquire_timeout = settings.get("acquire_timeout_seconds", 10)
+        self.command_timeout = settings.get("command_timeout_seconds", 30)
+        self.slow_query_seconds = settings.get("slow_query_ms", 250) / 1000
+
+        # Instrumentation
+        self.acquire_wait = Histogram()
+        self.query_latency = {}
+        self.query_errors = {}
+        self.acquire_timeouts = 0
+
+        # LISTEN/NOTIFY subscriptions share one dedicated connection
+        self.listeners = {}
+        self._listen_conn = None
+        self._listen_task = None
+
+    def register_query(self, name, query):
+        """
+        Registers a named query to be prepared on each pooled connection.
+        
+        The name can then be passed to execute/fetch/fetchrow/fetchval/executemany
+        in place of the SQL text.
+        
+        Returns:
+            str: The query name.
+        """
+        self.queries[name] = query
+        return name
+
+    async def _init_connection(self, conn):
+        """Pool init hook: prepare every registered query on a new connection"""
+        for name, query in self.queries.items():
+            try:
+                conn.prepared[query] = await conn.prepare(query)
+            except Exception as e:
+                # Leave it to be prepared on first use (e.g. the table doesn't exist yet)
+                logger.log(f"Could not prepare query '{name}': {str(e)}", "warning")
+
+    async def _statement(self, conn, name):
+        """Return the connection's prepared statement for a registered query"""
+        query = self.queries[name]
+        statement = conn.prepared.get(query)
+        if statement is None:
+            statement = await conn.prepare(query)
+            conn.prepared[query] = statement
+        return statement
+
+    async def _run(self, conn, method, query, args):
+        """Run a query (SQL text or registered name) on a connection, recording its latency"""
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await self._run_untimed(conn, method, query, args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._observe(query, time.perf_counter() - start, failed)
+
+    async def _run_untimed(self, conn, method, query, args):
+        """Run a query (SQL text or registered name) on a connection"""
+        if query not in self.queries:
+            return await getattr(conn, method)(query, *args)
+
+        try:
+            return await self._run_prepared(conn, method, query, args)
+        except (asyncpg.exceptions.InvalidCachedStatementError, asyncpg.exceptions.FeatureNotSupportedError):
+            # A schema change invalidated the plan; re-prepare once unless a transaction is already aborted
+            if conn.is_in_transaction():
+                raise
+            conn.prepared.pop(self.queries[query], None)
+            return await self._run_prepared(conn, method, query, args)
+
+    async def _run_prepared(self, conn, method, name, args):
+        """Run a registered query through the connection's prepared statement"""
+        statement = await self._statement(conn, name)
+        if method == "execute":
+            # Prepared statements have no execute(); run it and return the status tag
+            await statement.fetch(*args)
+            return statement.get_statusmsg()
+        return await getattr(statement, method)(*args)
+
+    async def _run_many(self, conn, query, args):
+        """Run a query once per argument tuple in a single batched round trip"""
+        start = time.perf_counter()
+        failed = False
+        try:
+            if query not in self.queries:
+                return await conn.executemany(query, args)
+
+            statement = await self._statement(conn, query)
+            return await statement.executemany(args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._observe(query, time.perf_counter() - start, failed)
+
+    def _observe(self, query, elapsed, failed):
+        """Record a query's latency and errors, logging it if it was slow"""
+        label = query if query in self.queries else "raw"
+        histogram = self.query_latency.get(label)
+        if histogram is None:
+            histogram = self.query_latency[label] = Histogram()
+        histogram.observe(elapsed)
+
+        if failed:
+            self.query_errors[label] = self.query_errors.get(label, 0) + 1
+
+        if elapsed >= self.slow_query_seconds:
+            sql = " ".join(self.queries.get(query, query).split())
+            logger.log(f"Slow query '{label}' took {elapsed * 1000:.0f}ms: {sql[:200]}", "warning")
+
+    @asynccontextmanager
+    async def _acquire(self):
+        """Acquire a pooled connection, recording how long the wait took"""
+        start = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            logger.log(f"Timed out after {self.acquire_timeout}s waiting for a database connection", "error")
+            raise
+        self.acquire_wait.observe(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            await self.pool.release(conn)
+
+    async def ping(self, timeout=2):
+        """Return True if the database answers a trivial query within timeout seconds"""
+        if not self.pool:
+            return False
+        try:
+            async def check():
+                async with self._acquire() as conn:
+                    return await conn.fetchval("SELECT 1")
+            return await asyncio.wait_for(check(), timeout) == 1
+        except Exception:
+            return False
+
+    def stats(self):
+        """Return pool utilisation and latency figures"""
+        stats = {
+            "connected": self.pool is not None,
+            "acquire_wait": self.acquire_wait.summary(),
+            "acquire_timeouts": self.acquire_timeouts,
+            "queries": {label: histogram.summary() for label, histogram in self.query_latency.items()},
+            "errors": dict(self.query_errors),
+        }
+        if self.pool:
+            stats["pool"] = {
+                "size": self.pool.get_size(),
+                "idle": self.pool.get_idle_size(),
+                "min": self.pool.get_min_size(),
+                "max": self.pool.get_max_size(),
+            }
+        return stats
 
     async def connect(self, required=True):
         """
@@ -22,8 +226,16 @@ class DatabaseManager:
             if not self.db_url:
                 raise ValueError("DATABASE_URL environment variable is not set")
                 
-            self.pool = await asyncpg.create_pool(self.db_url)
-            logger.log(f"Successfully connected to database")
+            self.pool = await asyncpg.create_pool(
+                self.db_url,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                max_inactive_connection_lifetime=self.max_inactive_lifetime,
+                command_timeout=self.command_timeout,
+                init=self._init_connection,
+                connection_class=NamedConnection
+            )
+            logger.log(f"Successfully connected to database (pool size {self.min_size}-{self.max_size})")
             return True
         except Exception as e:
             logger.log(f"Database connection error: {str(e)}", "error")
@@ -31,36 +243,6 @@ class DatabaseManager:
                 raise e
             return False
 
-    async def create_tables_from_schema(self, schema_path):
-        """
-        Creates database tables from a SQL schema file.
-        
-        Args:
-            schema_path (str): Path to the SQL schema file.
-            
-        Returns:
-            bool: True if tables were created successfully, False otherwise.
-        """
-        try:
-            if not self.pool:
-                logger.log("Cannot create tables: Not connected to database", "error")
-                return False
-                
-            with open(schema_path, 'r') as f:
-                schema_sql = f.read()
-                
-            async with self.pool.acquire() as conn:
-                await conn.execute(schema_sql)
-                
-            logger.log(f"Successfully created tables from schema: {schema_path}")
-            return True
-        except FileNotFoundError:
-            logger.log(f"Schema file not found: {schema_path}", "error")
-            return False
-        except Exception as e:
-            logger.log(f"Error creating tables from schema: {str(e)}", "error")
-            return False
-
     async def execute(self, query, *args):
         """Execute a query with no return value expected."""
         if not self.pool:
@@ -68,53 +250,172 @@ class DatabaseManager:
             return None
             
         try:
-            async with self.pool.acquire() as conn:
-                return await conn.execute(query, *args)
+            async with self._acquire() as conn:
+                return await self._run(conn, "execute", query, args)
         except Exception as e:
             logger.log(f"Database execute error: {str(e)}", "error")
             raise
 
-    async def fetchval(self, query, *args):
-        """Execute a query and return a single value."""
+    async def fetchval(self, query, *args, strict=False):
+        """Execute a query and return a single value. strict works as in fetch()."""
         if not self.pool:
+            if strict:
+                raise RuntimeError("Cannot fetch value: Not connected to database")
             logger.log("Cannot fetch value: Not connected to database", "error")
             return None
             
         try:
-            async with self.pool.acquire() as conn:
-                return await conn.fetchval(query, *args)
+            async with self._acquire() as conn:
+                return await self._run(conn, "fetchval", query, args)
         except Exception as e:
             logger.log(f"Database fetchval error: {str(e)}", "error")
+            if strict:
+                raise
             return None
 
-    async def fetch(self, query, *args):
-        """Execute a query and return all results as a list of records."""
+    async def fetch(self, query, *args, strict=False):
+        """Execute a query and return all results as a list of records.
+
+        Errors are logged and [] is returned, unless strict is set, in which
+        case they are raised so a failed read can't be mistaken for an empty one.
+        """
         if not self.pool:
+            if strict:
+                raise RuntimeError("Cannot fetch records: Not connected to database")
             logger.log("Cannot fetch records: Not connected to database", "error")
             return []
             
         try:
-            async with self.pool.acquire() as conn:
-                return await conn.fetch(query, *args)
+            async with self._acquire() as conn:
+                return await self._run(conn, "fetch", query, args)
         except Exception as e:
             logger.log(f"Database fetch error: {str(e)}", "error")
+            if strict:
+                raise
             return []
 
-    async def fetchrow(self, query, *args):
-        """Execute a query and return the first row."""
+    async def fetchrow(self, query, *args, strict=False):
+        """Execute a query and return the first row. strict works as in fetch()."""
         if not self.pool:
+            if strict:
+                raise RuntimeError("Cannot fetch row: Not connected to database")
             logger.log("Cannot fetch row: Not connected to database", "error")
             return None
             
         try:
-            async with self.pool.acquire() as conn:
-                return await conn.fetchrow(query, *args)
+            async with self._acquire() as conn:
+                return await self._run(conn, "fetchrow", query, args)
         except Exception as e:
             logger.log(f"Database fetchrow error: {str(e)}", "error")
+            if strict:
+                raise
             return None
 
+    async def executemany(self, query, args):
+        """Execute a query for each argument tuple in one batched round trip."""
+        if not self.pool:
+            logger.log("Cannot execute batch: Not connected to database", "error")
+            return None
+            
+        try:
+            async with self._acquire() as conn:
+                return await self._run_many(conn, query, args)
+        except Exception as e:
+            logger.log(f"Database executemany error: {str(e)}", "error")
+            raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Runs queries on one connection inside an explicit transaction.
+        
+        Usage:
+            async with db.transaction() as tx:
+                await tx.execute(...)
+                await tx.fetchval(...)
+        
+        The transaction commits when the block exits and rolls back if it raises.
+        """
+        if not self.pool:
+            raise RuntimeError("Cannot start transaction: Not connected to database")
+            
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                yield Transaction(self, conn)
+
+    async def listen(self, channel, callback):
+        """
+        Subscribes to a Postgres NOTIFY channel.
+        
+        Notifications arrive on a dedicated connection outside the pool, which
+        is reopened (and every channel re-subscribed) if it drops. After a
+        reconnect each callback receives None, since anything sent while
+        disconnected was missed.
+        
+        Args:
+            channel (str): The channel name used with NOTIFY/pg_notify.
+            callback (function): Called as callback(payload) for each notification.
+        """
+        self.listeners[channel] = callback
+        if self._listen_conn and not self._listen_conn.is_closed():
+            await self._listen_conn.add_listener(channel, self._dispatch_notification)
+        else:
+            await self._open_listen_connection()
+
+    async def unlisten(self, channel):
+        """Stop receiving notifications for a channel"""
+        if self.listeners.pop(channel, None) and self._listen_conn and not self._listen_conn.is_closed():
+            await self._listen_conn.remove_listener(channel, self._dispatch_notification)
+
+    def _dispatch_notification(self, conn, pid, channel, payload):
+        callback = self.listeners.get(channel)
+        if callback is None:
+            return
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.log(f"Notification handler for '{channel}' failed: {str(e)}", "error")
+
+    async def _open_listen_connection(self):
+        """Open the listener connection and subscribe every registered channel"""
+        try:
+            conn = await asyncpg.connect(self.db_url)
+            for channel in self.listeners:
+                await conn.add_listener(channel, self._dispatch_notification)
+            conn.add_termination_listener(self._on_listen_terminated)
+            self._listen_conn = conn
+            return True
+        except Exception as e:
+            logger.log(f"Could not open database listener connection: {str(e)}", "error")
+            return False
+
+    def _on_listen_terminated(self, conn):
+        """Reconnect the listener connection in the background after it drops"""
+        if conn is not self._listen_conn or self._listen_task is not None:
+            return
+        logger.log("Database listener connection lost, reconnecting", "warning")
+        self._listen_conn = None
+        self._listen_task = asyncio.create_task(self._reconnect_listener())
+
+    async def _reconnect_listener(self):
+        delay = 1
+        try:
+            while self.listeners and not await self._open_listen_connection():
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            # Notifications sent while disconnected were missed
+            for channel in list(self.listeners):
+                self._dispatch_notification(None, None, channel, None)
+        finally:
+            self._listen_task = None
+
     async def close(self):
         """Close the database connection pool."""
+        if self._listen_task:
+            self._listen_task.cancel()
+        if self._listen_conn:
+            conn, self._listen_conn = self._listen_conn, None
+            await conn.close()
         if self.pool:
             await self.pool.close()
             logger.log("Database connection closed")
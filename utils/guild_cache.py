@@ -0,0 +1,120 @@
+import asyncio
+from collections import OrderedDict
+
+class GuildCache:
+    """Lazily loaded per-guild cache, evicted least-recently-used under a memory budget.
+
+    A guild's data is loaded by ``loader(guild_id)`` the first time it is
+    needed. ``sizeof(value)`` estimates each entry's footprint in bytes, and
+    the least recently used guilds are dropped once the total exceeds
+    ``max_bytes``.
+
+    Each guild has a generation that invalidate() and resize() bump, so a load
+    that was in flight when the guild changed is returned to its callers but
+    not cached over the change.
+    """
+
+    def __init__(self, name, loader, sizeof, max_bytes=4_000_000):
+        self.name = name
+        self.loader = loader
+        self.sizeof = sizeof
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._generations = {}
+        # Metrics
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, guild_id):
+        """Return a guild's data, loading it on first use"""
+        entry = self._entries.get(guild_id)
+        if entry is not None:
+            self._entries.move_to_end(guild_id)
+            self.hits += 1
+            return entry[0]
+
+        # Share one load between concurrent callers for the same guild
+        future = self._loading.get(guild_id)
+        if future is None:
+            future = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = future
+            future.add_done_callback(lambda done: self._finish_load(guild_id, done))
+        return await asyncio.shield(future)
+
+    def _finish_load(self, guild_id, future):
+        # An invalidation may already have replaced this load with a newer one
+        if self._loading.get(guild_id) is future:
+            del self._loading[guild_id]
+
+    def peek(self, guild_id):
+        """Return a guild's data only if it is already cached"""
+        entry = self._entries.get(guild_id)
+        return entry[0] if entry is not None else None
+
+    async def _load(self, guild_id):
+        generation = self._generations.get(guild_id, 0)
+        value = await self.loader(guild_id)
+        self.loads += 1
+        if self._generations.get(guild_id, 0) == generation:
+            self._store(guild_id, value)
+        return value
+
+    def _bump(self, guild_id):
+        """Start a new generation, so loads already in flight are not cached"""
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
+        # Callers from now on must not share a load that began before the change
+        self._loading.pop(guild_id, None)
+
+    def _store(self, guild_id, value):
+        self._discard(guild_id)
+        size = self.sizeof(value)
+        self._entries[guild_id] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            evicted_id, _ = next(iter(self._entries.items()))
+            self._discard(evicted_id)
+            self.evictions += 1
+
+    def _discard(self, guild_id):
+        entry = self._entries.pop(guild_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def resize(self, guild_id):
+        """Recompute a cached guild's size after its data was changed in place"""
+        self._bump(guild_id)
+        entry = self._entries.get(guild_id)
+        if entry is not None:
+            self._store(guild_id, entry[0])
+
+    def invalidate(self, guild_id):
+        """Drop a guild so it is reloaded on next use"""
+        if guild_id in self._entries:
+            self.invalidations += 1
+        self._bump(guild_id)
+        self._discard(guild_id)
+
+    def clear(self):
+        for guild_id in list(self._loading):
+            self._bump(guild_id)
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        """Return size and hit figures"""
+        return {
+            "guilds": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,107 @@
+import re
+
+# Inflections accepted after a configured word in "stem" mode
+STEM_SUFFIXES = ("s", "es", "d", "ed", "ing", "r", "rs", "er", "ers", "y")
+
+MATCH_MODES = ("substring", "word", "stem")
+
+class KeywordMatcher:
+    """Matches a list of keywords against text in a single regex scan.
+
+    The keywords are folded into a prefix trie and compiled into one regular
+    expression, so each message is scanned once no matter how many words are
+    configured.
+
+    Modes:
+        substring: match anywhere, including inside other words (legacy behaviour)
+        word: match whole words only ("dill" matches but "dillon" does not)
+        stem: whole words plus common inflections ("pickles", "pickling")
+    """
+
+    def __init__(self, words, mode="stem"):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode '{mode}', expected one of {', '.join(MATCH_MODES)}")
+
+        self.mode = mode
+        self.words = sorted({word.lower() for word in words if word})
+        # Maps every spelling the regex can match back to its configured word
+        self.variants = self._expand(self.words, mode)
+        self.pattern = self._compile(self.variants, mode)
+
+    @staticmethod
+    def _expand(words, mode):
+        """Return {variant: configured word} for every spelling to match"""
+        variants = {}
+        if mode == "stem":
+            for word in words:
+                stems = [word]
+                if word.endswith("e"):
+                    # "pickle" -> "pickling", "pickly"
+                    stems.append(word[:-1])
+                for stem in stems:
+                    for suffix in STEM_SUFFIXES:
+                        variants.setdefault(stem + suffix, word)
+        # Configured words always map to themselves, even if they are another word's inflection
+        variants.update({word: word for word in words})
+        return variants
+
+    @staticmethod
+    def _compile(variants, mode):
+        """Build the single regex for a set of variants"""
+        if not variants:
+            # Never matches anything
+            return re.compile(r"(?!)")
+
+        body = f"({_trie_to_regex(_build_trie(variants))})"
+        if mode != "substring":
+            # Lookarounds rather than \b, which never matches next to a keyword that
+            # starts or ends with a non-word character such as "c++"
+            body = rf"(?<!\w){body}(?!\w)"
+        # Leading character class lets the regex engine skip ahead to plausible start positions
+        first_chars = "".join(re.escape(char) for char in sorted({variant[0] for variant in variants}))
+        return re.compile(f"(?=[{first_chars}]){body}")
+
+    def search(self, text, lowered=False):
+        """Return the first matched keyword, or None if nothing matches.
+
+        Pass lowered=True when the text is already lowercase to skip re-casing it.
+        """
+        match = self.pattern.search(text if lowered else text.lower())
+        return self.variants.get(match.group(1), match.group(1)) if match else None
+
+    def find_all(self, text, lowered=False):
+        """Return the set of configured keywords that appear in the text"""
+        matches = self.pattern.findall(text if lowered else text.lower())
+        return {self.variants.get(match, match) for match in matches}
+
+def _build_trie(words):
+    """Fold a word list into a nested dict trie; '' marks the end of a word"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return trie
+
+def _trie_to_regex(node):
+    """Turn a trie into a regex with shared prefixes, longest alternatives first"""
+    alternatives = []
+    optional = False
+    for char in sorted(node):
+        if char == "":
+            optional = True
+            continue
+        child = node[char]
+        alternatives.append(re.escape(char) + _trie_to_regex(child))
+
+    if not alternatives:
+        return ""
+
+    pattern = "|".join(alternatives)
+    if optional:
+        # A word ends here but longer words continue; the greedy ? prefers the longer match
+        return f"(?:{pattern})?"
+    if len(alternatives) > 1:
+        return f"(?:{pattern})"
+    return pattern
@@ -0,0 +1,56 @@
+import time
+
+class TopKLeaderboard:
+    """In-memory top-K leaderboard seeded from the database and kept current by updates.
+
+    Only the best ``capacity`` entries are held. Scores only ever grow, so as
+    long as every increment reports the user's new total through ``update``,
+    the cache always holds the true top entries. A periodic reseed picks up
+    writes made by other processes.
+    """
+
+    def __init__(self, k=10, capacity=None, refresh_seconds=300):
+        self.k = k
+        self.capacity = capacity or k * 5
+        self.refresh_seconds = refresh_seconds
+        self.scores = {}
+        self.seeded_at = None
+        self._ranked = None
+
+    @property
+    def needs_seed(self):
+        """True if the cache has never been seeded or is due for a refresh"""
+        if self.seeded_at is None:
+            return True
+        return self.refresh_seconds and time.monotonic() - self.seeded_at > self.refresh_seconds
+
+    def seed(self, rows):
+        """Replace the cache with (key, score) rows read from the database"""
+        self.scores = {}
+        for key, score in rows:
+            self.scores[key] = score
+        self._trim()
+        self._ranked = None
+        self.seeded_at = time.monotonic()
+
+    def update(self, key, score):
+        """Record a key's new total score"""
+        if key not in self.scores and len(self.scores) >= self.capacity:
+            # Not good enough to displace the lowest cached entry
+            if score <= min(self.scores.values()):
+                return
+        self.scores[key] = score
+        self._trim()
+        self._ranked = None
+
+    def top(self, n=None):
+        """Return the best n entries as a list of (key, score), highest first"""
+        if self._ranked is None:
+            self._ranked = sorted(self.scores.items(), key=lambda item: (-item[1], item[0]))
+        return self._ranked[:n or self.k]
+
+    def _trim(self):
+        """Drop the lowest entries beyond capacity"""
+        while len(self.scores) > self.capacity:
+            lowest = min(self.scores, key=self.scores.get)
+            del self.scores[lowest]
@@ -1,34 +1,204 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from utils.config import config
 
 # Create logs directory if it doesn't exist
 log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
 os.makedirs(log_dir, exist_ok=True)
 
-# Set up file logging
-log_file = os.path.join(log_dir, 'bot.log')
+# Cluster workers each write their own file
+worker_id = os.getenv("WORKER_ID")
+log_file = os.path.join(log_dir, f'bot-worker-{worker_id}.log' if worker_id else 'bot.log')
 
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filemode='a'
-)
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+# Keys the JSON formatter writes itself; structured fields can't overwrite them
+RESERVED_KEYS = ("ts", "level", "message", "category", "worker", "exception")
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+        }
+        if getattr(record, "category", None):
+            entry["category"] = record.category
+        if worker_id:
+            entry["worker"] = worker_id
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            # A field named like a reserved key is kept under a prefixed name
+            entry[f"field_{key}" if key in RESERVED_KEYS else key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class ConsoleFormatter(logging.Formatter):
+    """The plain ``LEVEL: message`` lines the bot has always printed"""
+
+    def format(self, record):
+        return f"{record.levelname}: {record.getMessage()}"
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Records are formatted on the listener thread; only make sure the message is resolved
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class CategoryLimit:
+    """Sampling rate and per-minute cap for one log category"""
+
+    def __init__(self, sample_rate=1.0, max_per_minute=None):
+        self.sample_rate = sample_rate
+        self.max_per_minute = max_per_minute
+        self.window_start = 0.0
+        self.window_count = 0
+        self.suppressed = 0
+        self.total_suppressed = 0
 
 class BotLogger:
-    @staticmethod
-    def log(message, level="info"):
-        """Log a message with the specified level"""
-        if level.lower() == "error":
-            logging.error(message)
-            print(f"ERROR: {message}")
-        elif level.lower() == "warning":
-            logging.warning(message)
-            print(f"WARNING: {message}")
+    """Logs through a queue so the event loop never waits on disk or stdout.
+
+    ``log()`` only applies category sampling and rate limits and puts the
+    record on a bounded queue. A QueueListener thread formats records and
+    writes them to a rotating JSON-lines file and to stdout. Warnings and
+    errors are never sampled or rate limited.
+    """
+
+    def __init__(self):
+        settings = config.get("logging", {})
+        self.level = LEVELS.get(settings.get("level", "info"), logging.INFO)
+        self.queue = queue.Queue(maxsize=settings.get("queue_size", 10000))
+        self.queue_handler = DroppingQueueHandler(self.queue)
+        self.limits = {
+            name: CategoryLimit(limit.get("sample_rate", 1.0), limit.get("max_per_minute"))
+            for name, limit in settings.get("categories", {}).items()
+        }
+
+        # File rotation by time if rotate_when is set (e.g. "midnight"), otherwise by size
+        if settings.get("rotate_when"):
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=settings["rotate_when"], backupCount=settings.get("backup_count", 5), encoding="utf-8"
+            )
         else:
-            logging.info(message)
-            print(f"INFO: {message}")
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=settings.get("max_bytes", 10_000_000),
+                backupCount=settings.get("backup_count", 5), encoding="utf-8"
+            )
+        file_handler.setFormatter(JsonFormatter() if settings.get("format", "json") == "json" else ConsoleFormatter())
+        handlers = [file_handler]
+        if settings.get("console", True):
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(ConsoleFormatter())
+            handlers.append(console_handler)
+
+        self._logger = logging.getLogger("picklejar")
+        self._logger.setLevel(self.level)
+        self._logger.propagate = False
+        self._logger.addHandler(self.queue_handler)
+
+        # Library logs (discord.py, asyncpg, aiohttp) go through the same queue
+        root = logging.getLogger()
+        root.setLevel(LEVELS.get(settings.get("library_level", "info"), logging.INFO))
+        root.addHandler(self.queue_handler)
+
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.close)
+        config.subscribe("logging", self.on_config_changed)
+
+    def on_config_changed(self, settings, previous):
+        """Apply reloaded levels and category limits; file and queue settings need a restart"""
+        self.level = LEVELS.get(settings.get("level", "info"), logging.INFO)
+        self._logger.setLevel(self.level)
+        logging.getLogger().setLevel(LEVELS.get(settings.get("library_level", "info"), logging.INFO))
+
+        limits = {}
+        for name, limit in settings.get("categories", {}).items():
+            # Keep the counters of categories that still exist
+            category = self.limits.get(name) or CategoryLimit()
+            category.sample_rate = limit.get("sample_rate", 1.0)
+            category.max_per_minute = limit.get("max_per_minute")
+            limits[name] = category
+        self.limits = limits
+
+    def log(self, message, level="info", category=None, **fields):
+        """Log a message with the specified level, optional category and structured fields"""
+        levelno = LEVELS.get(level.lower(), logging.INFO)
+        if levelno < self.level:
+            return
+        if category and levelno < logging.WARNING and not self._allow(category):
+            return
+        self._logger.log(levelno, message, extra={"category": category, "fields": fields})
+
+    def _allow(self, category):
+        """Apply a category's sampling and per-minute cap"""
+        limit = self.limits.get(category)
+        if limit is None:
+            return True
+
+        if limit.sample_rate < 1.0 and random.random() >= limit.sample_rate:
+            limit.total_suppressed += 1
+            return False
+
+        if limit.max_per_minute is not None:
+            now = time.monotonic()
+            if now - limit.window_start >= 60:
+                if limit.suppressed:
+                    self._logger.info(
+                        f"Suppressed {limit.suppressed} '{category}' log messages in the last minute",
+                        extra={"category": category, "fields": {"suppressed": limit.suppressed}}
+                    )
+                limit.window_start = now
+                limit.window_count = 0
+                limit.suppressed = 0
+            if limit.window_count >= limit.max_per_minute:
+                limit.suppressed += 1
+                limit.total_suppressed += 1
+                return False
+            limit.window_count += 1
+        return True
+
+    def close(self):
+        """Write out everything still queued and stop the writer thread"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def stats(self):
+        """Return queue depth and dropped/suppressed counts"""
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.queue_handler.dropped,
+            "suppressed": {name: limit.total_suppressed for name, limit in self.limits.items()},
+        }
 
 # Create a singleton instance
 logger = BotLogger()
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from functools import cached_property
+from utils.logger import logger
+from utils.metrics import Histogram
+
+class ParsedMessage:
+    """A gateway message normalised once and shared by every subscriber"""
+
+    def __init__(self, message, prefix):
+        self.message = message
+        self.content = message.content
+        self.prefix = prefix
+        self.author_is_bot = message.author.bot
+        self.in_guild = message.guild is not None
+        self.is_command = self.content.startswith(prefix)
+
+    @cached_property
+    def lower(self):
+        """Lowercased message content"""
+        return self.content.lower()
+
+    @cached_property
+    def tokens(self):
+        """Lowercased whitespace-separated words"""
+        return self.lower.split()
+
+    @cached_property
+    def command_name(self):
+        """Lowercased command name for prefixed messages, otherwise None"""
+        if not self.is_command:
+            return None
+        parts = self.content[len(self.prefix):].split(maxsplit=1)
+        return parts[0].lower() if parts else None
+
+    @cached_property
+    def command_args(self):
+        """Everything after the command name, or an empty string"""
+        if not self.is_command:
+            return ""
+        parts = self.content[len(self.prefix):].split(maxsplit=1)
+        return parts[1] if len(parts) > 1 else ""
+
+class Subscriber:
+    """A message handler plus the cheap predicate that decides if it runs"""
+
+    def __init__(self, name, handler, predicate=None):
+        self.name = name
+        self.handler = handler
+        self.predicate = predicate
+        # Timing
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.max_ms = 0.0
+
+class MessageRouter:
+    """Parses each incoming message once and fans it out to subscribers.
+
+    Subscribers register a handler taking ``(message, parsed)`` and an optional
+    predicate taking ``parsed``. Matching handlers run concurrently, and the
+    time each one takes is recorded per subscriber.
+    """
+
+    def __init__(self, prefix="!"):
+        self.prefix = prefix
+        self.subscribers = {}
+        self.command_fallbacks = {}
+        self.messages_seen = 0
+
+    def subscribe(self, name, handler, predicate=None):
+        """Register (or replace) a subscriber"""
+        self.subscribers[name] = Subscriber(name, handler, predicate)
+
+    def unsubscribe(self, name):
+        """Remove a subscriber if it is registered"""
+        self.subscribers.pop(name, None)
+
+    def add_command_fallback(self, name, handler):
+        """Register (or replace) a handler for prefixed messages that match no bot command.
+
+        ``handler(ctx)`` is given the already-parsed command context and returns
+        True if it handled the invocation.
+        """
+        self.command_fallbacks[name] = handler
+
+    def remove_command_fallback(self, name):
+        """Remove a command fallback if it is registered"""
+        self.command_fallbacks.pop(name, None)
+
+    async def run_command_fallbacks(self, ctx):
+        """Offer an unknown command to each fallback; return True once one handles it"""
+        for name, handler in list(self.command_fallbacks.items()):
+            try:
+                if await handler(ctx):
+                    return True
+            except Exception as e:
+                logger.log(f"Command fallback '{name}' failed: {str(e)}", "error")
+                return True
+        return False
+
+    async def dispatch(self, message):
+        """Parse a message and run every subscriber whose predicate matches"""
+        self.messages_seen += 1
+        parsed = ParsedMessage(message, self.prefix)
+
+        matching = [
+            subscriber for subscriber in self.subscribers.values()
+            if subscriber.predicate is None or subscriber.predicate(parsed)
+        ]
+        if not matching:
+            return
+        if len(matching) == 1:
+            await self._run(matching[0], message, parsed)
+        else:
+            await asyncio.gather(*(self._run(subscriber, message, parsed) for subscriber in matching))
+
+    async def _run(self, subscriber, message, parsed):
+        """Run one subscriber, timing it and containing its errors"""
+        start = time.perf_counter()
+        try:
+            await subscriber.handler(message, parsed)
+        except Exception as e:
+            subscriber.errors += 1
+            logger.log(f"Message subscriber '{subscriber.name}' failed: {str(e)}", "error")
+        finally:
+            elapsed = time.perf_counter() - start
+            subscriber.calls += 1
+            subscriber.latency.observe(elapsed)
+            subscriber.max_ms = max(subscriber.max_ms, elapsed * 1000)
+
+    def stats(self):
+        """Return per-subscriber call counts and timings"""
+        return {
+            subscriber.name: {
+                "calls": subscriber.calls,
+                "errors": subscriber.errors,
+                "avg_ms": round(subscriber.latency.sum / subscriber.calls * 1000, 3) if subscriber.calls else 0.0,
+                "max_ms": round(subscriber.max_ms, 3),
+            }
+            for subscriber in self.subscribers.values()
+        }
+
+# Create a singleton instance
+router = MessageRouter()
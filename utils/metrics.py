@@ -0,0 +1,173 @@
+import bisect
+
+# Latency buckets in seconds, from 1ms to 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record one observation"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return [(upper bound, cumulative count)], ending with +Inf"""
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for bound, running in self.cumulative():
+            if running >= target:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+    def summary(self):
+        """Return count, mean and approximate tail figures"""
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+        }
+
+def _format_labels(labelnames, values, extra=None):
+    """Render a Prometheus label set such as {command="ping"}"""
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, labelnames=()):
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+class LabeledHistogram:
+    """One Histogram per label combination"""
+
+    def __init__(self, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.histograms = {}
+
+    def observe(self, value, *labels):
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = self.histograms[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+class MetricsRegistry:
+    """Collects bot metrics and renders them in the Prometheus text format.
+
+    Counters and histograms are updated directly. Gauges and externally owned
+    figures (pool sizes, buffer depth, ...) are read through callbacks when
+    the metrics are scraped, so hot paths never pay for them.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, help_text, labelnames=()):
+        """Create (or return the existing) counter"""
+        if name not in self._metrics:
+            self._metrics[name] = ("counter", help_text, Counter(labelnames))
+        return self._metrics[name][2]
+
+    def histogram(self, name, help_text, labelnames=()):
+        """Create (or return the existing) labeled histogram"""
+        if name not in self._metrics:
+            self._metrics[name] = ("histogram", help_text, LabeledHistogram(labelnames))
+        return self._metrics[name][2]
+
+    def gauge(self, name, help_text, callback, labelnames=()):
+        """Register a gauge read from callback() at scrape time.
+
+        The callback returns a number, or {label values tuple: number} when
+        labelnames are given.
+        """
+        self._metrics[name] = ("gauge", help_text, (tuple(labelnames), callback))
+
+    def collect(self, name, kind, help_text, callback, labelnames=()):
+        """Register externally owned counters or histograms read at scrape time.
+
+        The callback returns {label values tuple: value}, where value is a
+        number for counters or a Histogram for histograms.
+        """
+        self._metrics[name] = (kind, help_text, (tuple(labelnames), callback))
+
+    def unregister(self, name):
+        self._metrics.pop(name, None)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, (kind, help_text, metric) in list(self._metrics.items()):
+            try:
+                labelnames, samples = self._samples(metric)
+            except Exception:
+                # A broken callback shouldn't take the whole endpoint down
+                continue
+
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples.items():
+                if isinstance(value, Histogram):
+                    for bound, running in value.cumulative():
+                        bucket_labels = _format_labels(labelnames, labels, ("le", _format_value(bound)))
+                        lines.append(f"{name}_bucket{bucket_labels} {running}")
+                    label_text = _format_labels(labelnames, labels)
+                    lines.append(f"{name}_sum{label_text} {_format_value(value.sum)}")
+                    lines.append(f"{name}_count{label_text} {value.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _samples(metric):
+        """Return (labelnames, {labels: value}) for any kind of registered metric"""
+        if isinstance(metric, Counter):
+            return metric.labelnames, metric.values
+        if isinstance(metric, LabeledHistogram):
+            return metric.labelnames, metric.histograms
+        labelnames, callback = metric
+        value = callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return labelnames, value
+
+# Create a singleton instance
+metrics = MetricsRegistry()
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import re
+from utils.logger import logger
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
+
+# Files are named <version>_<description>.sql and applied in version order
+MIGRATION_FILE = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every bot process
+MIGRATION_LOCK_ID = 7215500417
+
+CREATE_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMPTZ DEFAULT now()
+    )
+"""
+
+class Migration:
+    """One versioned SQL file from the migrations directory"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path) as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+def discover(path=MIGRATIONS_DIR):
+    """Return the migrations in a directory sorted by version"""
+    migrations = {}
+    for filename in os.listdir(path):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {filename} and {os.path.basename(migrations[version].path)}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(path, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+async def apply_migrations(db, path=MIGRATIONS_DIR):
+    """
+    Applies every migration not yet recorded in schema_migrations.
+
+    Each migration runs in its own transaction holding a transaction-level
+    advisory lock, so concurrent bot processes apply it exactly once; the
+    others wait, see it recorded and skip it. Statements that cannot run in
+    a transaction (such as CREATE INDEX CONCURRENTLY) are not supported.
+
+    Args:
+        db (DatabaseManager): A connected database manager.
+        path (str): Directory holding the migration files.
+
+    Returns:
+        int: The number of migrations applied by this process.
+    """
+    migrations = discover(path)
+
+    async with db.transaction() as tx:
+        await tx.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+        await tx.execute(CREATE_VERSION_TABLE)
+        applied = {
+            record["version"]: record["checksum"]
+            for record in await tx.fetch("SELECT version, checksum FROM schema_migrations")
+        }
+
+    # Editing a migration after it ran has no effect on existing databases
+    for migration in migrations:
+        if migration.version in applied and applied[migration.version] != migration.checksum:
+            logger.log(f"Migration {migration.version}_{migration.name} changed after it was applied", "warning")
+
+    count = 0
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        async with db.transaction() as tx:
+            await tx.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+            # Another process may have applied it while we waited for the lock
+            if await tx.fetchval("SELECT 1 FROM schema_migrations WHERE version = $1", migration.version):
+                continue
+            await tx.execute(migration.sql)
+            await tx.execute(
+                "INSERT INTO schema_migrations(version, name, checksum) VALUES($1, $2, $3)",
+                migration.version, migration.name, migration.checksum
+            )
+        count += 1
+        logger.log(f"Applied migration {migration.version}_{migration.name}")
+
+    return count
@@ -0,0 +1,165 @@
+import asyncio
+import math
+import time
+from discord.ext import commands
+from utils.db_manager import db
+from utils.logger import logger
+from utils.message_router import router
+from utils.metrics import metrics
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the overshoot of a short periodic sleep"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self._task = None
+        self.histogram = metrics.histogram(
+            "picklejar_event_loop_lag_seconds",
+            "How late the event loop woke up from a scheduled sleep"
+        )
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.histogram.observe(self.lag)
+
+loop_lag = LoopLagMonitor()
+
+def instrument_bot(bot):
+    """Register gateway, message, command and database metrics for a bot"""
+    commands_total = metrics.counter(
+        "picklejar_commands_total", "Commands invoked, by outcome", ("command", "outcome")
+    )
+    command_latency = metrics.histogram(
+        "picklejar_command_duration_seconds", "Command handler latency", ("command",)
+    )
+
+    async def on_command(ctx):
+        ctx.metrics_started_at = time.perf_counter()
+
+    async def on_command_completion(ctx):
+        name = ctx.command.qualified_name
+        commands_total.inc(name, "success")
+        started = getattr(ctx, "metrics_started_at", None)
+        if started is not None:
+            command_latency.observe(time.perf_counter() - started, name)
+
+    async def on_command_error(ctx, error):
+        name = ctx.command.qualified_name if ctx.command else "unknown"
+        commands_total.inc(name, "error")
+        started = getattr(ctx, "metrics_started_at", None)
+        if started is not None:
+            command_latency.observe(time.perf_counter() - started, name)
+
+    bot.add_listener(on_command, "on_command")
+    bot.add_listener(on_command_completion, "on_command_completion")
+    bot.add_listener(on_command_error, "on_command_error")
+
+    # Gateway
+    metrics.gauge(
+        "picklejar_gateway_latency_seconds", "Discord gateway heartbeat latency",
+        lambda: bot.latency
+    )
+    metrics.gauge("picklejar_guilds", "Guilds the bot is in", lambda: len(bot.guilds))
+    if isinstance(bot, commands.AutoShardedBot):
+        metrics.gauge(
+            "picklejar_shard_latency_seconds", "Gateway heartbeat latency per shard",
+            lambda: {(str(shard_id), ): latency for shard_id, latency in bot.latencies},
+            ("shard",)
+        )
+    metrics.gauge("picklejar_event_loop_lag_last_seconds", "Most recent event-loop lag sample", lambda: loop_lag.lag)
+
+    # Logging pipeline
+    metrics.gauge("picklejar_log_queue_depth", "Log records waiting for the writer thread", lambda: logger.queue.qsize())
+    metrics.collect(
+        "picklejar_log_dropped_total", "counter", "Log records dropped because the queue was full",
+        lambda: logger.queue_handler.dropped
+    )
+    metrics.collect(
+        "picklejar_log_suppressed_total", "counter", "Log records dropped by category sampling or rate limits",
+        lambda: {(name, ): limit.total_suppressed for name, limit in logger.limits.items()},
+        ("category",)
+    )
+
+    # Messages, per router subscriber
+    metrics.collect(
+        "picklejar_messages_handled_total", "counter", "Messages handled by each subscriber",
+        lambda: {(name, ): subscriber.calls for name, subscriber in router.subscribers.items()},
+        ("subscriber",)
+    )
+    metrics.collect(
+        "picklejar_message_handler_errors_total", "counter", "Message handler failures by subscriber",
+        lambda: {(name, ): subscriber.errors for name, subscriber in router.subscribers.items()},
+        ("subscriber",)
+    )
+    metrics.collect(
+        "picklejar_message_handler_duration_seconds", "histogram", "Message handler latency by subscriber",
+        lambda: {(name, ): subscriber.latency for name, subscriber in router.subscribers.items()},
+        ("subscriber",)
+    )
+    metrics.collect(
+        "picklejar_messages_received_total", "counter", "Messages received from the gateway",
+        lambda: router.messages_seen
+    )
+
+    # Database
+    metrics.gauge(
+        "picklejar_db_pool_connections", "Database pool connections by state",
+        lambda: _pool_gauges(), ("state",)
+    )
+    metrics.collect(
+        "picklejar_db_acquire_wait_seconds", "histogram", "Time spent waiting for a pooled connection",
+        lambda: db.acquire_wait
+    )
+    metrics.collect(
+        "picklejar_db_acquire_timeouts_total", "counter", "Connection acquires that timed out",
+        lambda: db.acquire_timeouts
+    )
+    metrics.collect(
+        "picklejar_db_query_duration_seconds", "histogram", "Query latency by query name",
+        lambda: {(name, ): histogram for name, histogram in db.query_latency.items()},
+        ("query",)
+    )
+    metrics.collect(
+        "picklejar_db_query_errors_total", "counter", "Failed queries by query name",
+        lambda: {(name, ): count for name, count in db.query_errors.items()},
+        ("query",)
+    )
+
+    loop_lag.start()
+
+def _pool_gauges():
+    if not db.pool:
+        return {}
+    size = db.pool.get_size()
+    idle = db.pool.get_idle_size()
+    return {("in_use", ): size - idle, ("idle", ): idle, ("max", ): db.pool.get_max_size()}
+
+async def readiness(bot, max_gateway_latency=10):
+    """Return (ready, checks) for the gateway and, if configured, the database"""
+    checks = {}
+
+    # A sharded bot is only ready when every one of its shards is
+    latencies = bot.latencies if isinstance(bot, commands.AutoShardedBot) else [(None, bot.latency)]
+    gateway_ok = bot.is_ready() and not bot.is_closed() and bool(latencies) and all(
+        math.isfinite(latency) and latency < max_gateway_latency for _, latency in latencies
+    )
+    checks["gateway"] = "ok" if gateway_ok else "unavailable"
+
+    if db.db_url:
+        checks["database"] = "ok" if await db.ping() else "unavailable"
+    else:
+        checks["database"] = "disabled"
+
+    ready = all(status != "unavailable" for status in checks.values())
+    if not ready:
+        logger.log(f"Readiness check failed: {checks}", "warning")
+    return ready, checks
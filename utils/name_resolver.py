@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+import discord
+from utils.cache import TTLCache
+from utils.config import config
+from utils.db_manager import db
+from utils.logger import logger
+
+LOOKUP_NAMES = db.register_query("names.lookup", """
+    SELECT user_id, display_name FROM user_names
+    WHERE user_id = ANY($1::VARCHAR(32)[]) AND updated_at > now() - $2::INTERVAL
+""")
+STORE_NAMES = db.register_query("names.store", """
+    INSERT INTO user_names(user_id, display_name, updated_at)
+    SELECT user_id, display_name, now()
+    FROM UNNEST($1::VARCHAR(32)[], $2::TEXT[]) AS u(user_id, display_name)
+    ON CONFLICT (user_id)
+    DO UPDATE SET display_name = EXCLUDED.display_name, updated_at = EXCLUDED.updated_at
+""")
+
+class NameResolver:
+    """Resolves user IDs to display names for leaderboards and other listings.
+
+    Lookups go member cache -> in-memory LRU/TTL cache -> user_names table ->
+    Discord REST, and everything still missing is fetched in one
+    concurrency-limited batch so a leaderboard never fires a burst of requests.
+    """
+
+    def __init__(self):
+        settings = config.get("name_resolver", {})
+        self.cache = TTLCache(
+            max_entries=settings.get("max_entries", 5000),
+            ttl=settings.get("ttl_seconds", 3600)
+        )
+        # Deleted accounts stay unknown; remember that briefly instead of asking again
+        self.not_found_ttl = settings.get("not_found_ttl_seconds", 600)
+        self.max_concurrency = settings.get("max_concurrency", 4)
+        self.persist = settings.get("persist", True)
+        self.max_stored_age = datetime.timedelta(seconds=settings.get("max_stored_age_seconds", 604800))
+        self.rest_fetches = 0
+
+    async def resolve_many(self, bot, user_ids):
+        """Return {user_id: display name} for a list of user ID strings"""
+        names = {}
+        missing = []
+
+        for user_id in user_ids:
+            user = bot.get_user(int(user_id))
+            if user:
+                names[user_id] = user.display_name
+                continue
+
+            cached = self.cache.get(user_id)
+            if cached:
+                names[user_id] = cached
+            else:
+                missing.append(user_id)
+
+        if missing and self.persist and db.pool:
+            missing = await self._load_stored(missing, names)
+
+        if missing:
+            await self._fetch_from_discord(bot, missing, names)
+
+        # Anything we still couldn't resolve falls back to the raw ID
+        return {user_id: names.get(user_id) or f"User {user_id}" for user_id in user_ids}
+
+    async def _load_stored(self, user_ids, names):
+        """Fill names from the user_names table and return the IDs still missing"""
+        records = await db.fetch(LOOKUP_NAMES, user_ids, self.max_stored_age)
+        for record in records:
+            names[record["user_id"]] = record["display_name"]
+            self.cache.set(record["user_id"], record["display_name"])
+        return [user_id for user_id in user_ids if user_id not in names]
+
+    async def _fetch_from_discord(self, bot, user_ids, names):
+        """Fetch unknown users over REST with bounded concurrency"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(user_id):
+            async with semaphore:
+                try:
+                    user = await bot.fetch_user(int(user_id))
+                    self.rest_fetches += 1
+                    return user_id, user.display_name
+                except discord.NotFound:
+                    self.rest_fetches += 1
+                    self.cache.set(user_id, f"User {user_id}", ttl=self.not_found_ttl)
+                    return user_id, None
+                except discord.HTTPException as e:
+                    logger.log(f"Failed to fetch user {user_id}: {str(e)}", "warning")
+                    return user_id, None
+
+        fetched = {}
+        for user_id, name in await asyncio.gather(*(fetch(user_id) for user_id in user_ids)):
+            if name:
+                fetched[user_id] = name
+                self.cache.set(user_id, name)
+        names.update(fetched)
+
+        if fetched and self.persist and db.pool:
+            try:
+                await db.execute(STORE_NAMES, list(fetched.keys()), list(fetched.values()))
+            except Exception as e:
+                logger.log(f"Failed to store resolved names: {str(e)}", "error")
+
+    def stats(self):
+        """Return cache figures and the number of REST fetches made"""
+        stats = self.cache.stats()
+        stats["rest_fetches"] = self.rest_fetches
+        return stats
+
+# Create a singleton instance
+name_resolver = NameResolver()
@@ -0,0 +1,56 @@
+import discord
+
+class KeysetPaginator(discord.ui.View):
+    """Buttons for paging through results with keyset (cursor) pagination.
+
+    ``fetch_page(cursor)`` returns ``(embed, next_cursor)``. The first page is
+    fetched with ``cursor=None`` and ``next_cursor`` is None on the last page.
+    Cursors of earlier pages are kept on a stack so "Newer" can step back
+    without OFFSET scans.
+    """
+
+    def __init__(self, fetch_page, author_id, timeout=120):
+        super().__init__(timeout=timeout)
+        self.fetch_page = fetch_page
+        self.author_id = author_id
+        self.cursors = [None]
+        self.next_cursor = None
+        self.message = None
+
+    async def start(self, ctx):
+        """Send the first page"""
+        embed, self.next_cursor = await self.fetch_page(None)
+        self._update_buttons()
+        self.message = await ctx.send(embed=embed, view=self)
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran the command can page through this.", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+    def _update_buttons(self):
+        self.newer.disabled = len(self.cursors) <= 1
+        self.older.disabled = self.next_cursor is None
+
+    async def _show(self, interaction):
+        embed, self.next_cursor = await self.fetch_page(self.cursors[-1])
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction, button):
+        self.cursors.pop()
+        await self._show(interaction)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction, button):
+        self.cursors.append(self.next_cursor)
+        await self._show(interaction)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+import discord
+from utils.logger import logger
+
+# Channel overwrite applied to the Muted role
+MUTED_OVERWRITE = discord.PermissionOverwrite(
+    send_messages=False,
+    send_messages_in_threads=False,
+    speak=False
+)
+
+class OverwriteResult:
+    """Outcome of a bulk permission update"""
+
+    def __init__(self, total):
+        self.total = total
+        self.applied = 0
+        self.skipped = 0
+        self.failed = []
+
+    @property
+    def done(self):
+        return self.applied + self.skipped + len(self.failed)
+
+    def summary(self):
+        text = f"{self.applied} channels updated, {self.skipped} synced channels inherited from their category"
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        return text
+
+async def apply_overwrites(guild, target, overwrite, reason=None, concurrency=5, progress=None, progress_interval=2.0):
+    """
+    Applies a permission overwrite for a role or member across a guild's channels.
+
+    Categories are updated first. Channels whose permissions are synced with
+    their category are skipped, because they inherit the category's overwrites.
+    Requests run with bounded concurrency. Each channel has its own rate-limit
+    bucket for this route, and discord.py waits out any 429s per bucket.
+
+    Args:
+        guild (discord.Guild): The guild to update.
+        target (discord.Role | discord.Member): Who the overwrite applies to.
+        overwrite (discord.PermissionOverwrite): The overwrite to set.
+        reason (str): Audit log reason.
+        concurrency (int): Maximum requests in flight at once.
+        progress (coroutine function): Called as progress(result) at most every
+            progress_interval seconds and once at the end.
+
+    Returns:
+        OverwriteResult: Counts of applied and skipped channels and the failures.
+    """
+    categories = list(guild.categories)
+    # Decide what inherits before the categories change, since that changes sync state
+    others = [channel for channel in guild.channels if not isinstance(channel, discord.CategoryChannel)]
+    inherits = {channel.id for channel in others if channel.category and channel.permissions_synced}
+
+    result = OverwriteResult(len(categories) + len(others))
+    semaphore = asyncio.Semaphore(concurrency)
+    last_report = time.monotonic()
+
+    async def report(final=False):
+        nonlocal last_report
+        if progress and (final or time.monotonic() - last_report >= progress_interval):
+            last_report = time.monotonic()
+            try:
+                await progress(result)
+            except Exception as e:
+                logger.log(f"Permission progress callback failed: {str(e)}", "warning")
+
+    async def apply(channel):
+        async with semaphore:
+            try:
+                await channel.set_permissions(target, overwrite=overwrite, reason=reason)
+                result.applied += 1
+                return True
+            except discord.HTTPException as e:
+                result.failed.append((channel, str(e)))
+                return False
+            finally:
+                await report()
+
+    # Categories first, so synced children can rely on them
+    category_ok = dict(zip(
+        (category.id for category in categories),
+        await asyncio.gather(*(apply(category) for category in categories))
+    ))
+
+    pending = []
+    for channel in others:
+        if channel.id in inherits and category_ok.get(channel.category.id):
+            result.skipped += 1
+        else:
+            pending.append(channel)
+    await asyncio.gather(*(apply(channel) for channel in pending))
+
+    await report(final=True)
+    if result.failed:
+        logger.log(f"Failed to set permissions on {len(result.failed)} channels in {guild.name}", "warning")
+    return result
+
+async def ensure_muted_role(guild, reason=None, progress=None):
+    """
+    Returns the guild's Muted role, creating it and its channel overwrites if needed.
+
+    Returns:
+        tuple: (role, OverwriteResult or None if the role already existed)
+    """
+    muted_role = discord.utils.get(guild.roles, name="Muted")
+    if muted_role:
+        return muted_role, None
+
+    muted_role = await guild.create_role(name="Muted", reason=reason or "Muted role did not exist")
+    result = await apply_overwrites(guild, muted_role, MUTED_OVERWRITE, reason=reason, progress=progress)
+    logger.log(f"Created Muted role in {guild.name}: {result.summary()}")
+    return muted_role, result
@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import time
+from utils.logger import logger
+
+class ExpiryScheduler:
+    """Runs a callback for each key when its expiry time passes.
+
+    All pending expiries share one min-heap and one timer task, so tens of
+    thousands of scheduled keys cost a heap entry each rather than a sleeping
+    task each. Rescheduling or cancelling a key leaves its old heap entry in
+    place; stale entries are skipped when they reach the top.
+
+    A callback that raises is retried with exponential backoff, starting at
+    ``retry_delay`` seconds and capped at ``max_retry_delay``, unless the key
+    was rescheduled or cancelled while it ran.
+    """
+
+    def __init__(self, name, callback, concurrency=10, retry_delay=30, max_retry_delay=3600):
+        self.name = name
+        self.callback = callback
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.due = {}
+        self._attempts = {}
+        self._firing = set()
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task = None
+        self._running = set()
+        # Metrics
+        self.fired_count = 0
+        self.failed_count = 0
+        self.retry_count = 0
+
+    def __len__(self):
+        return len(self.due)
+
+    def start(self):
+        """Start the timer loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the timer loop; pending keys are kept and can be reloaded later"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, key, when):
+        """Run the callback for key at the given Unix timestamp, replacing any earlier schedule"""
+        self.due[key] = when
+        self._attempts.pop(key, None)
+        self._firing.discard(key)
+        heapq.heappush(self._heap, (when, key))
+        # Wake the loop if this is now the earliest expiry
+        if self._heap[0][1] == key:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        """Forget a scheduled key"""
+        self._attempts.pop(key, None)
+        self._firing.discard(key)
+        return self.due.pop(key, None) is not None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            delay = None
+            if self._heap:
+                delay = max(0.0, self._heap[0][0] - time.time())
+
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                when, key = heapq.heappop(self._heap)
+                # Skip cancelled keys and entries superseded by a reschedule
+                if self.due.get(key) != when:
+                    continue
+                del self.due[key]
+                self._firing.add(key)
+                task = asyncio.create_task(self._fire(key))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _fire(self, key):
+        """Run the callback for one key, bounded by the concurrency limit"""
+        async with self._semaphore:
+            try:
+                await self.callback(key)
+                self.fired_count += 1
+                self._attempts.pop(key, None)
+            except Exception as e:
+                self.failed_count += 1
+                if key not in self._firing:
+                    # Rescheduled or cancelled while the callback ran; that decision stands
+                    logger.log(f"{self.name} expiry for {key} failed: {str(e)}", "error")
+                    return
+                attempts = self._attempts.get(key, 0)
+                delay = min(self.retry_delay * 2 ** attempts, self.max_retry_delay)
+                logger.log(f"{self.name} expiry for {key} failed, retrying in {delay:.0f}s: {str(e)}", "error")
+                self.schedule(key, time.time() + delay)
+                self._attempts[key] = attempts + 1
+                self.retry_count += 1
+            finally:
+                self._firing.discard(key)
+
+    def stats(self):
+        """Return pending and fired counts"""
+        return {
+            "pending": len(self.due),
+            "heap_size": len(self._heap),
+            "fired": self.fired_count,
+            "failed": self.failed_count,
+            "retried": self.retry_count,
+        }
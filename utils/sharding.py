@@ -0,0 +1,41 @@
+import os
+
+# Set by cluster.py for each worker process; unset when running main.py directly
+WORKER_ID = os.getenv("WORKER_ID")
+
+def shard_settings():
+    """
+    Returns the shard layout for this process from the environment.
+
+    SHARD_COUNT is the total number of shards across every worker and
+    SHARD_IDS a comma-separated list of the shards this process runs.
+
+    Returns:
+        tuple: (shard_count or None, list of shard ids or None)
+    """
+    shard_count = os.getenv("SHARD_COUNT")
+    shard_ids = os.getenv("SHARD_IDS")
+    return (
+        int(shard_count) if shard_count else None,
+        [int(shard_id) for shard_id in shard_ids.split(",")] if shard_ids else None
+    )
+
+def shard_for(guild_id, shard_count):
+    """Return the shard Discord routes a guild to"""
+    return (int(guild_id) >> 22) % shard_count
+
+def owns_guild(bot, guild_id):
+    """Return True if this process runs the shard for a guild, or if that isn't known yet"""
+    shard_count = getattr(bot, "shard_count", None)
+    shard_ids = getattr(bot, "shard_ids", None)
+    if not shard_count or shard_ids is None:
+        return True
+    return shard_for(guild_id, shard_count) in shard_ids
+
+def per_worker(name):
+    """Suffix a name with the worker id so cluster workers don't share state keyed by it"""
+    return f"{name}-worker-{WORKER_ID}" if WORKER_ID else name
+
+def all_workers(name, wildcard="*"):
+    """Return patterns matching a name as saved by a single process or by any cluster worker"""
+    return [name, f"{name}-worker-{wildcard}"]
@@ -0,0 +1,57 @@
+import re
+import sys
+
+# {name} or {name.attr}; doubled braces are literal
+PLACEHOLDER = re.compile(r"\{\{|\}\}|\{([a-z_]+(?:\.[a-z_]+)?)\}")
+
+class TemplateError(ValueError):
+    """Raised when a template uses a placeholder that has no renderer"""
+
+class Template:
+    """A response template split once into literal text and placeholder lookups.
+
+    ``render(values)`` joins the literal parts with ``values[name]`` for each
+    placeholder, so rendering never re-scans the source text.
+    """
+
+    __slots__ = ("source", "parts", "fields")
+
+    def __init__(self, source, allowed=None):
+        self.source = source
+        self.parts = []
+        self.fields = set()
+
+        literal = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            literal.append(source[position:match.start()])
+            position = match.end()
+            token = match.group(0)
+            if token in ("{{", "}}"):
+                literal.append(token[0])
+                continue
+
+            name = match.group(1)
+            if allowed is not None and name not in allowed:
+                raise TemplateError(f"Unknown placeholder {{{name}}}")
+            self.parts.append("".join(literal))
+            self.parts.append(name)
+            self.fields.add(name)
+            literal = []
+        literal.append(source[position:])
+        self.parts.append("".join(literal))
+
+    def render(self, values):
+        """Fill in the placeholders; parts alternate literal, field, literal, ..."""
+        parts = self.parts
+        if len(parts) == 1:
+            return parts[0]
+        out = [parts[0]]
+        for i in range(1, len(parts), 2):
+            out.append(str(values[parts[i]]))
+            out.append(parts[i + 1])
+        return "".join(out)
+
+    def size(self):
+        """Approximate memory used by the template"""
+        return sys.getsizeof(self.source) + sum(sys.getsizeof(part) for part in self.parts)
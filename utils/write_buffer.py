@@ -0,0 +1,102 @@
+import asyncio
+import time
+from utils.logger import logger
+from utils.metrics import Histogram
+
+class CounterBuffer:
+    """Write-behind buffer that coalesces per-key counter increments in memory.
+
+    Increments are summed per key and handed to ``flush_func`` as a single
+    ``{key: amount}`` dict, either every ``interval`` seconds or as soon as
+    ``max_pending`` distinct keys are waiting, whichever comes first.
+    """
+
+    def __init__(self, name, flush_func, interval=5.0, max_pending=500):
+        self.name = name
+        self.flush_func = flush_func
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._threshold_flush = None
+        # Reporting
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.flushed_increments = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.flush_latency = Histogram()
+
+    def start(self):
+        """Start the periodic flush loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the flush loop and write out anything still pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def add(self, key, amount=1):
+        """Queue an increment for a key"""
+        self.pending[key] = self.pending.get(key, 0) + amount
+
+        # Flush early if the buffer has grown past the size threshold
+        if len(self.pending) >= self.max_pending and not self._lock.locked():
+            if self._threshold_flush is None or self._threshold_flush.done():
+                self._threshold_flush = asyncio.create_task(self.flush())
+
+    def pending_for(self, key):
+        """Return the not-yet-flushed increment for a key"""
+        return self.pending.get(key, 0)
+
+    async def flush(self):
+        """Write all pending increments in one call to flush_func"""
+        async with self._lock:
+            if not self.pending:
+                return
+
+            batch, self.pending = self.pending, {}
+            start = time.perf_counter()
+            try:
+                await self.flush_func(batch)
+            except Exception as e:
+                # Put the increments back so they are retried on the next flush
+                for key, amount in batch.items():
+                    self.pending[key] = self.pending.get(key, 0) + amount
+                self.failed_flushes += 1
+                logger.log(f"Failed to flush {self.name} buffer ({len(batch)} keys): {str(e)}", "error")
+                return
+
+            elapsed = time.perf_counter() - start
+            elapsed_ms = elapsed * 1000
+            self.flush_latency.observe(elapsed)
+            self.flush_count += 1
+            self.flushed_increments += sum(batch.values())
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    async def _run(self):
+        """Flush the buffer every interval seconds"""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def stats(self):
+        """Return buffer depth and flush latency figures"""
+        return {
+            "pending_keys": len(self.pending),
+            "pending_increments": sum(self.pending.values()),
+            "flushes": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "flushed_increments": self.flushed_increments,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }